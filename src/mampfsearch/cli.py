@@ -0,0 +1,165 @@
+import argparse
+import logging
+
+from pathlib import Path
+
+from mampfsearch.utils import config
+
+logger = logging.getLogger(__name__)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="mampfsearch", description="MampfSearch command line interface")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("init", help="Create the lectures and entities collections")
+
+    ingest_parser = subparsers.add_parser("ingest", help="Ingest a directory or JSON manifest of .srt, .pdf and .txt files")
+    ingest_parser.add_argument("path", type=Path, help="Directory or JSON manifest")
+    ingest_parser.add_argument("--course-id", help="Course of all files in a directory, default course of manifest entries")
+    ingest_parser.add_argument("--min-chunk-size", type=int, default=config.MIN_CHUNK_SIZE)
+    ingest_parser.add_argument("--max-chunk-size", type=int, default=config.MAX_CHUNK_SIZE)
+    ingest_parser.add_argument("--no-overlap", action="store_true", help="Store disjoint chunks, their context is fetched at query time (config.CONTEXT_WINDOW)")
+    ingest_parser.add_argument("--force", action="store_true", help="Re-embed all chunks, even unchanged ones")
+    ingest_parser.add_argument("--workers", type=int, help="Number of chunking processes")
+
+    evaluate_parser = subparsers.add_parser("evaluate-dense", help="Measure recall and latency of the dense search against exact search")
+    evaluate_parser.add_argument("queries", type=Path, help="Text file with one query per line")
+    evaluate_parser.add_argument("--limit", type=int, default=10)
+
+    sparse_parser = subparsers.add_parser("evaluate-sparse", help="Measure index size, latency and recall of pruned sparse vectors")
+    sparse_parser.add_argument("queries", type=Path, help="Text file with one query per line")
+    sparse_parser.add_argument("--limit", type=int, default=10)
+    sparse_parser.add_argument("--doc-top-k", type=int, nargs="+", default=[0, 128, 64, 32], help="Terms kept per chunk, 0 keeps all")
+    sparse_parser.add_argument("--min-weight", type=float, nargs="+", default=[0.0, 0.01])
+    sparse_parser.add_argument("--query-top-k", type=int, nargs="+", default=[0], help="Terms kept per query, 0 keeps all")
+
+    loadtest_parser = subparsers.add_parser("loadtest", help="Measure search throughput of a running server with increasing concurrency")
+    loadtest_parser.add_argument("queries", type=Path, help="Text file with one query per line")
+    loadtest_parser.add_argument("--url", default="http://localhost:8000")
+    loadtest_parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    loadtest_parser.add_argument("--requests", type=int, default=64, help="Requests per concurrency level")
+    loadtest_parser.add_argument("--retriever-type", default="hybrid")
+
+    migrate_parser = subparsers.add_parser("migrate", help="Copy a collection into a new collection with the current schema and switch its alias")
+    migrate_parser.add_argument("collection", choices=["lectures", "entities"])
+    migrate_parser.add_argument("--keep-old", action="store_true", help="Keep the previous collection after switching")
+
+    export_parser = subparsers.add_parser("export-onnx", help="Export BGE-M3 to ONNX for the onnx embedding backend")
+    export_parser.add_argument("--output-dir", type=Path, help="Default: config.EMBEDDING_ONNX_PATH")
+    export_parser.add_argument("--no-quantize", action="store_true", help="Keep fp32 weights instead of dynamic int8 quantization")
+
+    parity_parser = subparsers.add_parser("embedder-parity", help="Compare an embedding backend against the FlagEmbedding reference")
+    parity_parser.add_argument("texts", type=Path, help="Text file with one sample text per line")
+    parity_parser.add_argument("--backend", default="onnx", choices=["flag", "onnx"])
+    parity_parser.add_argument("--batch-size", type=int, default=12)
+
+    worker_parser = subparsers.add_parser("embedding-worker", help="Run the shared embedding worker that serves encode and rerank requests")
+    worker_parser.add_argument("--url", help="unix:///path/to.sock or http://host:port, default: config.EMBEDDING_WORKER_URL")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "init":
+        from mampfsearch.core.init import init
+        init()
+
+    elif args.command == "ingest":
+        from mampfsearch.core.lectures.bulk_ingest import bulk_ingest
+        report = bulk_ingest(
+            path=args.path,
+            course_id=args.course_id,
+            min_chunk_size=args.min_chunk_size,
+            max_chunk_size=args.max_chunk_size,
+            overlap=not args.no_overlap,
+            incremental=not args.force,
+            workers=args.workers,
+        )
+
+        for file_report in report.files:
+            line = f"{file_report.status:>8}  {file_report.file}  ({file_report.num_chunks} chunks)"
+            if file_report.error:
+                line += f"  {file_report.error}"
+            print(line)
+
+        if report.ingest:
+            print(
+                f"{report.ingest.num_chunks} chunks in {report.ingest.duration_seconds:.1f}s "
+                f"({report.ingest.chunks_per_second:.1f} chunks/s): {report.ingest.num_upserted} upserted, "
+                f"{report.ingest.num_unchanged} unchanged, {report.ingest.num_deleted} deleted"
+            )
+
+        return 1 if report.num_failed else 0
+
+    elif args.command == "evaluate-dense":
+        from mampfsearch.core.lectures.evaluate import evaluate_dense_search
+        queries = [line.strip() for line in args.queries.read_text(encoding="utf-8").splitlines() if line.strip()]
+        report = evaluate_dense_search(queries, limit=args.limit)
+        for key, value in report.items():
+            print(f"{key}: {value}")
+
+    elif args.command == "evaluate-sparse":
+        from itertools import product
+        from mampfsearch.core.lectures.evaluate import evaluate_sparse_pruning
+        queries = [line.strip() for line in args.queries.read_text(encoding="utf-8").splitlines() if line.strip()]
+        settings = [
+            (doc_top_k or None, min_weight, query_top_k or None)
+            for doc_top_k, min_weight, query_top_k in product(args.doc_top_k, args.min_weight, args.query_top_k)
+        ]
+        for report in evaluate_sparse_pruning(queries, settings, limit=args.limit):
+            print(
+                f"doc_top_k {str(report['doc_top_k']):>4}  min_weight {report['min_weight']:<5}  query_top_k {str(report['query_top_k']):>4}: "
+                f"{report['index_mb']:8.1f} MB  {report['mean_terms_per_doc']:6.1f} terms/chunk  "
+                f"recall@{args.limit} {report['recall']:.3f}  {report['mean_latency_ms']:6.1f} ms"
+            )
+
+    elif args.command == "loadtest":
+        from mampfsearch.core.lectures.loadtest import load_test_search
+        queries = [line.strip() for line in args.queries.read_text(encoding="utf-8").splitlines() if line.strip()]
+        results = load_test_search(
+            queries,
+            url=args.url,
+            concurrency_levels=args.concurrency,
+            requests_per_level=args.requests,
+            retriever_type=args.retriever_type,
+        )
+        for result in results:
+            print(
+                f"concurrency {result['concurrency']:>3}: {result['throughput']:7.1f} req/s  "
+                f"p50 {result['latency_p50_ms']:7.1f} ms  p95 {result['latency_p95_ms']:7.1f} ms  "
+                f"speedup {result['speedup']:.2f}"
+            )
+
+    elif args.command == "migrate":
+        from mampfsearch.core.migrate import migrate_collection, get_migration_targets
+        alias, schema, payload_indexes = get_migration_targets()[args.collection]
+        result = migrate_collection(alias, schema(), payload_indexes, keep_old=args.keep_old)
+        print(f"{result['alias']}: {result['source']} -> {result['target']} ({result['num_points']} points)")
+
+    elif args.command == "export-onnx":
+        from mampfsearch.inference.embedders import export_onnx
+        output_dir = export_onnx(args.output_dir or config.EMBEDDING_ONNX_PATH, quantize=not args.no_quantize)
+        print(f"Exported to {output_dir}")
+
+    elif args.command == "embedder-parity":
+        from mampfsearch.inference.embedders import check_parity, create_embedder
+        texts = [line.strip() for line in args.texts.read_text(encoding="utf-8").splitlines() if line.strip()]
+        report = check_parity(create_embedder("flag"), create_embedder(args.backend), texts, batch_size=args.batch_size)
+        for key, value in report.items():
+            print(f"{key}: {value}")
+
+    elif args.command == "embedding-worker":
+        import uvicorn
+        from urllib.parse import urlparse
+        url = args.url or config.EMBEDDING_WORKER_URL
+        if not url:
+            parser.error("embedding-worker needs --url or config.EMBEDDING_WORKER_URL")
+
+        if url.startswith("unix://"):
+            uvicorn.run("mampfsearch.worker:app", uds=url[len("unix://"):])
+        else:
+            address = urlparse(url)
+            uvicorn.run("mampfsearch.worker:app", host=address.hostname, port=address.port or 8002)
+
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
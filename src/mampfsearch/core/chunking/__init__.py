@@ -1,3 +1,4 @@
-from mampfsearch.core.chunking.chunk_srt import chunk_srt_file
-from mampfsearch.core.chunking.chunk_pdf import chunk_pdf_file
-from mampfsearch.core.chunking.chunk_text import chunk_text_by_sentences, chunk_text_file
\ No newline at end of file
+from mampfsearch.core.chunking.chunk_srt import chunk_srt_file, iter_srt_chunks
+from mampfsearch.core.chunking.chunk_pdf import chunk_pdf_file, iter_pdf_chunks
+from mampfsearch.core.chunking.chunk_text import chunk_text_by_sentences, chunk_text_file, iter_text_chunks, iter_text_file_chunks
+from mampfsearch.core.chunking.chunk_file import iter_file_chunks
\ No newline at end of file
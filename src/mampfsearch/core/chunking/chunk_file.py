@@ -0,0 +1,46 @@
+"""Chunking of lecture files, dispatched by file type."""
+from pathlib import Path
+from typing import Iterator, Optional
+
+from mampfsearch.utils import config
+from mampfsearch.utils.models import Chunk
+from mampfsearch.core.chunking.chunk_srt import iter_srt_chunks
+from mampfsearch.core.chunking.chunk_pdf import iter_pdf_chunks
+from mampfsearch.core.chunking.chunk_text import iter_text_file_chunks
+
+SUPPORTED_SUFFIXES = (".srt", ".pdf", ".txt")
+
+
+def iter_file_chunks(
+    file_path: Path,
+    course_id: str,
+    lecture_id: Optional[str] = None,
+    min_chunk_size: int = config.MIN_CHUNK_SIZE,
+    max_chunk_size: int = config.MAX_CHUNK_SIZE,
+    overlap: bool = True,
+) -> Iterator[Chunk]:
+    """
+    Yield the chunks of an .srt, .pdf or .txt file.
+
+    The size and overlap arguments only apply to SRT files.
+
+    Raises:
+        ValueError: If the file type is not supported or an SRT file has no lecture_id
+    """
+    if file_path.suffix == ".srt":
+        if lecture_id is None:
+            raise ValueError(f"A lecture_id is required to chunk {file_path.name}")
+        yield from iter_srt_chunks(
+            srt_file=file_path,
+            course_id=course_id,
+            lecture_id=lecture_id,
+            min_chunk_size=min_chunk_size,
+            max_chunk_size=max_chunk_size,
+            overlap=overlap,
+        )
+    elif file_path.suffix == ".pdf":
+        yield from iter_pdf_chunks(pdf_file_path=file_path, course_id=course_id)
+    elif file_path.suffix == ".txt":
+        yield from iter_text_file_chunks(file_path=file_path, course_id=course_id)
+    else:
+        raise ValueError(f"Unsupported file type '{file_path.suffix}', expected one of {SUPPORTED_SUFFIXES}")
@@ -1,13 +1,16 @@
 """PDF document chunking."""
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import List
+from typing import List, Iterator, Tuple
 
 from docling.document_converter import DocumentConverter, PdfFormatOption
-from docling.datamodel.pipeline_options import PdfPipelineOptions
+from docling.datamodel.pipeline_options import PdfPipelineOptions, AcceleratorOptions
 from docling.datamodel.base_models import InputFormat
 from docling.chunking import HybridChunker
 
+from mampfsearch.utils import config
 from mampfsearch.utils.models import Chunk, FileLocation
 
 logger = logging.getLogger(__name__)
@@ -17,47 +20,120 @@ def chunk_pdf_file(
     pdf_file_path: Path,
     course_id: str,
     enable_formula_enrichment: bool = False,
-    max_tokens: int = 312
+    max_tokens: int = 312,
+    page_workers: int = config.PDF_PAGE_WORKERS,
 ) -> List[Chunk]:
     """
     Extract and chunk text from a PDF file using Docling.
-    
+
     Args:
         pdf_file_path: Path to the PDF file
         course_id: Course identifier for metadata
         enable_formula_enrichment: If True, apply formula enrichment (experimental)
-        
+        page_workers: Number of page ranges of large PDFs that are converted in parallel
+
     Returns:
         List of Chunk objects with FileLocation metadata
     """
+    chunks = list(iter_pdf_chunks(
+        pdf_file_path=pdf_file_path,
+        course_id=course_id,
+        enable_formula_enrichment=enable_formula_enrichment,
+        max_tokens=max_tokens,
+        page_workers=page_workers,
+    ))
+
+    logger.info(f"Extracted {len(chunks)} chunks from PDF")
+    return chunks
+
+
+def iter_pdf_chunks(
+    pdf_file_path: Path,
+    course_id: str,
+    enable_formula_enrichment: bool = False,
+    max_tokens: int = 312,
+    page_workers: int = config.PDF_PAGE_WORKERS,
+) -> Iterator[Chunk]:
+    """
+    Like chunk_pdf_file, but yields the chunks one by one.
+
+    With page_workers > 1, PDFs with at least 2 * PDF_MIN_PAGES_PER_WORKER pages are split into
+    page ranges that are converted concurrently. Chunks then never span two page ranges.
+    Docling's converters are not safe to share between threads, so every page worker converts with its
+    own converter and the layout models are loaded once per worker.
+    """
     logger.info(f"Chunking PDF file: {pdf_file_path.name}")
-    
+
+    chunker = get_chunker(max_tokens)
+
+    file_location = FileLocation(
+        courseId=course_id,
+        fileId=pdf_file_path.stem
+    )
+
+    page_ranges = _page_ranges(pdf_file_path, page_workers)
+    if len(page_ranges) == 1:
+        converter = get_converter(enable_formula_enrichment, config.PDF_NUM_THREADS)
+        documents = [converter.convert(str(pdf_file_path)).document]
+    else:
+        logger.info(f"Converting {pdf_file_path.name} in {len(page_ranges)} page ranges")
+
+        def convert(worker, page_range):
+            converter = get_converter(enable_formula_enrichment, config.PDF_NUM_THREADS, worker)
+            return converter.convert(str(pdf_file_path), page_range=page_range)
+
+        # at most page_workers ranges, so each converter is used by a single thread
+        with ThreadPoolExecutor(max_workers=page_workers) as executor:
+            results = executor.map(convert, range(len(page_ranges)), page_ranges)
+            documents = [result.document for result in results]
+
+    for doc in documents:
+        for chunk in chunker.chunk(dl_doc=doc):
+            yield Chunk(text=chunk.text, location=file_location)
+
+
+@lru_cache(maxsize=None)
+def get_converter(enable_formula_enrichment: bool, num_threads: int, worker: int = 0) -> DocumentConverter:
+    """Return a converter per pipeline configuration and page worker, so the models are only loaded once per worker."""
     pipeline_options = PdfPipelineOptions()
     pipeline_options.do_formula_enrichment = enable_formula_enrichment
+    pipeline_options.accelerator_options = AcceleratorOptions(num_threads=num_threads)
 
     converter = DocumentConverter(
         format_options={
             InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)
         }
     )
+    converter.initialize_pipeline(InputFormat.PDF)
+    logger.info(f"Initialized PDF converter (formula enrichment={enable_formula_enrichment}, threads={num_threads})")
+    return converter
+
 
-    result = converter.convert(str(pdf_file_path))
-    doc = result.document
-    
+@lru_cache(maxsize=None)
+def get_chunker(max_tokens: int) -> HybridChunker:
     chunker = HybridChunker()
     chunker.tokenizer.max_tokens = max_tokens
+    return chunker
 
-    chunk_iter = chunker.chunk(dl_doc=doc)
 
-    file_location = FileLocation(
-        courseId=course_id, 
-        fileId=pdf_file_path.stem
-    )
+def _page_ranges(pdf_file_path: Path, page_workers: int) -> List[Tuple[int, int]]:
+    # 1-based, inclusive page ranges as expected by DocumentConverter.convert
+    if page_workers <= 1:
+        return [(1, _MAX_PAGE)]
+
+    import pypdfium2
+    pdf = pypdfium2.PdfDocument(str(pdf_file_path))
+    num_pages = len(pdf)
+    pdf.close()
 
-    chunks = [
-        Chunk(text=chunk.text, location=file_location)
-        for chunk in chunk_iter
+    num_ranges = min(page_workers, num_pages // config.PDF_MIN_PAGES_PER_WORKER)
+    if num_ranges <= 1:
+        return [(1, _MAX_PAGE)]
+
+    pages_per_range = -(-num_pages // num_ranges)
+    return [
+        (start, min(start + pages_per_range - 1, num_pages))
+        for start in range(1, num_pages + 1, pages_per_range)
     ]
-    
-    logger.info(f"Extracted {len(chunks)} chunks from PDF")
-    return chunks
\ No newline at end of file
+
+_MAX_PAGE = 2**31 - 1
@@ -3,8 +3,9 @@
 import srt
 import logging
 from pathlib import Path
-from typing import List
+from typing import List, Iterator
 
+from mampfsearch.utils import config
 from mampfsearch.utils.models import Chunk, VideoLocation
 from mampfsearch.core.chunking._helpers import (
     split_subtitle_at_periods,
@@ -20,8 +21,8 @@ def chunk_srt_file(
     srt_file: Path,
     course_id: str,
     lecture_id: str,
-    min_chunk_size: int = 350,
-    max_chunk_size: int = 750,
+    min_chunk_size: int = config.MIN_CHUNK_SIZE,
+    max_chunk_size: int = config.MAX_CHUNK_SIZE,
     overlap: bool = True,
     output_file: Path = None,
 ) -> List[Chunk]:
@@ -50,6 +51,27 @@ def chunk_srt_file(
     Raises:
         ValueError: If max_chunk_size < min_chunk_size or file is not .srt
     """
+    return list(iter_srt_chunks(
+        srt_file=srt_file,
+        course_id=course_id,
+        lecture_id=lecture_id,
+        min_chunk_size=min_chunk_size,
+        max_chunk_size=max_chunk_size,
+        overlap=overlap,
+        output_file=output_file,
+    ))
+
+
+def iter_srt_chunks(
+    srt_file: Path,
+    course_id: str,
+    lecture_id: str,
+    min_chunk_size: int = config.MIN_CHUNK_SIZE,
+    max_chunk_size: int = config.MAX_CHUNK_SIZE,
+    overlap: bool = True,
+    output_file: Path = None,
+) -> Iterator[Chunk]:
+    """Like chunk_srt_file, but yields the chunks one by one."""
     if max_chunk_size < min_chunk_size:
         raise ValueError("max_chunk_size must be >= min_chunk_size")
     
@@ -80,7 +102,7 @@ def chunk_srt_file(
         _save_srt_file(final_subs, output_file)
 
     # 5. Convert to Chunk models
-    return _subtitles_to_chunks(final_subs, course_id, lecture_id)
+    yield from _subtitles_to_chunks(final_subs, course_id, lecture_id, overlap)
 
 
 def _parse_srt_file(file_path: Path) -> List[srt.Subtitle]:
@@ -95,12 +117,12 @@ def _parse_srt_file(file_path: Path) -> List[srt.Subtitle]:
 def _subtitles_to_chunks(
     subtitles: List[srt.Subtitle], 
     course_id: str, 
-    lecture_id: str
-) -> List[Chunk]:
+    lecture_id: str,
+    overlap: bool = False,
+) -> Iterator[Chunk]:
     """Convert subtitle objects to Chunk models with VideoLocation."""
-    chunks = []
     for sub in subtitles:
-        chunk = Chunk(
+        yield Chunk(
             text=sub.content.strip(),
             location=VideoLocation(
                 courseId=course_id,
@@ -108,9 +130,8 @@ def _subtitles_to_chunks(
                 start_time=sub.start,
                 end_time=sub.end
             ),
+            overlap=overlap,
         )
-        chunks.append(chunk)
-    return chunks
 
 
 def _save_srt_file(subtitles: List[srt.Subtitle], output_path: Path) -> None:
@@ -1,7 +1,7 @@
 """Plain text chunking."""
 import logging
 from pathlib import Path
-from typing import List, Union
+from typing import List, Union, Iterator
 
 from spacy.lang.en import English
 
@@ -26,6 +26,17 @@ def chunk_text_by_sentences(
     Returns:
         List of Chunk objects
     """
+    chunks = list(iter_text_chunks(text, location, max_sentences_per_chunk))
+    logger.debug(f"Created {len(chunks)} text chunks")
+    return chunks
+
+
+def iter_text_chunks(
+    text: str,
+    location: FileLocation,
+    max_sentences_per_chunk: int = 5,
+) -> Iterator[Chunk]:
+    """Like chunk_text_by_sentences, but yields the chunks one by one."""
     logger.debug(f"Chunking text ({len(text)} chars) with {max_sentences_per_chunk} sentences/chunk")
     
     nlp = English()
@@ -34,16 +45,11 @@ def chunk_text_by_sentences(
     doc = nlp(text)
     sentences = [sent.text.strip() for sent in doc.sents]
     
-    chunks = []
     for i in range(0, len(sentences), max_sentences_per_chunk):
         chunk_sentences = sentences[i:i + max_sentences_per_chunk]
         chunk_text = " ".join(chunk_sentences)
         
-        chunk = Chunk(text=chunk_text, location=location)
-        chunks.append(chunk)
-    
-    logger.debug(f"Created {len(chunks)} text chunks")
-    return chunks
+        yield Chunk(text=chunk_text, location=location)
 
 
 def chunk_text_file(
@@ -62,6 +68,15 @@ def chunk_text_file(
     Returns:
         List of Chunk objects with FileLocation metadata
     """
+    return list(iter_text_file_chunks(file_path, course_id, max_sentences_per_chunk))
+
+
+def iter_text_file_chunks(
+    file_path: Path,
+    course_id: str,
+    max_sentences_per_chunk: int = 5,
+) -> Iterator[Chunk]:
+    """Like chunk_text_file, but yields the chunks one by one."""
     logger.info(f"Chunking text file: {file_path.name}")
     
     text = file_path.read_text(encoding='utf-8')
@@ -71,4 +86,4 @@ def chunk_text_file(
         fileId=file_path.stem
     )
     
-    return chunk_text_by_sentences(text, location, max_sentences_per_chunk)
\ No newline at end of file
+    yield from iter_text_chunks(text, location, max_sentences_per_chunk)
\ No newline at end of file
@@ -1,16 +1,48 @@
-from mampfsearch.utils.config import get_qdrant_client
+from mampfsearch.utils import config
+from mampfsearch.utils.config import get_qdrant_client, get_async_qdrant_client
+from qdrant_client import models
 import logging
+import re
+import threading
+import time
+import uuid
+
+from typing import Tuple
 
 logger = logging.getLogger(__name__)
 
+# Per-collection epoch, replaced by every write. Cached search results are keyed by it, so they are never
+# served once the collection changed. Epochs are random tokens stored as one point per collection in
+# config.EPOCHS_COLLECTION_NAME, so a write of any process changes the epoch every process sees.
+# Reads are cached for config.EPOCH_CHECK_INTERVAL_SECONDS: name -> (epoch, time of the last read).
+_epochs = {}
+_epochs_lock = threading.Lock()
+
+# Collection metadata key of the dense profile (core/init.py COLLECTION_PROFILES) a collection was created with.
+# Reads are cached for config.PROFILE_CHECK_INTERVAL_SECONDS: name -> (profile, time of the last read).
+DENSE_PROFILE_KEY = "dense_profile"
+_profiles = {}
+
+# The configured collection names (config.LECTURE_COLLECTION_NAME, ...) are aliases
+# pointing to versioned collections named {alias}_v{n}, which allows switching schemas without downtime.
+
 def delete(name):
     client = get_qdrant_client()
-    if not client.collection_exists(name):
+    if not exists(name):
         logger.warning(f"Collection {name} does not exist")
         return
-    
-    client.delete_collection(name)
-    logger.info(f"Deleted collection {name}")
+
+    collection_name = resolve(name)
+    if collection_name != name:
+        client.update_collection_aliases(change_aliases_operations=[
+            models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=name))
+        ])
+        logger.info(f"Deleted alias {name}")
+
+    client.delete_collection(collection_name)
+    bump_epoch(name)
+    _store_bm25_stats(name, 0, 0)
+    logger.info(f"Deleted collection {collection_name}")
 
 def list():
     client = get_qdrant_client()
@@ -20,21 +52,206 @@ def list():
 
     for collection in collections:
         logger.info(collection.name)
-    
+
     return
 
 def get(name):
     client = get_qdrant_client()
-    if not client.collection_exists(name):
+    if not exists(name):
         logger.warning(f"Collection {name} does not exist")
         return
-    
-    collection_info = client.get_collection(name)
+
+    collection_info = client.get_collection(resolve(name))
     model_info = collection_info.config.params.vectors
 
     logger.info(f"Status: {collection_info.status}")
     logger.info(f"Indexed vector count: {collection_info.indexed_vectors_count}")
-    logger.info(f"Embedding dimension: {model_info.size}")
-    logger.info(f"Distance metric: {model_info.distance}")
+    for vector_name, params in model_info.items():
+        logger.info(f"Vector '{vector_name}': dimension {params.size}, distance {params.distance}")
 
     return
+
+def aliases() -> dict:
+    """Return a mapping of alias name to collection name."""
+    client = get_qdrant_client()
+    return {alias.alias_name: alias.collection_name for alias in client.get_aliases().aliases}
+
+def exists(name) -> bool:
+    """Check whether a collection or an alias with this name exists."""
+    client = get_qdrant_client()
+    return name in aliases() or client.collection_exists(name)
+
+def resolve(name) -> str:
+    """Return the collection an alias points to, or the name itself if it is not an alias."""
+    return aliases().get(name, name)
+
+def next_version_name(alias) -> str:
+    client = get_qdrant_client()
+    pattern = re.compile(rf"^{re.escape(alias)}_v(\d+)$")
+    versions = [
+        int(match.group(1))
+        for collection in client.get_collections().collections
+        if (match := pattern.match(collection.name))
+    ]
+    return f"{alias}_v{max(versions, default=0) + 1}"
+
+def switch_alias(alias, collection_name):
+    """Atomically point an alias to another collection."""
+    client = get_qdrant_client()
+    operations = []
+    if alias in aliases():
+        operations.append(models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=alias)))
+    operations.append(models.CreateAliasOperation(
+        create_alias=models.CreateAlias(collection_name=collection_name, alias_name=alias)
+    ))
+    client.update_collection_aliases(change_aliases_operations=operations)
+    with _epochs_lock:
+        _profiles.pop(alias, None)
+    bump_epoch(alias)
+    logger.info(f"Alias {alias} now points to {collection_name}")
+
+def epoch(name) -> str:
+    current = _cached_epoch(name)
+    if current is not None:
+        return current
+
+    client = get_qdrant_client()
+    current = ""
+    if client.collection_exists(config.EPOCHS_COLLECTION_NAME):
+        points = client.retrieve(config.EPOCHS_COLLECTION_NAME, ids=[_epoch_point_id(name)], with_payload=True)
+        if points:
+            current = points[0].payload["epoch"]
+
+    _store_epoch(name, current)
+    return current
+
+async def aepoch(name) -> str:
+    """Like epoch, but reads the epoch with the async client, so searches on the event loop do not block it."""
+    current = _cached_epoch(name)
+    if current is not None:
+        return current
+
+    client = get_async_qdrant_client()
+    current = ""
+    if await client.collection_exists(config.EPOCHS_COLLECTION_NAME):
+        points = await client.retrieve(config.EPOCHS_COLLECTION_NAME, ids=[_epoch_point_id(name)], with_payload=True)
+        if points:
+            current = points[0].payload["epoch"]
+
+    _store_epoch(name, current)
+    return current
+
+def create_epochs_collection():
+    """Create the collection of the epochs if it does not exist yet."""
+    client = get_qdrant_client()
+    if client.collection_exists(config.EPOCHS_COLLECTION_NAME):
+        return
+    try:
+        client.create_collection(config.EPOCHS_COLLECTION_NAME, vectors_config={})
+    except Exception:
+        # another process (e.g. `mampfsearch ingest` next to the server) may have created it in the meantime
+        if not client.collection_exists(config.EPOCHS_COLLECTION_NAME):
+            raise
+
+def bump_epoch(name):
+    """Mark a collection as changed, invalidating cached search results of all processes."""
+    client = get_qdrant_client()
+    create_epochs_collection()
+
+    # a random token instead of a counter, concurrent bumps of two processes must not end on the same value
+    current = uuid.uuid4().hex
+    client.upsert(
+        collection_name=config.EPOCHS_COLLECTION_NAME,
+        points=[models.PointStruct(id=_epoch_point_id(name), payload={"name": name, "epoch": current}, vector={})],
+        wait=True,
+    )
+    _store_epoch(name, current)
+
+def dense_profile(name) -> str:
+    """Dense profile of a collection, the retrievers search it with the matching params."""
+    profile = _cached_profile(name)
+    if profile is None:
+        client = get_qdrant_client()
+        profile = _profile_from_info(client.get_collection(resolve(name)))
+        _store_profile(name, profile)
+    return profile
+
+async def adense_profile(name) -> str:
+    """Like dense_profile, but reads the collection with the async client."""
+    profile = _cached_profile(name)
+    if profile is None:
+        client = get_async_qdrant_client()
+        collection_aliases = {alias.alias_name: alias.collection_name for alias in (await client.get_aliases()).aliases}
+        profile = _profile_from_info(await client.get_collection(collection_aliases.get(name, name)))
+        _store_profile(name, profile)
+    return profile
+
+def _profile_from_info(collection_info) -> str:
+    metadata = getattr(collection_info.config, "metadata", None) or {}
+    if DENSE_PROFILE_KEY in metadata:
+        return metadata[DENSE_PROFILE_KEY]
+
+    # collections created before the profile was stored: the profile with the same quantization
+    vectors = collection_info.config.params.vectors
+    params = vectors.get("dense") if isinstance(vectors, dict) else vectors
+    quantization = getattr(params, "quantization_config", None) or getattr(collection_info.config, "quantization_config", None)
+    if isinstance(quantization, models.ScalarQuantization):
+        return "scalar"
+    if isinstance(quantization, models.BinaryQuantization):
+        return "binary"
+    return "default"
+
+def _cached_profile(name):
+    with _epochs_lock:
+        cached = _profiles.get(name)
+    if cached is not None and time.monotonic() - cached[1] < config.PROFILE_CHECK_INTERVAL_SECONDS:
+        return cached[0]
+    return None
+
+def _store_profile(name, profile):
+    with _epochs_lock:
+        _profiles[name] = (profile, time.monotonic())
+
+def bm25_stats(name) -> Tuple[int, int]:
+    """Number of chunks ingested into a collection and their total length in tokens, see lexical.average_length."""
+    client = get_qdrant_client()
+    if not client.collection_exists(config.EPOCHS_COLLECTION_NAME):
+        return 0, 0
+    points = client.retrieve(config.EPOCHS_COLLECTION_NAME, ids=[_bm25_stats_point_id(name)], with_payload=True)
+    if not points:
+        return 0, 0
+    return points[0].payload["num_chunks"], points[0].payload["num_tokens"]
+
+def add_bm25_stats(name, num_chunks, num_tokens):
+    """Count newly ingested chunks into the length statistics of a collection, stored next to its epoch."""
+    stored_chunks, stored_tokens = bm25_stats(name)
+    _store_bm25_stats(name, stored_chunks + num_chunks, stored_tokens + num_tokens)
+
+def _store_bm25_stats(name, num_chunks, num_tokens):
+    create_epochs_collection()
+    get_qdrant_client().upsert(
+        collection_name=config.EPOCHS_COLLECTION_NAME,
+        points=[models.PointStruct(
+            id=_bm25_stats_point_id(name),
+            payload={"name": name, "num_chunks": num_chunks, "num_tokens": num_tokens},
+            vector={},
+        )],
+        wait=True,
+    )
+
+def _bm25_stats_point_id(name) -> str:
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"mampfsearch/bm25-stats/{name}"))
+
+def _cached_epoch(name):
+    with _epochs_lock:
+        cached = _epochs.get(name)
+    if cached is not None and time.monotonic() - cached[1] < config.EPOCH_CHECK_INTERVAL_SECONDS:
+        return cached[0]
+    return None
+
+def _store_epoch(name, current):
+    with _epochs_lock:
+        _epochs[name] = (current, time.monotonic())
+
+def _epoch_point_id(name) -> str:
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"mampfsearch/epoch/{name}"))
@@ -2,6 +2,7 @@ import spacy
 import time
 import logging
 import os
+import threading
 import uuid
 
 from pathlib import Path
@@ -10,12 +11,13 @@ from langdetect import detect
 from enum import Enum
 from pathlib import Path
 from collections import Counter
-from typing import Union, Optional
+from typing import Union, Optional, Callable
 
 from mampfsearch.core.chunking import chunk_text_by_sentences, chunk_pdf_file, chunk_srt_file
 from mampfsearch.utils.models import EntityCandidate, EntityRetrievalItem, Entity, ExtractionInfo, Chunk, VideoLocation, FileLocation
 from mampfsearch.utils import config
 from mampfsearch.retrievers import EntityRetriever
+from mampfsearch.core.jobs import JobCancelledError
 
 from docling.document_converter import DocumentConverter, PdfFormatOption
 from docling.datamodel.pipeline_options import PdfPipelineOptions
@@ -34,7 +36,9 @@ def extract_entities(
     file_path: Path,
     course_id: str,
     lecture_id: Optional[str] = None,
-    print_chunks: bool = False
+    print_chunks: bool = False,
+    progress_callback: Optional[Callable[[int], None]] = None,
+    cancel_event: Optional[threading.Event] = None,
 ) -> ExtractionInfo:
 
     num_extracted_entities = 0
@@ -90,6 +94,9 @@ def extract_entities(
 
     
     for i, chunk in enumerate(chunks):
+        if cancel_event is not None and cancel_event.is_set():
+            raise JobCancelledError(f"Entity extraction cancelled after {i} chunks")
+
         logger.info(f"Processing chunk {i+1}/{len(chunks)} ({len(chunk.text.split())} words)")
         
         # temporary fix for: https://github.com/vllm-project/vllm/issues/22403
@@ -129,6 +136,8 @@ def extract_entities(
                 logger.info(f"{entity[0]} : {entity[1]}")
 
         logger.info(50*"-")
+        if progress_callback is not None:
+            progress_callback(1)
     
     logger.info(f"Extraction complete. Extracted {num_extracted_entities} entities.")
     logger.info(f"Inserted {num_new_inserted_entities} new entities, merged {num_merged_entities} existing entities.")
@@ -141,10 +150,11 @@ def extract_entities(
 
 def insert_entity(entity_candidate: EntityCandidate):
 
-    model = config.get_embedding_model()
+    # same encoder as the EntityRetriever lookup before, so the embedding usually comes from the query cache
+    encoder = config.get_query_encoder()
     entity_text = entity_candidate.text
 
-    embedding = model.encode(entity_text, return_dense=True)
+    embedding = encoder.encode(entity_text, return_dense=True)
     payload = Entity.from_entity_candidate(entity_candidate).model_dump()
 
     logger.debug(f"Inserting entity '{entity_candidate.text}')")
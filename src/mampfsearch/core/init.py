@@ -1,24 +1,73 @@
 import logging
 
 from mampfsearch.utils import config
+from mampfsearch.core import collections
 from qdrant_client import models
 
 logger = logging.getLogger(__name__)
 
+# Collection profiles for the dense vectors. Each profile sets the index side (quantization, HNSW graph,
+# on-disk originals) and the matching query side (hnsw_ef, oversampling and rescoring of quantized results).
+COLLECTION_PROFILES = {
+    # full float32 vectors in RAM, exact scores
+    "default": {
+        "quantization": None,
+        "on_disk": False,
+        "hnsw_m": 16,
+        "hnsw_ef_construct": 100,
+        "hnsw_ef": 128,
+        "oversampling": None,
+        "rescore": False,
+    },
+    # int8 vectors in RAM (4x smaller), candidates are rescored with the originals from disk
+    "scalar": {
+        "quantization": "scalar",
+        "on_disk": True,
+        "hnsw_m": 16,
+        "hnsw_ef_construct": 100,
+        "hnsw_ef": 128,
+        "oversampling": 2.0,
+        "rescore": True,
+    },
+    # 1 bit per dimension in RAM (32x smaller), needs more oversampling to keep recall
+    "binary": {
+        "quantization": "binary",
+        "on_disk": True,
+        "hnsw_m": 32,
+        "hnsw_ef_construct": 256,
+        "hnsw_ef": 256,
+        "oversampling": 3.0,
+        "rescore": True,
+    },
+}
+
+# Payload fields that are filtered on. Keyword indexes for exact matches, float indexes for the time window
+# in seconds. With indexes, Qdrant can combine the filter with the HNSW search instead of scanning all points.
+LECTURES_PAYLOAD_INDEXES = {
+    "course_id": models.PayloadSchemaType.KEYWORD,
+    "lecture_id": models.PayloadSchemaType.KEYWORD,
+    "file_id": models.PayloadSchemaType.KEYWORD,
+    "start_time": models.PayloadSchemaType.FLOAT,
+    "end_time": models.PayloadSchemaType.FLOAT,
+}
+
+ENTITIES_PAYLOAD_INDEXES = {
+    "label": models.PayloadSchemaType.KEYWORD,
+}
+
 def init():
     """Initialize the collection for lectures"""
     lectures_info = create_lectures_collection()
     entities_info = create_entities_collection()
+    collections.create_epochs_collection()
     logger.info("Collection initialization completed")
     return {
         "collections": [lectures_info, entities_info]
     }
 
 def create_lectures_collection():
-    client = config.get_qdrant_client()
-
     name = config.LECTURE_COLLECTION_NAME
-    exists = client.collection_exists(name)
+    exists = collections.exists(name)
 
     info = {
         "collection_name": name,
@@ -27,46 +76,26 @@ def create_lectures_collection():
 
     if exists:
         logger.info(f"Collection {name} already exists")
+        # collections created before the payload indexes existed get them here
+        create_payload_indexes(collections.resolve(name), LECTURES_PAYLOAD_INDEXES)
         return info
     
     dimension=config.EMBEDDING_DIMENSION
-    client.create_collection(
-        collection_name=name,
-        vectors_config={
-            "dense": 
-                models.VectorParams(
-                    size=dimension,
-                    distance=models.Distance.COSINE
-                ),
-            "colbert":
-                models.VectorParams(
-                    size=dimension,
-                    distance=models.Distance.COSINE,
-                    multivector_config=models.MultiVectorConfig(
-                        comparator=models.MultiVectorComparator.MAX_SIM
-                    ),
-                )
-        },
-        sparse_vectors_config={
-            "sparse": models.SparseVectorParams(
-                index=models.SparseIndexParams()
-            )
-        }
-    )
+    physical_name = create_versioned_collection(name, lectures_collection_schema(), LECTURES_PAYLOAD_INDEXES)
     
-    logger.info(f"Created collection {name} (vector dimension={dimension})")
+    logger.info(f"Created collection {physical_name} with alias {name} (vector dimension={dimension}, profile={config.LECTURE_COLLECTION_PROFILE}, colbert quantization={config.COLBERT_QUANTIZATION}, colbert on disk={config.COLBERT_ON_DISK})")
 
     info.update({
         "status": "exists",
+        "collection": physical_name,
         "vector_dimension": dimension,
+        "profile": config.LECTURE_COLLECTION_PROFILE,
     })
     return info
 
 def create_entities_collection():
-    client = config.get_qdrant_client()
-
     name = config.ENTITIES_COLLECTION_NAME
-    exists = client.collection_exists(name)
+    exists = collections.exists(name)
 
     info = {
         "collection_name": name,
@@ -76,38 +105,134 @@ def create_entities_collection():
 
     if exists:
         logger.info(f"Collection {name} already exists")
+        create_payload_indexes(collections.resolve(name), ENTITIES_PAYLOAD_INDEXES)
         return info
     
     dimension=config.EMBEDDING_DIMENSION
-    client.create_collection(
-        collection_name=name,
-        vectors_config={
-            "dense": 
-                models.VectorParams(
-                    size=dimension,
-                    distance=models.Distance.COSINE
-                ),
-            "colbert":
-                models.VectorParams(
-                    size=dimension,
-                    distance=models.Distance.COSINE,
-                    multivector_config=models.MultiVectorConfig(
-                        comparator=models.MultiVectorComparator.MAX_SIM
-                    ),
-                )
-        },
-        sparse_vectors_config={
-            "sparse": models.SparseVectorParams(
-                index=models.SparseIndexParams()
-            )
-        }
-    )
+    physical_name = create_versioned_collection(name, entities_collection_schema(), ENTITIES_PAYLOAD_INDEXES)
     
-    logger.info(f"Created collection {name} (vector dimension={dimension})")
+    logger.info(f"Created collection {physical_name} with alias {name} (vector dimension={dimension}, profile={config.ENTITIES_COLLECTION_PROFILE})")
 
     info.update({
         "status": "Created",
+        "collection": physical_name,
         "vector_dimension": dimension,
+        "profile": config.ENTITIES_COLLECTION_PROFILE,
     })
     return info
-   
\ No newline at end of file
+
+def create_versioned_collection(alias: str, schema: dict, payload_indexes: dict) -> str:
+    """Create the next version ({alias}_v{n}) of a collection and point the alias to it."""
+    client = config.get_qdrant_client()
+    name = collections.next_version_name(alias)
+    client.create_collection(collection_name=name, **schema)
+    create_payload_indexes(name, payload_indexes)
+    collections.switch_alias(alias, name)
+    return name
+
+def create_payload_indexes(collection_name: str, payload_indexes: dict):
+    client = config.get_qdrant_client()
+    for field_name, field_schema in payload_indexes.items():
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field_name,
+            field_schema=field_schema,
+            wait=True,
+        )
+    logger.info(f"Created payload indexes on {collection_name}: {', '.join(payload_indexes)}")
+
+def lectures_collection_schema() -> dict:
+    return {
+        "metadata": {collections.DENSE_PROFILE_KEY: config.LECTURE_COLLECTION_PROFILE},
+        "vectors_config": {
+            "dense": dense_vector_params(config.LECTURE_COLLECTION_PROFILE),
+            "colbert": colbert_vector_params(),
+        },
+        "sparse_vectors_config": {
+            "sparse": models.SparseVectorParams(
+                index=models.SparseIndexParams()
+            ),
+            # BM25 term weights of the lexical retriever, qdrant keeps the document frequencies for the IDF
+            "bm25": models.SparseVectorParams(
+                index=models.SparseIndexParams(),
+                modifier=models.Modifier.IDF,
+            ),
+        },
+    }
+
+def entities_collection_schema() -> dict:
+    # entities are only ever searched and inserted with their dense vector
+    return {
+        "metadata": {collections.DENSE_PROFILE_KEY: config.ENTITIES_COLLECTION_PROFILE},
+        "vectors_config": {
+            "dense": dense_vector_params(config.ENTITIES_COLLECTION_PROFILE),
+        },
+    }
+
+def colbert_vector_params() -> models.VectorParams:
+    """
+    ColBERT multivector config. The vectors are only used to rescore prefetched candidates,
+    so no HNSW graph is built (m=0). Quantization and on-disk storage follow the config.
+    """
+    return models.VectorParams(
+        size=config.EMBEDDING_DIMENSION,
+        distance=models.Distance.COSINE,
+        multivector_config=models.MultiVectorConfig(
+            comparator=models.MultiVectorComparator.MAX_SIM
+        ),
+        hnsw_config=models.HnswConfigDiff(m=0),
+        quantization_config=quantization_config(config.COLBERT_QUANTIZATION),
+        on_disk=config.COLBERT_ON_DISK,
+    )
+
+def dense_vector_params(profile_name: str) -> models.VectorParams:
+    profile = get_profile(profile_name)
+    return models.VectorParams(
+        size=config.EMBEDDING_DIMENSION,
+        distance=models.Distance.COSINE,
+        hnsw_config=models.HnswConfigDiff(
+            m=profile["hnsw_m"],
+            ef_construct=profile["hnsw_ef_construct"],
+        ),
+        quantization_config=quantization_config(profile["quantization"]),
+        on_disk=profile["on_disk"],
+    )
+
+def dense_search_params(profile_name: str) -> models.SearchParams:
+    """Query-time parameters matching the dense vectors of a collection created with the given profile."""
+    profile = get_profile(profile_name)
+
+    quantization = None
+    if profile["quantization"] is not None:
+        quantization = models.QuantizationSearchParams(
+            ignore=False,
+            rescore=profile["rescore"],
+            oversampling=profile["oversampling"],
+        )
+
+    return models.SearchParams(
+        hnsw_ef=profile["hnsw_ef"],
+        quantization=quantization,
+    )
+
+def quantization_config(kind):
+    if kind is None:
+        return None
+    if kind == "scalar":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=True,
+            )
+        )
+    if kind == "binary":
+        return models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=True)
+        )
+    raise ValueError(f"Unknown quantization '{kind}', expected None, 'scalar' or 'binary'")
+
+def get_profile(profile_name: str) -> dict:
+    if profile_name not in COLLECTION_PROFILES:
+        raise ValueError(f"Unknown collection profile '{profile_name}', expected one of {list(COLLECTION_PROFILES)}")
+    return COLLECTION_PROFILES[profile_name]
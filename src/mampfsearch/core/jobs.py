@@ -0,0 +1,151 @@
+import logging
+import threading
+import time
+import uuid
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+from pydantic import BaseModel
+
+from mampfsearch.utils import config
+from mampfsearch.utils.models import JobInfo, JobState
+
+logger = logging.getLogger(__name__)
+
+class JobCancelledError(Exception):
+    """Raised by cooperative job functions once cancellation was requested."""
+
+class Job():
+    """
+    Handle passed to a job function.
+
+    Long running functions report progress with add_progress and stop early once cancel_event is set.
+    """
+
+    def __init__(self, kind: str):
+        self.info = JobInfo(id=uuid.uuid4().hex, kind=kind, created_at=_now())
+        self.cancel_event = threading.Event()
+        self.future: Optional[Future] = None
+        self._lock = threading.Lock()
+        self._started = None
+
+    def add_progress(self, num_chunks: int):
+        with self._lock:
+            self.info.chunks_processed += num_chunks
+            elapsed = time.perf_counter() - self._started if self._started else 0.0
+            self.info.chunks_per_second = self.info.chunks_processed / elapsed if elapsed > 0 else 0.0
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelledError(f"Job {self.info.id} was cancelled")
+
+    def snapshot(self) -> JobInfo:
+        with self._lock:
+            return self.info.model_copy(deep=True)
+
+class JobManager():
+    """Runs jobs in a dedicated thread pool so CPU-bound work does not block the event loop."""
+
+    def __init__(self, max_workers: int = config.JOB_WORKERS, history_size: int = config.JOB_HISTORY_SIZE):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.history_size = history_size
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn: Callable[[Job], object]) -> JobInfo:
+        """
+        Submit a job. fn is called with the Job handle in a worker thread; its return value
+        (a pydantic model or dict) is stored as the job result.
+        """
+        job = Job(kind)
+        # the future is set before the job is visible, so cancel always finds it
+        with job._lock:
+            job.future = self.executor.submit(self._run, job, fn)
+        with self._lock:
+            self._jobs[job.info.id] = job
+            self._prune()
+
+        logger.info(f"Submitted {kind} job {job.info.id}")
+        return job.snapshot()
+
+    def get(self, job_id: str) -> Optional[JobInfo]:
+        job = self._jobs.get(job_id)
+        return job.snapshot() if job else None
+
+    def list(self) -> List[JobInfo]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.snapshot() for job in jobs]
+
+    def cancel(self, job_id: str) -> Optional[JobInfo]:
+        """
+        Cancel a job. Pending jobs are cancelled immediately, running jobs stop at their next
+        cancellation check (jobs without checks, e.g. transcription, run to completion).
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+
+        job.cancel_event.set()
+        with job._lock:
+            job.info.cancel_requested = True
+            if job.future.cancel():
+                job.info.state = JobState.cancelled
+                job.info.finished_at = _now()
+        logger.info(f"Cancellation requested for job {job_id}")
+        return job.snapshot()
+
+    def shutdown(self):
+        for job in list(self._jobs.values()):
+            job.cancel_event.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: Job, fn: Callable[[Job], object]):
+        with job._lock:
+            job.info.state = JobState.running
+            job.info.started_at = _now()
+            job._started = time.perf_counter()
+
+        error = None
+        try:
+            result = fn(job)
+        except JobCancelledError:
+            state, result = JobState.cancelled, None
+            logger.info(f"Job {job.info.id} cancelled")
+        except Exception as e:
+            state, result, error = JobState.failed, None, str(e)
+            logger.exception(f"Job {job.info.id} failed")
+        else:
+            state = JobState.completed
+            logger.info(f"Job {job.info.id} completed")
+
+        with job._lock:
+            job.info.state = state
+            job.info.finished_at = _now()
+            if error:
+                job.info.errors.append(error)
+            if isinstance(result, BaseModel):
+                result = result.model_dump(mode="json")
+            job.info.result = result
+
+    def _prune(self):
+        # drop the oldest finished jobs beyond the history size
+        finished = [
+            job_id for job_id, job in self._jobs.items()
+            if job.info.state in (JobState.completed, JobState.failed, JobState.cancelled)
+        ]
+        for job_id in finished[:max(0, len(finished) - self.history_size)]:
+            del self._jobs[job_id]
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+_job_manager = None
+def get_job_manager() -> JobManager:
+    global _job_manager
+    if _job_manager is None:
+        _job_manager = JobManager()
+    return _job_manager
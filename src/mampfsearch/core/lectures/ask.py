@@ -1,62 +1,234 @@
 import logging
 import json
+import re
+import time
+
+from typing import AsyncIterator, List, Optional
 
 from openai import AsyncOpenAI
+from pydantic import ValidationError
 
-from mampfsearch.core.lectures.search import search_lectures
+from mampfsearch.core.lectures.search import asearch_lectures
 
 from mampfsearch.utils.prompts import QA_PROMPT, RAG_PROMPT_JSON
-from mampfsearch.utils.models import Response, RetrieverTypeEnum
-from mampfsearch.utils import config
+from mampfsearch.utils.models import LectureRetrievalItem, Response, RetrieverTypeEnum, SearchFilter
+from mampfsearch.utils import config, metrics
 
 logger = logging.getLogger(__name__)
 
+NO_RESULTS_ANSWER = "I could not find any relevant information to answer this question."
+INVALID_ANSWER = "I could not generate a valid answer."
+
 async def ask(question: str,
               retriever: RetrieverTypeEnum = RetrieverTypeEnum.hybrid,
               limit: int = 5,
+              search_filter: SearchFilter = None,
+              context_window: int = None,
               ) -> Response:
     """Ask a question and get the answer from the lectures"""
 
     client = config.get_llm_client()
 
-    response = search_lectures(
+    response = await asearch_lectures(
         query=question,
         limit=limit,
         retriever_type=retriever,
-        reranking=False
+        reranking=False,
+        search_filter=search_filter,
+        context_window=context_window,
     )
     if len(response) == 0:
         logger.info("No results found.")
-        return '{"answer": "I could not find any relevant information to answer this question.", "confidence_score": 0.0, "source_snippets": {}}'
-
-    contexts = [hit.text for hit in response]
-    context_str = "\n\n".join(f"{i+1}: {passage}" for i, passage in enumerate(contexts))
+        return Response(answer=NO_RESULTS_ANSWER, confidence_score=0.0, source_snippets={})
 
-    prompt = RAG_PROMPT_JSON.format(question=question, context=context_str)
+    prompt = build_prompt(question, response)
 
     logger.info("Generating answer...")
 
     answer = await client.chat.completions.create(
-        model="openai/gpt-oss-20b",
+        model=config.LLM_MODEL,
         messages=[
             {"role": "system", "content": prompt},
         ],
     )
 
-    response = answer.choices[0].message.content
+    response = parse_answer(answer.choices[0].message.content)
+    logger.info(f"Answer: {response.answer}")
+    return response
+
+async def ask_stream(question: str,
+                     retriever: RetrieverTypeEnum = RetrieverTypeEnum.hybrid,
+                     limit: int = 5,
+                     search_filter: SearchFilter = None,
+                     context_window: int = None,
+                     ) -> AsyncIterator[str]:
+    """
+    Like ask, but yields server-sent events: "sources" with the retrieved hits as soon as the search is done,
+    "token" with every decoded piece of the answer while the model generates it and "done" with the complete
+    answer, confidence score and source snippets. Failures end the stream with an "error" event.
+
+    Time to first byte (the sources event) and time to first answer token are recorded as the ask.ttfb_ms
+    and ask.ttft_ms metrics.
+    """
+    start = time.perf_counter()
+    try:
+        hits = await asearch_lectures(
+            query=question,
+            limit=limit,
+            retriever_type=retriever,
+            reranking=False,
+            search_filter=search_filter,
+            context_window=context_window,
+        )
+    except Exception as e:
+        logger.exception("Search for the question failed")
+        yield server_sent_event("error", {"detail": str(e)})
+        return
+
+    yield server_sent_event("sources", [hit.model_dump(mode="json") for hit in hits])
+    metrics.observe("ask.ttfb_ms", 1000 * (time.perf_counter() - start))
+
+    if len(hits) == 0:
+        logger.info("No results found.")
+        yield server_sent_event("done", Response(answer=NO_RESULTS_ANSWER, confidence_score=0.0, source_snippets={}).model_dump())
+        return
+
+    extractor = AnswerExtractor()
+    first_token = True
+    stream = None
+    try:
+        stream = await config.get_llm_client().chat.completions.create(
+            model=config.LLM_MODEL,
+            messages=[
+                {"role": "system", "content": build_prompt(question, hits)},
+            ],
+            stream=True,
+        )
+        async for chunk in stream:
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            text = extractor.feed(chunk.choices[0].delta.content)
+            if not text:
+                continue
+            if first_token:
+                first_token = False
+                ttft_ms = 1000 * (time.perf_counter() - start)
+                metrics.observe("ask.ttft_ms", ttft_ms)
+                logger.info(f"First answer token after {ttft_ms:.0f}ms")
+            yield server_sent_event("token", {"text": text})
+    except Exception as e:
+        logger.exception("Answer generation failed")
+        yield server_sent_event("error", {"detail": str(e)})
+        return
+    finally:
+        # also reached when the client disconnects, stops the generation in vLLM
+        if stream is not None:
+            await stream.close()
+
+    response = parse_answer(extractor.text, streamed_answer=extractor.answer)
+    metrics.observe("ask.total_ms", 1000 * (time.perf_counter() - start))
+    logger.info(f"Answer: {response.answer}")
+    yield server_sent_event("done", response.model_dump())
 
+def build_prompt(question: str, hits: List[LectureRetrievalItem]) -> str:
+    # the hits widened by their neighbouring chunks, for chunks ingested without overlap
+    contexts = [hit.context or hit.text for hit in hits]
+    context_str = "\n\n".join(f"{i+1}: {passage}" for i, passage in enumerate(contexts))
+    return RAG_PROMPT_JSON.format(question=question, context=context_str)
+
+def parse_answer(text: str, streamed_answer: Optional[str] = None) -> Response:
+    """Parse the JSON answer of the model, falling back to the streamed answer text if it is not valid JSON
+    or does not match the Response fields."""
     try:
-        response_dic = json.loads(response)
+        response_dic = json.loads(text)
     except json.JSONDecodeError:
+        # models like to wrap the JSON in a ```json block
+        start, end = text.find("{"), text.rfind("}")
+        try:
+            response_dic = json.loads(text[start:end + 1]) if 0 <= start < end else None
+        except json.JSONDecodeError:
+            response_dic = None
+
+    if isinstance(response_dic, dict) and "answer" in response_dic:
+        response_dic.setdefault("confidence_score", 0.0)
+        response_dic.setdefault("source_snippets", {})
+        try:
+            return Response(**response_dic)
+        except ValidationError as e:
+            logger.error(f"Answer JSON does not match the response fields: {e}")
+            if streamed_answer is None and isinstance(response_dic["answer"], str):
+                streamed_answer = response_dic["answer"]
+    else:
         logger.error("Failed to parse answer as JSON.")
-        logger.info(f"Raw answer: {response}")
-        response_dic = {
-            "answer": "I could not generate a valid answer.",
-            "confidence_score": 0.0,
-            "source_snippets": {}
-        }
-    
-    logger.info(f"Answer: {response_dic['answer']}")
-
-    response = Response(**response_dic)
-    return response
\ No newline at end of file
+
+    logger.info(f"Raw answer: {text}")
+    return Response(answer=streamed_answer or INVALID_ANSWER, confidence_score=0.0, source_snippets={})
+
+def server_sent_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+class AnswerExtractor():
+    """
+    Decodes the "answer" string of the JSON response while it is streamed, so its tokens can be forwarded
+    before the JSON is complete. Escape sequences split across chunks are held back until they are complete.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.answer = ""
+        self.done = False
+        self._position = None
+
+    def feed(self, chunk: str) -> str:
+        """Add a chunk of the response, returns the newly decoded part of the answer."""
+        self.text += chunk
+        if self.done:
+            return ""
+
+        if self._position is None:
+            match = re.search(r'"answer"\s*:\s*"', self.text)
+            if match is None:
+                return ""
+            self._position = match.end()
+
+        decoded = []
+        text = self.text
+        i = self._position
+        while i < len(text):
+            char = text[i]
+            if char == '"':
+                self.done = True
+                i += 1
+                break
+            if char != "\\":
+                decoded.append(char)
+                i += 1
+                continue
+
+            # escape sequence, wait for the rest of it if incomplete
+            if i + 1 >= len(text):
+                break
+            if text[i + 1] != "u":
+                decoded.append(_ESCAPES.get(text[i + 1], text[i + 1]))
+                i += 2
+                continue
+            if i + 6 > len(text):
+                break
+            code = int(text[i + 2:i + 6], 16)
+            if 0xD800 <= code < 0xDC00:
+                # characters outside the BMP come as a surrogate pair \ud83d\ude00
+                if i + 12 > len(text):
+                    break
+                low = int(text[i + 8:i + 12], 16)
+                decoded.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                i += 12
+                continue
+            decoded.append(chr(code))
+            i += 6
+
+        self._position = i
+        new_text = "".join(decoded)
+        self.answer += new_text
+        return new_text
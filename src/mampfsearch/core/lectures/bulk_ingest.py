@@ -0,0 +1,141 @@
+import json
+import logging
+import multiprocessing
+import threading
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional
+
+from mampfsearch.utils import config
+from mampfsearch.utils.models import Chunk, FileIngestReport, BulkIngestReport
+from mampfsearch.core.chunking import iter_file_chunks
+from mampfsearch.core.chunking.chunk_file import SUPPORTED_SUFFIXES
+from mampfsearch.core.lectures.pipeline import run_ingest_pipeline
+from mampfsearch.core.jobs import JobCancelledError
+
+logger = logging.getLogger(__name__)
+
+def bulk_ingest(
+        path : Path,
+        course_id : Optional[str] = None,
+        min_chunk_size : int = config.MIN_CHUNK_SIZE,
+        max_chunk_size : int = config.MAX_CHUNK_SIZE,
+        overlap : bool = True,
+        incremental : bool = True,
+        workers : Optional[int] = None,
+        progress_callback : Optional[Callable[[int], None]] = None,
+        cancel_event : Optional[threading.Event] = None,
+    ) -> BulkIngestReport:
+    """
+    Ingest a whole directory or manifest of lecture files.
+
+    Files are parsed and chunked in a process pool. The chunks of all files are funnelled into a
+    single ingest pipeline, so embedding runs batched on one shared model.
+
+    :param path: Directory (searched recursively for .srt, .pdf and .txt files) or JSON manifest
+        with a list of {"file": ..., "course_id": ..., "lecture_id": ...} entries
+    :param course_id: Course of all files in a directory, default course of manifest entries
+    :return: Per-file report and the overall ingest statistics
+    """
+    reports = collect_files(path, course_id)
+    workers = workers or config.BULK_INGEST_WORKERS
+    logger.info(f"Bulk ingest of {len(reports)} files with {workers} chunking workers")
+
+    chunk_args = dict(min_chunk_size=min_chunk_size, max_chunk_size=max_chunk_size, overlap=overlap)
+
+    ingest_info = None
+    # spawn instead of fork, the parent may already hold models and threads
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        chunks = _chunks_from_pool(executor, reports, chunk_args)
+        try:
+            ingest_info = run_ingest_pipeline(
+                chunks,
+                incremental=incremental,
+                progress_callback=progress_callback,
+                cancel_event=cancel_event,
+            )
+        except JobCancelledError:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        except Exception as e:
+            logger.error(f"Bulk ingest failed: {e}")
+            executor.shutdown(wait=False, cancel_futures=True)
+            for report in reports:
+                if report.status != "failed":
+                    report.status = "failed"
+                    report.error = f"Ingest pipeline failed: {e}"
+
+    for report in reports:
+        if report.status == "chunked":
+            report.status = "ingested"
+
+    num_failed = sum(report.status == "failed" for report in reports)
+    logger.info(f"Bulk ingest finished: {len(reports) - num_failed} files ingested, {num_failed} failed")
+    for report in reports:
+        if report.status == "failed":
+            logger.warning(f"Failed to ingest {report.file}: {report.error}")
+
+    return BulkIngestReport(files=reports, num_failed=num_failed, ingest=ingest_info)
+
+def collect_files(path : Path, course_id : Optional[str] = None) -> List[FileIngestReport]:
+    """Resolve a directory or manifest into one (pending) report per file."""
+    path = Path(path)
+
+    if path.is_dir():
+        if course_id is None:
+            raise ValueError("A course_id is required to ingest a directory")
+        files = sorted(f for f in path.rglob("*") if f.suffix in SUPPORTED_SUFFIXES)
+        return [
+            FileIngestReport(
+                file=f,
+                course_id=course_id,
+                lecture_id=f.stem if f.suffix == ".srt" else None,
+            )
+            for f in files
+        ]
+
+    if path.is_file() and path.suffix == ".json":
+        entries = json.loads(path.read_text(encoding="utf-8"))
+        reports = []
+        for entry in entries:
+            file = Path(entry["file"])
+            if not file.is_absolute():
+                file = path.parent / file
+            entry_course_id = entry.get("course_id", course_id)
+            if entry_course_id is None:
+                raise ValueError(f"Manifest entry {file} has no course_id")
+            reports.append(FileIngestReport(
+                file=file,
+                course_id=entry_course_id,
+                lecture_id=entry.get("lecture_id", file.stem if file.suffix == ".srt" else None),
+            ))
+        return reports
+
+    raise ValueError(f"{path} is neither a directory nor a JSON manifest")
+
+def _chunks_from_pool(executor, reports : List[FileIngestReport], chunk_args : dict) -> Iterator[Chunk]:
+    # Chunks files in the pool and yields the chunks of each file as soon as it is done
+    futures = {
+        executor.submit(_chunk_file, report.file, report.course_id, report.lecture_id, chunk_args): report
+        for report in reports
+    }
+
+    for num_done, future in enumerate(as_completed(futures), start=1):
+        report = futures[future]
+        try:
+            chunks = future.result()
+        except Exception as e:
+            report.status = "failed"
+            report.error = str(e)
+            logger.warning(f"[{num_done}/{len(reports)}] Failed to chunk {report.file.name}: {e}")
+            continue
+
+        report.status = "chunked"
+        report.num_chunks = len(chunks)
+        logger.info(f"[{num_done}/{len(reports)}] Chunked {report.file.name} ({len(chunks)} chunks)")
+        yield from chunks
+
+def _chunk_file(file_path : Path, course_id : str, lecture_id : Optional[str], chunk_args : dict) -> List[Chunk]:
+    # runs in a worker process
+    return list(iter_file_chunks(file_path, course_id, lecture_id, **chunk_args))
@@ -0,0 +1,102 @@
+import logging
+import time
+
+from typing import List
+
+from mampfsearch.utils import config, helpers, metrics
+from mampfsearch.utils.models import LectureRetrievalItem
+
+logger = logging.getLogger(__name__)
+
+# Chunks ingested without overlap are disjoint and numbered per lecture or file, which keeps text, vectors
+# and embedding time at about half of the overlap ingest. The context the overlap used to store is rebuilt
+# at query time instead: the chunks before and after every hit in the same lecture or file are fetched by their
+# deterministic point id (helpers.chunk_point_id) in one retrieve and stitched into the hit's context.
+
+def expand_context(
+        results : List[List[LectureRetrievalItem]],
+        windows : List[int],
+        collection_name : str = config.LECTURE_COLLECTION_NAME,
+    ) -> List[List[LectureRetrievalItem]]:
+    """
+    Stitch up to window neighbouring chunks per side onto the hits of each result list.
+
+    Hits of chunks ingested with overlap (or before the overlap flag was stored) are returned unchanged.
+
+    :param results: Result lists of one or more searches, all neighbours are fetched in one retrieve
+    :param windows: Context window of each result list, 0 leaves it unchanged
+    """
+    ids = _neighbour_ids(results, windows)
+    if not ids:
+        return results
+
+    start = time.perf_counter()
+    points = config.get_qdrant_client().retrieve(
+        collection_name=collection_name,
+        ids=ids,
+        with_payload=["text"],
+        with_vectors=False,
+    )
+    metrics.observe("context.retrieve_ms", 1000 * (time.perf_counter() - start))
+    return _stitch(results, windows, points)
+
+async def aexpand_context(
+        results : List[List[LectureRetrievalItem]],
+        windows : List[int],
+        collection_name : str = config.LECTURE_COLLECTION_NAME,
+    ) -> List[List[LectureRetrievalItem]]:
+    """Like expand_context, but retrieves the neighbours asynchronously"""
+    ids = _neighbour_ids(results, windows)
+    if not ids:
+        return results
+
+    start = time.perf_counter()
+    points = await config.get_async_qdrant_client().retrieve(
+        collection_name=collection_name,
+        ids=ids,
+        with_payload=["text"],
+        with_vectors=False,
+    )
+    metrics.observe("context.retrieve_ms", 1000 * (time.perf_counter() - start))
+    return _stitch(results, windows, points)
+
+def _neighbours(chunk_key : tuple, window : int) -> List[str]:
+    # point ids of the chunks before and after a hit, in document order and without the hit itself
+    course_id, document_field, document_id, ordinal = chunk_key
+    return [
+        helpers.chunk_point_id(course_id, document_field, document_id, neighbour)
+        for neighbour in range(max(0, ordinal - window), ordinal + window + 1)
+        if neighbour != ordinal
+    ]
+
+def _neighbour_ids(results, windows) -> List[str]:
+    ids = set()
+    for items, window in zip(results, windows):
+        if window <= 0:
+            continue
+        for item in items:
+            if item.chunk_key is not None:
+                ids.update(_neighbours(item.chunk_key, window))
+    return list(ids)
+
+def _stitch(results, windows, points) -> List[List[LectureRetrievalItem]]:
+    texts = {str(point.id): point.payload["text"] for point in points}
+    expanded = []
+    for items, window in zip(results, windows):
+        if window <= 0:
+            expanded.append(items)
+            continue
+
+        stitched = []
+        for item in items:
+            if item.chunk_key is None:
+                stitched.append(item)
+                continue
+            neighbours = _neighbours(item.chunk_key, window)
+            num_before = min(window, item.chunk_key[3])
+            before = [texts[point_id] for point_id in neighbours[:num_before] if point_id in texts]
+            after = [texts[point_id] for point_id in neighbours[num_before:] if point_id in texts]
+            # copies, the items may also be held by the result cache
+            stitched.append(item.model_copy(update={"context": " ".join(before + [item.text] + after)}))
+        expanded.append(stitched)
+    return expanded
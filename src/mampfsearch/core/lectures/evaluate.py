@@ -0,0 +1,173 @@
+import logging
+import time
+
+import numpy as np
+
+from typing import List, Optional, Tuple
+from qdrant_client import models
+
+from mampfsearch.utils import config, helpers
+from mampfsearch.core import collections
+from mampfsearch.core.init import dense_search_params
+
+logger = logging.getLogger(__name__)
+
+def evaluate_dense_search(
+        queries : List[str],
+        collection_name : str = config.LECTURE_COLLECTION_NAME,
+        profile_name : Optional[str] = None,
+        limit : int = 10,
+    ) -> dict:
+    """
+    Measure recall@limit and latency of the dense search with the profile's search params
+    against exact (brute-force, unquantized) search for a list of sample queries.
+
+    :param profile_name: Profile whose search params are evaluated, default the one the collection was created with
+    """
+    client = config.get_qdrant_client()
+    embedder = config.get_embedder()
+
+    query_vectors = embedder.encode(queries, return_dense=True)["dense_vecs"]
+    approximate_params = dense_search_params(profile_name or collections.dense_profile(collection_name))
+    exact_params = models.SearchParams(exact=True)
+
+    recalls = []
+    approximate_latencies = []
+    exact_latencies = []
+
+    for query_vector in query_vectors:
+        start = time.perf_counter()
+        approximate = client.query_points(
+            collection_name=collection_name,
+            query=query_vector,
+            using="dense",
+            limit=limit,
+            search_params=approximate_params,
+        ).points
+        approximate_latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        exact = client.query_points(
+            collection_name=collection_name,
+            query=query_vector,
+            using="dense",
+            limit=limit,
+            search_params=exact_params,
+        ).points
+        exact_latencies.append(time.perf_counter() - start)
+
+        exact_ids = {point.id for point in exact}
+        if exact_ids:
+            recalls.append(len(exact_ids & {point.id for point in approximate}) / len(exact_ids))
+
+    report = {
+        "profile": profile_name,
+        "num_queries": len(queries),
+        "limit": limit,
+        "recall": sum(recalls) / len(recalls) if recalls else 0.0,
+        "mean_latency_ms": 1000 * sum(approximate_latencies) / max(1, len(approximate_latencies)),
+        "mean_exact_latency_ms": 1000 * sum(exact_latencies) / max(1, len(exact_latencies)),
+    }
+    logger.info(f"Dense search with profile {profile_name}: recall@{limit}={report['recall']:.3f}, {report['mean_latency_ms']:.1f}ms (exact {report['mean_exact_latency_ms']:.1f}ms)")
+    return report
+
+def evaluate_sparse_pruning(
+        queries : List[str],
+        settings : List[Tuple[Optional[int], float, Optional[int]]],
+        collection_name : str = config.LECTURE_COLLECTION_NAME,
+        limit : int = 10,
+        batch_size : int = 256,
+    ) -> List[dict]:
+    """
+    Measure index size, latency and recall@limit of the sparse search for pruning settings.
+
+    For every (doc_top_k, min_weight, query_top_k) setting the stored sparse vectors are pruned into a
+    temporary collection, which is searched with the pruned query vectors. Recall is measured against the
+    stored vectors and unpruned queries, so run it on a collection ingested without pruning
+    (SPARSE_DOC_TOP_K=None, SPARSE_MIN_WEIGHT=0).
+    """
+    client = config.get_qdrant_client()
+    query_weights = config.get_embedder().encode(queries, return_dense=False, return_sparse=True)["lexical_weights"]
+
+    documents = []
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            limit=batch_size,
+            offset=offset,
+            with_payload=False,
+            with_vectors=["sparse"],
+        )
+        for point in points:
+            sparse = point.vector["sparse"]
+            documents.append((point.id, np.asarray(sparse.indices, dtype=np.int64), np.asarray(sparse.values, dtype=np.float32)))
+        if offset is None:
+            break
+
+    def search(name, query_top_k, min_weight):
+        results, latencies = [], []
+        for weights in query_weights:
+            start = time.perf_counter()
+            points = client.query_points(
+                collection_name=name,
+                query=helpers.convert_sparse_vector(weights, top_k=query_top_k, min_weight=min_weight),
+                using="sparse",
+                limit=limit,
+            ).points
+            latencies.append(time.perf_counter() - start)
+            results.append({point.id for point in points})
+        return results, 1000 * sum(latencies) / max(1, len(latencies))
+
+    reference, reference_latency = search(collection_name, None, 0.0)
+    # a posting is a 4 byte point offset and a 4 byte weight in qdrant's inverted index
+    num_postings = sum(len(indices) for _, indices, _ in documents)
+    reports = [{
+        "doc_top_k": None,
+        "min_weight": 0.0,
+        "query_top_k": None,
+        "num_postings": num_postings,
+        "index_mb": num_postings * 8 / 1024**2,
+        "mean_terms_per_doc": num_postings / max(1, len(documents)),
+        "recall": 1.0,
+        "mean_latency_ms": reference_latency,
+    }]
+
+    eval_name = f"{collections.resolve(collection_name)}_sparse_eval"
+    for doc_top_k, min_weight, query_top_k in settings:
+        if client.collection_exists(eval_name):
+            client.delete_collection(eval_name)
+        client.create_collection(
+            eval_name,
+            vectors_config={},
+            sparse_vectors_config={"sparse": models.SparseVectorParams(index=models.SparseIndexParams())},
+        )
+        try:
+            num_postings = 0
+            for start in range(0, len(documents), batch_size):
+                points = []
+                for point_id, indices, values in documents[start:start + batch_size]:
+                    sparse = helpers.convert_sparse_vector((indices, values), top_k=doc_top_k, min_weight=min_weight)
+                    num_postings += len(sparse.indices)
+                    points.append(models.PointStruct(id=point_id, vector={"sparse": sparse}))
+                client.upsert(collection_name=eval_name, points=points, wait=True)
+
+            results, latency = search(eval_name, query_top_k, min_weight)
+        finally:
+            client.delete_collection(eval_name)
+
+        recalls = [len(expected & found) / len(expected) for expected, found in zip(reference, results) if expected]
+        report = {
+            "doc_top_k": doc_top_k,
+            "min_weight": min_weight,
+            "query_top_k": query_top_k,
+            "num_postings": num_postings,
+            "index_mb": num_postings * 8 / 1024**2,
+            "mean_terms_per_doc": num_postings / max(1, len(documents)),
+            "recall": sum(recalls) / len(recalls) if recalls else 0.0,
+            "mean_latency_ms": latency,
+        }
+        logger.info(f"Sparse pruning doc_top_k={doc_top_k} min_weight={min_weight} query_top_k={query_top_k}: recall@{limit}={report['recall']:.3f}, {report['mean_latency_ms']:.1f}ms, {report['index_mb']:.1f}MB")
+        reports.append(report)
+
+    return reports
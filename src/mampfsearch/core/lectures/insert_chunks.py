@@ -1,74 +1,152 @@
 import logging
-import uuid
 
-from typing import List
+from typing import List, Iterable, Tuple
 from qdrant_client.models import PointStruct
 
 from mampfsearch.utils import config
-from mampfsearch.utils.models import Chunk
+from mampfsearch.utils.models import Chunk, IngestInfo, VideoLocation, FileLocation
 from mampfsearch.utils import helpers
+from mampfsearch.core import collections, lexical
 
 logger = logging.getLogger(__name__)
 
 def insert_chunks(
+        chunks : Iterable[Chunk],
+        embedding_batch_size : int = config.EMBEDDING_BATCH_SIZE,
+        upload_batch_size : int = config.UPLOAD_BATCH_SIZE,
+        upload_parallel : int = config.UPLOAD_PARALLEL,
+        incremental : bool = True,
+    ) -> IngestInfo:
+
+    from mampfsearch.core.lectures.pipeline import run_ingest_pipeline
+
+    return run_ingest_pipeline(
+        chunks,
+        collection_name=config.LECTURE_COLLECTION_NAME,
+        embedding_batch_size=embedding_batch_size,
+        upload_batch_size=upload_batch_size,
+        upload_workers=upload_parallel,
+        incremental=incremental,
+    )
+
+def create_embeddings(
         chunks : List[Chunk],
-    ):
-
-    vectors, payloads = create_embeddings_and_payloads(chunks)
-    upload(vectors, payloads, config.LECTURE_COLLECTION_NAME)
-
-    return 
-
-def create_embeddings_and_payloads(
-        chunks : List[Chunk]
-    ):
-
-    payloads = []
-    vectors = []
-
-    model = config.get_embedding_model()
-
-    for chunk in chunks:
-        payload = {
-            "text": chunk.text,
-            "course_id": chunk.location.courseId,
-            "lecture_id": chunk.location.lectureId,
-            "start_time": str(chunk.location.start_time),
-            "end_time": str(chunk.location.end_time),
-        }
-
-        embedding = model.encode(chunk.text,
-                                    return_dense=True,
-                                    return_sparse=True,
-                                    return_colbert_vecs=True)
-
-        payloads.append(payload)
-        vectors.append(embedding)
-
-    return vectors, payloads
+        batch_size : int = config.EMBEDDING_BATCH_SIZE,
+    ) -> List[dict]:
+
+    embedder = config.get_embedder()
+
+    vectors = [None] * len(chunks)
+
+    texts = [chunk.text for chunk in chunks]
+    for batch in helpers.length_sorted_batches(texts, batch_size):
+        embeddings = embedder.encode([texts[i] for i in batch],
+                                       batch_size=len(batch),
+                                       return_dense=True,
+                                       return_sparse=True,
+                                       return_colbert_vecs=True)
+
+        # scatter the batch results back into the original chunk order
+        for j, i in enumerate(batch):
+            colbert_vecs = embeddings["colbert_vecs"][j]
+            vectors[i] = {
+                "dense_vecs": embeddings["dense_vecs"][j],
+                "lexical_weights": embeddings["lexical_weights"][j],
+                "colbert_vecs": helpers.pool_colbert_vectors(colbert_vecs, config.COLBERT_POOL_FACTOR),
+                "colbert_tokens": len(colbert_vecs),
+            }
+
+    return vectors
+
+def document_key(chunk : Chunk) -> Tuple[str, str, str]:
+    """Return (course_id, payload field, document id) of the lecture or file a chunk belongs to."""
+    location = chunk.location
+    if isinstance(location, VideoLocation):
+        return location.courseId, "lecture_id", location.lectureId
+    if isinstance(location, FileLocation):
+        return location.courseId, "file_id", location.fileId
+    raise ValueError("Chunks need a VideoLocation or FileLocation to be ingested")
+
+def create_payload(chunk : Chunk, ordinal : int) -> dict:
+    course_id, document_field, document_id = document_key(chunk)
+    payload = {
+        "text": chunk.text,
+        "course_id": course_id,
+        document_field: document_id,
+        "ordinal": ordinal,
+        "overlap": chunk.overlap,
+    }
+
+    start_time = end_time = None
+    if isinstance(chunk.location, VideoLocation):
+        # numeric seconds, so the time window filter can use a range index
+        start_time = chunk.location.start_time.total_seconds()
+        end_time = chunk.location.end_time.total_seconds()
+        payload.update({
+            "start_time": start_time,
+            "end_time": end_time,
+        })
+
+    payload["content_hash"] = helpers.chunk_content_hash(chunk.text, start_time, end_time)
+    return payload
+
+def point_id(payload : dict) -> str:
+    document_field = "lecture_id" if "lecture_id" in payload else "file_id"
+    return helpers.chunk_point_id(payload["course_id"], document_field, payload[document_field], payload["ordinal"])
+
+def create_points(
+        vectors : List[dict],
+        payloads : List[dict],
+        bm25_tokens : List[List[int]],
+        bm25_avg_length : float,
+    ) -> List[PointStruct]:
+    """
+    :param bm25_tokens: lexical.tokenize of every payload's text
+    :param bm25_avg_length: Average chunk length of the collection in tokens for the BM25 weights
+    """
+
+    return [
+        PointStruct(
+            id=point_id(payloads[i]),
+            payload = payloads[i],
+            vector = {
+                "dense": embedding["dense_vecs"],
+                "colbert": embedding["colbert_vecs"],
+                "sparse": helpers.convert_sparse_vector(
+                    embedding["lexical_weights"],
+                    top_k=config.SPARSE_DOC_TOP_K,
+                    min_weight=config.SPARSE_MIN_WEIGHT,
+                ),
+                "bm25": lexical.bm25_document_vector(bm25_tokens[i], bm25_avg_length),
+            }
+        )
+        for i, embedding in enumerate(vectors)
+    ]
 
 def upload(
         vectors : List[dict],
         payloads : List[dict],
         collection_name : str,
+        batch_size : int = config.UPLOAD_BATCH_SIZE,
+        parallel : int = config.UPLOAD_PARALLEL,
     ):
 
     qdrant_client = config.get_qdrant_client()
 
-    for i, embedding in enumerate(vectors):
-        qdrant_client.upsert(
-            collection_name=collection_name,
-            points = [
-                PointStruct(
-                    id=str(uuid.uuid4()),
-                    payload = payloads[i],
-                    vector = {
-                        "dense": embedding["dense_vecs"],
-                        "colbert": embedding["colbert_vecs"],
-                        "sparse": helpers.convert_sparse_vector(embedding["lexical_weights"]),
-                    }
-                )
-            ]
-        )
+    bm25_tokens = [lexical.tokenize(payload["text"]) for payload in payloads]
+    num_tokens = sum(len(tokens) for tokens in bm25_tokens)
+    stored_chunks, stored_tokens = collections.bm25_stats(collection_name)
+    avg_length = lexical.average_length(stored_chunks + len(payloads), stored_tokens + num_tokens)
+    points = create_points(vectors, payloads, bm25_tokens, avg_length)
+
+    # upload_points splits the points into batches and sends them in bulk instead of one request per point
+    qdrant_client.upload_points(
+        collection_name=collection_name,
+        points=points,
+        batch_size=batch_size,
+        parallel=parallel,
+        wait=True,
+    )
+    collections.add_bm25_stats(collection_name, len(payloads), num_tokens)
 
     logger.info(f"Inserted {len(vectors)} vectors into collection {collection_name}")
@@ -0,0 +1,59 @@
+import asyncio
+import logging
+import statistics
+import time
+
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+def load_test_search(
+        queries : List[str],
+        url : str = "http://localhost:8000",
+        concurrency_levels : List[int] = [1, 2, 4, 8],
+        requests_per_level : int = 64,
+        retriever_type : str = "hybrid",
+    ) -> List[dict]:
+    """
+    Send POST /lectures/search requests to a running server with an increasing number of concurrent clients
+    and report throughput and latency per level. With requests overlapping on the server, throughput should grow
+    close to linearly until the inference executor or qdrant is saturated.
+    """
+    return asyncio.run(_load_test(queries, url, concurrency_levels, requests_per_level, retriever_type))
+
+async def _load_test(queries, url, concurrency_levels, requests_per_level, retriever_type) -> List[dict]:
+    import httpx
+
+    results = []
+    async with httpx.AsyncClient(base_url=url, timeout=120) as client:
+        for concurrency in concurrency_levels:
+            latencies = []
+            counter = iter(range(requests_per_level))
+
+            async def worker():
+                for i in counter:
+                    start = time.perf_counter()
+                    response = await client.post("/lectures/search", json={
+                        "query": queries[i % len(queries)],
+                        "retriever_type": retriever_type,
+                    })
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            duration = time.perf_counter() - start
+
+            latencies.sort()
+            result = {
+                "concurrency": concurrency,
+                "requests": len(latencies),
+                "throughput": len(latencies) / duration,
+                "latency_p50_ms": 1000 * statistics.median(latencies),
+                "latency_p95_ms": 1000 * latencies[int(0.95 * (len(latencies) - 1))],
+            }
+            result["speedup"] = result["throughput"] / results[0]["throughput"] if results else 1.0
+            logger.info(f"Concurrency {concurrency}: {result['throughput']:.1f} req/s, speedup {result['speedup']:.2f}")
+            results.append(result)
+
+    return results
@@ -0,0 +1,341 @@
+import logging
+import queue
+import threading
+import time
+
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from qdrant_client import models
+
+from mampfsearch.utils import config, helpers
+from mampfsearch.utils.models import Chunk, IngestInfo
+from mampfsearch.core.lectures.insert_chunks import create_embeddings, create_payload, create_points, document_key, point_id
+from mampfsearch.core.chunking import iter_file_chunks
+from mampfsearch.core.jobs import JobCancelledError
+from mampfsearch.core import collections, lexical
+from mampfsearch.core.init import lectures_collection_schema
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a stream in the pipeline queues
+_DONE = object()
+
+def run_ingest_pipeline(
+        chunks : Iterable[Chunk],
+        collection_name : str = config.LECTURE_COLLECTION_NAME,
+        embedding_batch_size : int = config.EMBEDDING_BATCH_SIZE,
+        upload_batch_size : int = config.UPLOAD_BATCH_SIZE,
+        upload_workers : int = config.UPLOAD_PARALLEL,
+        queue_size : int = config.INGEST_QUEUE_SIZE,
+        incremental : bool = True,
+        progress_callback : Optional[Callable[[int], None]] = None,
+        cancel_event : Optional[threading.Event] = None,
+    ) -> IngestInfo:
+    """
+    Stream chunks through chunk -> embed -> upsert.
+
+    The chunk source is consumed in a producer thread, embedding runs in the calling thread and
+    upserts are sent by upload_workers writer threads. The stages are connected by bounded queues,
+    so model compute overlaps with network I/O and at most queue_size batches are held in memory
+    regardless of the input size.
+
+    Every lecture or file in the stream is treated as complete: chunks get deterministic ids from
+    their position in the document, chunks whose content hash is already stored are skipped
+    (if incremental) and points of the document beyond the new chunk count are deleted afterwards.
+
+    :param chunks: Any iterable of chunks, e.g. a generator from mampfsearch.core.chunking
+    :param incremental: Skip embedding and upserting chunks that did not change since the last ingest
+    :param progress_callback: Called with the number of newly processed (upserted or unchanged) chunks
+    :param cancel_event: Once set, the pipeline stops and raises JobCancelledError
+    :return: Number of ingested chunks and throughput
+    """
+    _check_schema(collection_name)
+
+    report_progress = progress_callback or (lambda num_chunks: None)
+    cancel_event = cancel_event or threading.Event()
+
+    start = time.perf_counter()
+
+    chunk_queue = queue.Queue(maxsize=queue_size * upload_batch_size)
+    point_queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+
+    num_uploaded = 0
+    num_unchanged = 0
+    colbert_tokens = [0, 0]  # before and after pooling
+    # BM25 length statistics: chunks and tokens stored before this ingest, and of the upserted chunks
+    stored_bm25_lengths = collections.bm25_stats(collection_name)
+    bm25_lengths = [0, 0]
+    documents = Counter()
+    lock = threading.Lock()
+
+    def fail(e: Exception):
+        errors.append(e)
+        stop.set()
+
+    def produce():
+        try:
+            for chunk in chunks:
+                # number chunks per document in stream order
+                key = document_key(chunk)
+                ordinal = documents[key]
+                documents[key] += 1
+                if not _put(chunk_queue, (chunk, ordinal), stop):
+                    return
+        except Exception as e:
+            fail(e)
+        finally:
+            _put(chunk_queue, _DONE, stop)
+
+    def write():
+        nonlocal num_uploaded
+        client = config.get_qdrant_client()
+        while True:
+            points = _get(point_queue, stop)
+            if points is _DONE:
+                return
+            try:
+                client.upsert(collection_name=collection_name, points=points, wait=True)
+            except Exception as e:
+                fail(e)
+                return
+            with lock:
+                num_uploaded += len(points)
+            report_progress(len(points))
+
+    producer = threading.Thread(target=produce, name="ingest-producer", daemon=True)
+    writers = [
+        threading.Thread(target=write, name=f"ingest-writer-{i}", daemon=True)
+        for i in range(max(1, upload_workers))
+    ]
+    producer.start()
+    for writer in writers:
+        writer.start()
+
+    try:
+        num_unchanged = _embed(
+            chunk_queue,
+            point_queue,
+            stop,
+            collection_name,
+            embedding_batch_size,
+            upload_batch_size,
+            incremental,
+            report_progress,
+            cancel_event,
+            colbert_tokens,
+            stored_bm25_lengths,
+            bm25_lengths,
+        )
+    except Exception as e:
+        fail(e)
+    finally:
+        for _ in writers:
+            _put(point_queue, _DONE, stop)
+
+    producer.join()
+    for writer in writers:
+        writer.join()
+
+    try:
+        if errors:
+            raise errors[0]
+
+        num_deleted = _delete_stale_chunks(collection_name, documents)
+        collections.add_bm25_stats(collection_name, *bm25_lengths)
+    finally:
+        # points were written (maybe only partially), cached search results of the collection are stale now
+        collections.bump_epoch(collection_name)
+
+    num_chunks = sum(documents.values())
+    duration = time.perf_counter() - start
+    chunks_per_second = num_chunks / duration if duration > 0 else 0.0
+    logger.info(
+        f"Ingested {num_chunks} chunks into {collection_name} in {duration:.2f}s ({chunks_per_second:.1f} chunks/s): "
+        f"{num_uploaded} upserted, {num_unchanged} unchanged, {num_deleted} stale deleted"
+    )
+
+    colbert_bytes_before = colbert_bytes_after = 0.0
+    if num_uploaded:
+        dimension = config.EMBEDDING_DIMENSION
+        colbert_bytes_before = colbert_tokens[0] * dimension * 4 / num_uploaded
+        colbert_bytes_after = helpers.colbert_ram_bytes(
+            colbert_tokens[1], dimension, config.COLBERT_QUANTIZATION, config.COLBERT_ON_DISK
+        ) / num_uploaded
+        logger.info(f"ColBERT RAM per chunk: {colbert_bytes_before / 1024:.1f} KiB -> {colbert_bytes_after / 1024:.1f} KiB")
+
+    return IngestInfo(
+        num_chunks=num_chunks,
+        num_upserted=num_uploaded,
+        num_unchanged=num_unchanged,
+        num_deleted=num_deleted,
+        duration_seconds=duration,
+        chunks_per_second=chunks_per_second,
+        colbert_bytes_per_chunk_before=colbert_bytes_before,
+        colbert_bytes_per_chunk_after=colbert_bytes_after,
+    )
+
+def ingest_file(
+        file_path : Path,
+        course_id : str,
+        lecture_id : Optional[str] = None,
+        min_chunk_size : int = config.MIN_CHUNK_SIZE,
+        max_chunk_size : int = config.MAX_CHUNK_SIZE,
+        overlap : bool = True,
+        **pipeline_kwargs,
+    ) -> IngestInfo:
+    """Chunk an .srt, .pdf or .txt file and stream the chunks through the ingest pipeline."""
+
+    chunks = iter_file_chunks(
+        file_path=file_path,
+        course_id=course_id,
+        lecture_id=lecture_id,
+        min_chunk_size=min_chunk_size,
+        max_chunk_size=max_chunk_size,
+        overlap=overlap,
+    )
+
+    return run_ingest_pipeline(chunks, **pipeline_kwargs)
+
+def _check_schema(collection_name : str):
+    # create_points writes every vector of the current schema, upserts into collections created before one of
+    # them was added (e.g. bm25) fail on the unknown vector name after the chunks were already embedded
+    schema = lectures_collection_schema()
+    params = config.get_qdrant_client().get_collection(collections.resolve(collection_name)).config.params
+    vector_names = set(params.vectors) if isinstance(params.vectors, dict) else set()
+    vector_names |= set(params.sparse_vectors or {})
+
+    missing = (set(schema["vectors_config"]) | set(schema["sparse_vectors_config"])) - vector_names
+    if missing:
+        raise ValueError(
+            f"Collection {collection_name} has no {', '.join(sorted(missing))} vectors. "
+            "Run `mampfsearch migrate lectures` to update it to the current schema."
+        )
+
+def _embed(
+        chunk_queue : queue.Queue,
+        point_queue : queue.Queue,
+        stop : threading.Event,
+        collection_name : str,
+        embedding_batch_size : int,
+        upload_batch_size : int,
+        incremental : bool,
+        report_progress : Callable[[int], None],
+        cancel_event : threading.Event,
+        colbert_tokens : List[int],
+        stored_bm25_lengths : Tuple[int, int],
+        bm25_lengths : List[int],
+    ) -> int:
+    # Collects one upload batch of chunks at a time, embeds the changed ones and hands the points to the writers.
+    # Length sorting happens within the upload batch. Returns the number of unchanged chunks.
+    num_unchanged = 0
+    done = False
+    while not done:
+        if cancel_event.is_set():
+            raise JobCancelledError("Ingest cancelled")
+
+        batch: List[Tuple[Chunk, int]] = []
+        while len(batch) < upload_batch_size:
+            item = _get(chunk_queue, stop)
+            if item is _DONE:
+                done = True
+                break
+            batch.append(item)
+
+        if not batch:
+            continue
+
+        chunks = [chunk for chunk, _ in batch]
+        payloads = [create_payload(chunk, ordinal) for chunk, ordinal in batch]
+
+        if incremental:
+            stored_hashes = _stored_content_hashes(collection_name, [point_id(payload) for payload in payloads])
+            changed = [
+                i for i, payload in enumerate(payloads)
+                if stored_hashes.get(point_id(payload)) != payload["content_hash"]
+            ]
+            num_unchanged += len(payloads) - len(changed)
+            report_progress(len(payloads) - len(changed))
+            chunks = [chunks[i] for i in changed]
+            payloads = [payloads[i] for i in changed]
+
+        if not chunks:
+            continue
+
+        vectors = create_embeddings(chunks, batch_size=embedding_batch_size)
+        colbert_tokens[0] += sum(vector["colbert_tokens"] for vector in vectors)
+        colbert_tokens[1] += sum(len(vector["colbert_vecs"]) for vector in vectors)
+
+        # the average includes this batch, so the first ingest into a collection normalises by its own lengths
+        bm25_tokens = [lexical.tokenize(payload["text"]) for payload in payloads]
+        bm25_lengths[0] += len(payloads)
+        bm25_lengths[1] += sum(len(tokens) for tokens in bm25_tokens)
+        avg_length = lexical.average_length(stored_bm25_lengths[0] + bm25_lengths[0], stored_bm25_lengths[1] + bm25_lengths[1])
+        if not _put(point_queue, create_points(vectors, payloads, bm25_tokens, avg_length), stop):
+            break
+
+    return num_unchanged
+
+def _stored_content_hashes(collection_name : str, ids : List[str]) -> dict:
+    client = config.get_qdrant_client()
+    points = client.retrieve(
+        collection_name=collection_name,
+        ids=ids,
+        with_payload=["content_hash"],
+        with_vectors=False,
+    )
+    return {str(point.id): point.payload.get("content_hash") for point in points}
+
+def _delete_stale_chunks(collection_name : str, documents : Counter) -> int:
+    # Deletes the points of every ingested document other than its current chunks: points beyond its new chunk count,
+    # points from before deterministic ids which carry no ordinal and points stored under an earlier id scheme.
+    client = config.get_qdrant_client()
+    num_deleted = 0
+
+    for (course_id, document_field, document_id), num_chunks in documents.items():
+        current_ids = [helpers.chunk_point_id(course_id, document_field, document_id, ordinal) for ordinal in range(num_chunks)]
+        stale_filter = models.Filter(
+            must=[
+                models.FieldCondition(key="course_id", match=models.MatchValue(value=course_id)),
+                models.FieldCondition(key=document_field, match=models.MatchValue(value=document_id)),
+            ],
+            must_not=[
+                models.HasIdCondition(has_id=current_ids),
+            ],
+        )
+
+        count = client.count(collection_name=collection_name, count_filter=stale_filter, exact=True).count
+        if count == 0:
+            continue
+
+        client.delete(
+            collection_name=collection_name,
+            points_selector=models.FilterSelector(filter=stale_filter),
+            wait=True,
+        )
+        num_deleted += count
+        logger.info(f"Deleted {count} stale chunks of {document_field}={document_id}")
+
+    return num_deleted
+
+def _put(q : queue.Queue, item, stop : threading.Event) -> bool:
+    # Blocking put that gives up once another stage has failed
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _get(q : queue.Queue, stop : threading.Event):
+    # Blocking get that ends the stream once another stage has failed
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
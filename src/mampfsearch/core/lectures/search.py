@@ -1,26 +1,26 @@
+import asyncio
 import urllib3
 import logging
 
-from rerankers import Reranker
-
 from mampfsearch.utils import config, helpers, models
 from mampfsearch import retrievers
+from mampfsearch.core.result_cache import get_result_cache
+from mampfsearch.core import collections, lexical
+from mampfsearch.core.lectures import context
 
 logger = logging.getLogger(__name__)
 
 urllib3.disable_warnings()
 
-def search_lectures(
-        query: str,
-        limit: int,
+def get_retriever(
         retriever_type: models.RetrieverTypeEnum,
-        reranking: bool =False
-        ) -> list[models.LectureRetrievalItem]:
-
-    """Search lectures with keyword or semantic search"""
+        reranking: bool = False,
+        ) -> retrievers.BaseRetriever:
 
     retriever = retrievers.HybridRetriever()
-    if retriever_type == models.RetrieverTypeEnum.dense:
+    if retriever_type == models.RetrieverTypeEnum.lexical:
+        retriever = retrievers.LexicalRetriever()
+    elif retriever_type == models.RetrieverTypeEnum.dense:
         retriever = retrievers.DenseRetriever()
     elif retriever_type == models.RetrieverTypeEnum.hybrid:
         retriever = retrievers.HybridRetriever()
@@ -30,13 +30,246 @@ def search_lectures(
         raise ValueError(f"Unknown retriever type: {retriever_type}")
  
     if reranking:
-        reranker = Reranker('BAAI/bge-reranker-v2-m3', verbose=False)
-        retriever = retrievers.RerankerRetriever(base_retriever=retriever, reranker=reranker)
+        retriever = retrievers.RerankerRetriever(base_retriever=retriever, reranker=config.get_reranker())
+
+    return retriever
+
+def resolve_retriever_type(retriever_type: models.RetrieverTypeEnum, query: str) -> models.RetrieverTypeEnum:
+    """Route "auto" to the model-free lexical retriever for keyword queries and to hybrid for everything else."""
+    if retriever_type != models.RetrieverTypeEnum.auto:
+        return retriever_type
+    if lexical.is_keyword_query(query):
+        return models.RetrieverTypeEnum.lexical
+    return models.RetrieverTypeEnum.hybrid
+
+def search_lectures(
+        query: str,
+        limit: int,
+        retriever_type: models.RetrieverTypeEnum,
+        reranking: bool =False,
+        search_filter: models.SearchFilter = None,
+        info: models.SearchInfo = None,
+        context_window: int = None,
+        ) -> list[models.LectureRetrievalItem]:
+
+    """
+    Search lectures with keyword or semantic search, optionally restricted to a course, lecture or time window
+
+    :param info: Filled in with whether the result came from the cache, how many candidates were reranked
+        and whether the rerank time budget ran out
+    :param context_window: Neighbouring chunks per side stitched onto the hits, default config.CONTEXT_WINDOW
+    """
+
+    context_window = config.CONTEXT_WINDOW if context_window is None else context_window
+    cache_key = None
+    if config.RESULT_CACHE_ENABLED:
+        cache_key = get_result_cache().key(
+            config.LECTURE_COLLECTION_NAME, query, retriever_type, limit, reranking, search_filter, context_window
+        )
+        cached = get_result_cache().get(cache_key)
+        if cached is not None:
+            if info is not None:
+                info.cached = True
+            return cached
+
+    retriever = get_retriever(resolve_retriever_type(retriever_type, query), reranking)
+    query_filter = helpers.build_search_filter(search_filter)
+    responses = retriever.retrieve(query, config.LECTURE_COLLECTION_NAME, limit, query_filter)
+    responses = context.expand_context([responses], [context_window])[0]
+
+    if cache_key is not None:
+        get_result_cache().put(cache_key, responses)
+    if info is not None:
+        info.num_reranked = getattr(retriever, "num_reranked", 0)
+        info.rerank_budget_exhausted = getattr(retriever, "budget_exhausted", False)
+    return responses
+
+async def asearch_lectures(
+        query: str,
+        limit: int,
+        retriever_type: models.RetrieverTypeEnum,
+        reranking: bool =False,
+        search_filter: models.SearchFilter = None,
+        info: models.SearchInfo = None,
+        context_window: int = None,
+        ) -> list[models.LectureRetrievalItem]:
+
+    """Like search_lectures, but runs the model off the event loop and queries qdrant asynchronously"""
+
+    context_window = config.CONTEXT_WINDOW if context_window is None else context_window
+    cache_key = None
+    if config.RESULT_CACHE_ENABLED:
+        cache_key = get_result_cache().key(
+            config.LECTURE_COLLECTION_NAME, query, retriever_type, limit, reranking, search_filter, context_window,
+            epoch=await collections.aepoch(config.LECTURE_COLLECTION_NAME),
+        )
+        cached = get_result_cache().get(cache_key)
+        if cached is not None:
+            if info is not None:
+                info.cached = True
+            return cached
 
-    responses = retriever.retrieve(query, config.LECTURE_COLLECTION_NAME, limit)
+    retriever = get_retriever(resolve_retriever_type(retriever_type, query), reranking)
+    query_filter = helpers.build_search_filter(search_filter)
+    responses = await retriever.aretrieve(query, config.LECTURE_COLLECTION_NAME, limit, query_filter)
+    responses = (await context.aexpand_context([responses], [context_window]))[0]
 
+    if cache_key is not None:
+        get_result_cache().put(cache_key, responses)
+    if info is not None:
+        info.num_reranked = getattr(retriever, "num_reranked", 0)
+        info.rerank_budget_exhausted = getattr(retriever, "budget_exhausted", False)
     return responses
 
+def search_lectures_batch(
+        requests: list[models.SearchRequest],
+        ) -> list[list[models.LectureRetrievalItem]]:
+
+    """
+    Run several searches at once. All queries are encoded in one model call, the qdrant queries
+    of each retriever type are sent in one query_batch_points request and the context of all hits
+    is fetched in one retrieve. Results are in request order.
+    """
+
+    results, pending, cache_keys = _lookup_batch(requests)
+    if not pending:
+        return results
+
+    encoder = config.get_query_encoder()
+    client = config.get_qdrant_client()
+
+    embeddings = {}
+    encode_options = _union_encode_options(requests, pending)
+    if any(encode_options.values()):
+        embeddings = encoder.encode([requests[i].query for i in pending], **encode_options)
+
+    for group in _group_by_retriever_type(requests, pending).values():
+        batch_retrievers, query_requests = _build_batch(requests, pending, group, embeddings)
+        responses = client.query_batch_points(collection_name=config.LECTURE_COLLECTION_NAME, requests=query_requests)
+
+        for i, retriever, response in zip(group, batch_retrievers, responses):
+            points = [models.LectureRetrievalItem.from_qdrant_point(point) for point in response.points]
+            if requests[i].reranking:
+                points = retriever.rerank(requests[i].query, points, requests[i].limit)
+            results[i] = points
+
+    expanded = context.expand_context([results[i] for i in pending], [_context_window(requests[i]) for i in pending])
+    for i, items in zip(pending, expanded):
+        results[i] = items
+
+    _store_batch(pending, results, cache_keys)
+    return results
+
+async def asearch_lectures_batch(
+        requests: list[models.SearchRequest],
+        ) -> list[list[models.LectureRetrievalItem]]:
+
+    """Like search_lectures_batch, but runs the model off the event loop and queries qdrant asynchronously"""
+
+    epoch = await collections.aepoch(config.LECTURE_COLLECTION_NAME) if config.RESULT_CACHE_ENABLED else None
+    results, pending, cache_keys = _lookup_batch(requests, epoch)
+    if not pending:
+        return results
+
+    # read with the async client, build_request then finds the profile cached
+    await collections.adense_profile(config.LECTURE_COLLECTION_NAME)
+
+    encoder = config.get_query_encoder()
+    client = config.get_async_qdrant_client()
+
+    embeddings = {}
+    encode_options = _union_encode_options(requests, pending)
+    if any(encode_options.values()):
+        embeddings = await encoder.aencode([requests[i].query for i in pending], **encode_options)
+
+    for group in _group_by_retriever_type(requests, pending).values():
+        batch_retrievers, query_requests = _build_batch(requests, pending, group, embeddings)
+        responses = await client.query_batch_points(collection_name=config.LECTURE_COLLECTION_NAME, requests=query_requests)
+
+        points = [
+            [models.LectureRetrievalItem.from_qdrant_point(point) for point in response.points]
+            for response in responses
+        ]
+        reranked = await asyncio.gather(*(
+            retriever.arerank(requests[i].query, group_points, requests[i].limit)
+            for i, retriever, group_points in zip(group, batch_retrievers, points)
+            if requests[i].reranking
+        ))
+        reranked = iter(reranked)
+        for i, group_points in zip(group, points):
+            results[i] = next(reranked) if requests[i].reranking else group_points
+
+    expanded = await context.aexpand_context([results[i] for i in pending], [_context_window(requests[i]) for i in pending])
+    for i, items in zip(pending, expanded):
+        results[i] = items
+
+    _store_batch(pending, results, cache_keys)
+    return results
+
+def _lookup_batch(requests, epoch=None):
+    # results of cached requests, indices of the requests that still need a search and the cache keys
+    # (with the epoch before the search, see SearchResultCache) to store their results under
+    results = [None] * len(requests)
+    pending = []
+    cache_keys = [None] * len(requests)
+    for i, request in enumerate(requests):
+        if config.RESULT_CACHE_ENABLED:
+            cache_keys[i] = _cache_key(request, epoch)
+            cached = get_result_cache().get(cache_keys[i])
+            if cached is not None:
+                results[i] = cached
+                continue
+        pending.append(i)
+    return results, pending, cache_keys
+
+def _store_batch(pending, results, cache_keys):
+    for i in pending:
+        if cache_keys[i] is not None:
+            get_result_cache().put(cache_keys[i], results[i])
+
+def _cache_key(request: models.SearchRequest, epoch=None) -> tuple:
+    return get_result_cache().key(
+        config.LECTURE_COLLECTION_NAME, request.query, request.retriever_type, request.limit, request.reranking, request.filter,
+        _context_window(request), epoch,
+    )
+
+def _context_window(request: models.SearchRequest) -> int:
+    return config.CONTEXT_WINDOW if request.context_window is None else request.context_window
+
+def _union_encode_options(requests, pending) -> dict:
+    # one model call computes every output head any of the retriever types needs
+    options = {}
+    for retriever_type in {resolve_retriever_type(requests[i].retriever_type, requests[i].query) for i in pending}:
+        for name, requested in get_retriever(retriever_type).encode_options.items():
+            options[name] = options.get(name, False) or requested
+    return options
+
+def _group_by_retriever_type(requests, pending) -> dict:
+    groups = {}
+    for i in pending:
+        groups.setdefault(resolve_retriever_type(requests[i].retriever_type, requests[i].query), []).append(i)
+    return groups
+
+def _build_batch(requests, pending, group, embeddings):
+    rows = {i: row for row, i in enumerate(pending)}
+    batch_retrievers = []
+    query_requests = []
+    for i in group:
+        request = requests[i]
+        row = rows[i]
+        query_embedding = {key: value[row:row + 1] if value is not None else None for key, value in embeddings.items()}
+
+        retriever = get_retriever(resolve_retriever_type(request.retriever_type, request.query), request.reranking)
+        query_embedding.update(retriever.query_features([request.query]))
+        batch_retrievers.append(retriever)
+        query_requests.append(retriever.build_request(
+            query_embedding,
+            config.LECTURE_COLLECTION_NAME,
+            request.limit,
+            helpers.build_search_filter(request.filter),
+        ))
+    return batch_retrievers, query_requests
+
 def search_lectures_command(
         query : str,
         limit : int,
@@ -0,0 +1,68 @@
+import functools
+import re
+
+from collections import Counter
+from typing import List
+
+from mampfsearch.utils import config
+
+# BM25 over the tokens of the embedding model's tokenizer, without running the model.
+# Chunks store the BM25 term-frequency part as the "bm25" sparse vector; the collection applies the IDF
+# modifier, so a query only sends its distinct terms with weight 1 and the score is the BM25 sum over them.
+
+_QUESTION_WORDS = {
+    "what", "why", "how", "when", "where", "which", "who", "explain", "describe", "is", "are", "does", "do", "can",
+    "was", "warum", "wieso", "weshalb", "wie", "wann", "wo", "welche", "welcher", "welches", "wer", "erkläre",
+    "erklär", "beschreibe", "ist", "sind", "kann", "gibt",
+}
+
+def tokenize(text: str) -> List[int]:
+    """Token ids of the lowercased text, without special tokens and pure punctuation."""
+    tokenizer = config.get_tokenizer()
+    return [
+        token_id for token_id in tokenizer(text.lower(), add_special_tokens=False)["input_ids"]
+        if _is_term(token_id)
+    ]
+
+@functools.lru_cache(maxsize=None)
+def _is_term(token_id: int) -> bool:
+    piece = config.get_tokenizer().convert_ids_to_tokens(token_id)
+    return any(char.isalnum() for char in piece)
+
+def average_length(num_chunks: int, num_tokens: int) -> float:
+    """Average chunk length in tokens, estimated from the default chunk sizes while there are no chunks."""
+    if num_chunks == 0:
+        return (config.MIN_CHUNK_SIZE + config.MAX_CHUNK_SIZE) / 2 / config.BM25_CHARS_PER_TOKEN
+    return num_tokens / num_chunks
+
+def bm25_document_vector(token_ids: List[int], avg_length: float):
+    """
+    Sparse vector of BM25 term weights tf * (k1 + 1) / (tf + k1 * (1 - b + b * len / avg_len)) of a chunk.
+
+    :param token_ids: Terms of the chunk, from tokenize
+    :param avg_length: Average chunk length of the collection in tokens, from average_length
+    """
+    from qdrant_client.models import SparseVector
+
+    counts = Counter(token_ids)
+    length = sum(counts.values())
+    norm = config.BM25_K1 * (1 - config.BM25_B + config.BM25_B * length / avg_length)
+
+    indices = sorted(counts)
+    return SparseVector(
+        indices=indices,
+        values=[counts[token] * (config.BM25_K1 + 1) / (counts[token] + norm) for token in indices],
+    )
+
+def bm25_query_vector(query: str):
+    from qdrant_client.models import SparseVector
+
+    indices = sorted(set(tokenize(query)))
+    return SparseVector(indices=indices, values=[1.0] * len(indices))
+
+def is_keyword_query(query: str) -> bool:
+    """Short queries that are not phrased as a question, e.g. "Jordan normal form"."""
+    words = re.findall(r"\w+", query.lower())
+    if not words or len(words) > config.AUTO_LEXICAL_MAX_WORDS:
+        return False
+    return "?" not in query and words[0] not in _QUESTION_WORDS
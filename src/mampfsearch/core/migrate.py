@@ -0,0 +1,154 @@
+import logging
+import threading
+
+from typing import Callable, Optional
+from qdrant_client import models
+
+from mampfsearch.utils import config, helpers
+from mampfsearch.core import collections, lexical
+from mampfsearch.core.init import (
+    lectures_collection_schema, entities_collection_schema, create_payload_indexes,
+    LECTURES_PAYLOAD_INDEXES, ENTITIES_PAYLOAD_INDEXES,
+)
+from mampfsearch.core.jobs import JobCancelledError
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_BATCH_SIZE = 256
+
+def get_migration_targets() -> dict:
+    """Alias, current schema and payload indexes of every collection that can be migrated."""
+    return {
+        "lectures": (config.LECTURE_COLLECTION_NAME, lectures_collection_schema, LECTURES_PAYLOAD_INDEXES),
+        "entities": (config.ENTITIES_COLLECTION_NAME, entities_collection_schema, ENTITIES_PAYLOAD_INDEXES),
+    }
+
+def migrate_collection(
+        alias : str,
+        schema : dict,
+        payload_indexes : Optional[dict] = None,
+        batch_size : int = MIGRATION_BATCH_SIZE,
+        keep_old : bool = False,
+        progress_callback : Optional[Callable[[int], None]] = None,
+        cancel_event : Optional[threading.Event] = None,
+    ) -> dict:
+    """
+    Move a collection to a new schema or vector config while it stays searchable.
+
+    A new versioned collection is created with the schema, all points are copied over in scrolled
+    batches (keeping only the vectors the new schema defines, BM25 vectors are computed from the text if
+    missing and sparse vectors are pruned with the current config) and the alias is switched atomically.
+    Points written to the old collection during the copy are not carried over, so ingest should not
+    run concurrently; as a job, the migration is queued with the other jobs in the same executor.
+
+    A collection created before aliases were used carries the alias name itself. It is deleted
+    right before the alias is created, so searches fail for that short moment.
+
+    :param alias: Alias (or legacy collection name) to migrate, e.g. config.LECTURE_COLLECTION_NAME
+    :param schema: Keyword arguments for create_collection, e.g. from lectures_collection_schema()
+    :param payload_indexes: Payload indexes of the new collection, e.g. LECTURES_PAYLOAD_INDEXES
+    :param keep_old: Keep the previous collection instead of deleting it after the switch
+    """
+    client = config.get_qdrant_client()
+
+    if not collections.exists(alias):
+        raise ValueError(f"Collection {alias} does not exist")
+
+    source = collections.resolve(alias)
+    target = collections.next_version_name(alias)
+    client.create_collection(collection_name=target, **schema)
+    if payload_indexes:
+        create_payload_indexes(target, payload_indexes)
+    logger.info(f"Migrating {alias}: copying {source} to {target}")
+
+    vector_names = set(schema.get("vectors_config", {})) | set(schema.get("sparse_vectors_config", {}))
+    bm25_stats = collections.bm25_stats(alias)
+    bm25_avg_length = lexical.average_length(*bm25_stats)
+    # collections ingested before the BM25 length statistics were kept get them from the copied chunks
+    bm25_lengths = [0, 0] if "bm25" in vector_names and bm25_stats == (0, 0) else None
+
+    num_copied = 0
+    offset = None
+    try:
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                raise JobCancelledError(f"Migration of {alias} cancelled")
+
+            points, offset = client.scroll(
+                collection_name=source,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+
+            if points:
+                client.upsert(
+                    collection_name=target,
+                    points=[
+                        models.PointStruct(
+                            id=point.id,
+                            payload=point.payload,
+                            vector=_backfill_vectors(
+                                {name: vector for name, vector in (point.vector or {}).items() if name in vector_names},
+                                point.payload,
+                                vector_names,
+                                bm25_avg_length,
+                            ),
+                        )
+                        for point in points
+                    ],
+                    wait=True,
+                )
+                num_copied += len(points)
+                if bm25_lengths is not None:
+                    texts = [point.payload["text"] for point in points if point.payload and "text" in point.payload]
+                    bm25_lengths[0] += len(texts)
+                    bm25_lengths[1] += sum(len(lexical.tokenize(text)) for text in texts)
+                if progress_callback is not None:
+                    progress_callback(len(points))
+                logger.debug(f"Copied {num_copied} points to {target}")
+
+            if offset is None:
+                break
+    except BaseException:
+        logger.warning(f"Migration of {alias} aborted, deleting {target}")
+        client.delete_collection(target)
+        raise
+
+    if bm25_lengths is not None:
+        collections.add_bm25_stats(alias, *bm25_lengths)
+
+    if source == alias:
+        # legacy collection without alias, the alias can only be created once the name is free
+        client.delete_collection(source)
+        collections.switch_alias(alias, target)
+        keep_old = False
+    else:
+        collections.switch_alias(alias, target)
+        if not keep_old:
+            client.delete_collection(source)
+
+    logger.info(f"Migrated {alias} from {source} to {target} ({num_copied} points)")
+
+    return {
+        "alias": alias,
+        "source": source,
+        "target": target,
+        "num_points": num_copied,
+        "source_deleted": not keep_old,
+    }
+
+def _backfill_vectors(vectors : dict, payload : dict, vector_names : set, bm25_avg_length : float) -> dict:
+    # vectors the new schema adds and that can be derived from the payload, e.g. BM25 weights of older chunks
+    if "bm25" in vector_names and "bm25" not in vectors and payload and "text" in payload:
+        vectors["bm25"] = lexical.bm25_document_vector(lexical.tokenize(payload["text"]), bm25_avg_length)
+    # prune the sparse vectors with the current config, pruning is not undone by a migration
+    if "sparse" in vectors:
+        sparse = vectors["sparse"]
+        vectors["sparse"] = helpers.convert_sparse_vector(
+            (sparse.indices, sparse.values),
+            top_k=config.SPARSE_DOC_TOP_K,
+            min_weight=config.SPARSE_MIN_WEIGHT,
+        )
+    return vectors
@@ -0,0 +1,115 @@
+import logging
+import threading
+import time
+
+from collections import OrderedDict
+from typing import List, Optional
+
+from mampfsearch.core import collections
+from mampfsearch.inference.query_cache import normalize_query
+from mampfsearch.utils import config, metrics
+from mampfsearch.utils.models import LectureRetrievalItem, RetrieverTypeEnum, SearchFilter
+
+logger = logging.getLogger(__name__)
+
+class SearchResultCache():
+    """
+    LRU cache of complete search results (encode + qdrant + optional rerank).
+
+    Keys contain the collection epoch (see collections.bump_epoch) at lookup time. Ingests, deletes and alias
+    switches bump the epoch, so results cached before a write are never served afterwards and simply age out.
+    A search that overlaps a write is stored under the old epoch and is therefore invalidated by it as well.
+    Writes from other processes (e.g. `mampfsearch ingest` next to a running server) bump the shared epoch too,
+    they are noticed within config.EPOCH_CHECK_INTERVAL_SECONDS.
+
+    get returns copies of the cached items, so callers may modify them.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(
+            self,
+            collection_name: str,
+            query: str,
+            retriever_type: RetrieverTypeEnum,
+            limit: int,
+            reranking: bool,
+            search_filter: Optional[SearchFilter],
+            context_window: int = 0,
+            epoch: Optional[str] = None,
+        ) -> tuple:
+        """:param epoch: Epoch of the collection, read with collections.epoch if None (use collections.aepoch on the event loop)"""
+        filter_key = search_filter.model_dump_json() if search_filter is not None else None
+        return (
+            collection_name,
+            collections.epoch(collection_name) if epoch is None else epoch,
+            normalize_query(query),
+            RetrieverTypeEnum(retriever_type).value,
+            limit,
+            reranking,
+            filter_key,
+            context_window,
+        )
+
+    def get(self, key: tuple) -> Optional[List[LectureRetrievalItem]]:
+        retriever_type = key[3]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is None:
+            metrics.increment(f"result_cache.{retriever_type}.misses")
+            return None
+
+        metrics.increment(f"result_cache.{retriever_type}.hits")
+        return [item.model_copy(deep=True) for item in entry[1]]
+
+    def put(self, key: tuple, items: List[LectureRetrievalItem]):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), [item.model_copy(deep=True) for item in items])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = len(self._entries)
+
+        retrievers = {}
+        for retriever_type in RetrieverTypeEnum:
+            hits = metrics.get_counter(f"result_cache.{retriever_type.value}.hits")
+            misses = metrics.get_counter(f"result_cache.{retriever_type.value}.misses")
+            retrievers[retriever_type.value] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            }
+
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "retrievers": retrievers,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_result_cache = None
+def get_result_cache() -> SearchResultCache:
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = SearchResultCache(
+            max_entries=config.RESULT_CACHE_MAX_ENTRIES,
+            ttl_seconds=config.RESULT_CACHE_TTL_SECONDS,
+        )
+    return _result_cache
@@ -0,0 +1,2 @@
+from .collection import EmbeddedCollection
+from .client import EmbeddedClient, AsyncEmbeddedClient
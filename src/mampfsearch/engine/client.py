@@ -0,0 +1,568 @@
+import asyncio
+import fcntl
+import json
+import os
+import logging
+import shutil
+import threading
+import uuid
+
+import numpy as np
+
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List, Optional
+
+# qdrant_client.models also exports an unrelated QueryResponse of fastembed
+from qdrant_client.http import models
+
+from mampfsearch.utils import config
+from mampfsearch.engine.collection import EmbeddedCollection, fit_mask
+
+logger = logging.getLogger(__name__)
+
+# Qdrant's default RRF constant: a point at 0-based position i of a ranking scores 1 / (i + 2)
+_RRF_K = 2
+
+class EmbeddedClient():
+    """
+    In-process stand-in for QdrantClient, selected with config.VECTOR_STORE = "embedded".
+
+    Implements the part of the QdrantClient API that mampfsearch uses (collections and aliases, upsert,
+    retrieve, scroll, count, delete, set_payload, query_points and query_batch_points) on top of
+    EmbeddedCollection, so retrievers, ingest, init and migrate run unchanged without a Qdrant server.
+    Queries are the same qdrant models the retrievers build: nearest dense, sparse and multivector (MaxSim)
+    queries, prefetches with RRF fusion or rescoring, and payload filters on top-level fields.
+    Every search is exact, index and quantization parameters are ignored.
+
+    Collections live in directories below path. Only one process may open them at a time, the client holds
+    an exclusive lock on the store until it is closed. With the API server running, ingest through its
+    /ingest endpoints instead of `mampfsearch ingest`, or stop the server first.
+    """
+
+    def __init__(self, path: Path, search_block_rows: int = config.EMBEDDED_SEARCH_BLOCK_ROWS):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.search_block_rows = search_block_rows
+        self._lock_file = _lock_store(self.path)
+
+        self._collections = {}
+        # writes (and compaction, which replaces the collection object) are serialized
+        self._write_lock = threading.RLock()
+
+    # --- collections and aliases ---
+
+    def get_collections(self):
+        return models.CollectionsResponse(collections=[
+            models.CollectionDescription(name=path.name)
+            for path in sorted(self.path.iterdir())
+            if (path / "collection.json").exists()
+        ])
+
+    def collection_exists(self, collection_name: str) -> bool:
+        return (self.path / collection_name / "collection.json").exists()
+
+    def get_aliases(self):
+        return models.CollectionsAliasesResponse(aliases=[
+            models.AliasDescription(alias_name=alias, collection_name=collection_name)
+            for alias, collection_name in self._aliases().items()
+        ])
+
+    def update_collection_aliases(self, change_aliases_operations: list, **kwargs) -> bool:
+        with self._write_lock:
+            aliases = self._aliases()
+            for operation in change_aliases_operations:
+                if isinstance(operation, models.CreateAliasOperation):
+                    aliases[operation.create_alias.alias_name] = operation.create_alias.collection_name
+                elif isinstance(operation, models.DeleteAliasOperation):
+                    aliases.pop(operation.delete_alias.alias_name, None)
+                elif isinstance(operation, models.RenameAliasOperation):
+                    aliases[operation.rename_alias.new_alias_name] = aliases.pop(operation.rename_alias.old_alias_name)
+                else:
+                    raise NotImplementedError(f"Unsupported alias operation {type(operation).__name__}")
+            self._save_aliases(aliases)
+        return True
+
+    def create_collection(self, collection_name: str, vectors_config, sparse_vectors_config=None, metadata=None, **kwargs) -> bool:
+        if not isinstance(vectors_config, dict):
+            vectors_config = {"": vectors_config}
+
+        vectors = {}
+        for name, params in vectors_config.items():
+            distance = models.Distance(params.distance).value
+            if distance not in ("Cosine", "Dot"):
+                raise ValueError(f"The embedded engine supports Cosine and Dot distances, not {distance}")
+            vectors[name] = {"size": params.size, "distance": distance, "multivector": params.multivector_config is not None}
+
+        sparse_vectors = {
+            name: {"modifier": models.Modifier(params.modifier).value if params.modifier else None}
+            for name, params in (sparse_vectors_config or {}).items()
+        }
+
+        with self._write_lock:
+            EmbeddedCollection.create(self.path / collection_name, vectors, sparse_vectors, metadata)
+        logger.info(f"Created embedded collection {collection_name}")
+        return True
+
+    def create_payload_index(self, collection_name: str, field_name: str, field_schema=None, **kwargs):
+        # payload columns are built on the first filter that uses them
+        return None
+
+    def delete_collection(self, collection_name: str, **kwargs) -> bool:
+        with self._write_lock:
+            self._collections.pop(collection_name, None)
+            path = self.path / collection_name
+            if not path.exists():
+                return False
+            shutil.rmtree(path)
+            # like Qdrant, aliases of a deleted collection are removed with it
+            self._save_aliases({a: c for a, c in self._aliases().items() if c != collection_name})
+        return True
+
+    def get_collection(self, collection_name: str):
+        collection = self._collection(collection_name)
+        vectors = {
+            name: models.VectorParams(
+                size=params["size"],
+                distance=models.Distance(params["distance"]),
+                multivector_config=models.MultiVectorConfig(comparator=models.MultiVectorComparator.MAX_SIM)
+                if params["multivector"] else None,
+            )
+            for name, params in collection.schema["vectors"].items()
+        }
+        # every vector is searched exactly, so all of them count as indexed
+        return SimpleNamespace(
+            status=models.CollectionStatus.GREEN,
+            points_count=collection.num_points,
+            indexed_vectors_count=collection.num_points,
+            config=SimpleNamespace(
+                params=SimpleNamespace(vectors=vectors, sparse_vectors=collection.schema["sparse_vectors"]),
+                metadata=collection.schema.get("metadata", {}),
+            ),
+        )
+
+    def close(self, **kwargs):
+        self._collections.clear()
+        if self._lock_file is not None:
+            # closing the file releases the lock
+            self._lock_file.close()
+            self._lock_file = None
+
+    # --- points ---
+
+    def upsert(self, collection_name: str, points: list, wait: bool = True, **kwargs):
+        with self._write_lock:
+            collection = self._collection(collection_name)
+            collection.upsert([_point_dict(point) for point in points])
+            self._maybe_compact(collection_name, collection)
+        return models.UpdateResult(operation_id=0, status=models.UpdateStatus.COMPLETED)
+
+    def upload_points(self, collection_name: str, points, batch_size: int = 64, parallel: int = 1, wait: bool = True, **kwargs):
+        points = list(points)
+        for start in range(0, len(points), batch_size):
+            self.upsert(collection_name, points[start:start + batch_size])
+
+    def retrieve(self, collection_name: str, ids: list, with_payload=True, with_vectors=False, **kwargs) -> list:
+        collection = self._collection(collection_name)
+        rows = [collection.row_of.get(_point_id(point_id)) for point_id in ids]
+        return [_record(collection.point(row, with_payload, with_vectors), collection) for row in rows if row is not None]
+
+    def scroll(self, collection_name: str, scroll_filter=None, limit: int = 10, offset=None, with_payload=True, with_vectors=False, **kwargs):
+        collection = self._collection(collection_name)
+        mask = collection.alive.copy()
+        filter_mask = _filter_mask(collection, scroll_filter)
+        if filter_mask is not None:
+            mask &= fit_mask(filter_mask, len(mask))
+
+        # offsets are row numbers, points come in insertion order
+        rows = np.flatnonzero(mask[offset or 0:]) + (offset or 0)
+        next_offset = int(rows[limit]) if len(rows) > limit else None
+        records = [_record(collection.point(int(row), with_payload, with_vectors), collection) for row in rows[:limit]]
+        return records, next_offset
+
+    def count(self, collection_name: str, count_filter=None, exact: bool = True, **kwargs):
+        collection = self._collection(collection_name)
+        mask = collection.alive
+        filter_mask = _filter_mask(collection, count_filter)
+        if filter_mask is not None:
+            mask = mask & fit_mask(filter_mask, len(mask))
+        return models.CountResult(count=int(mask.sum()))
+
+    def delete(self, collection_name: str, points_selector, wait: bool = True, **kwargs):
+        with self._write_lock:
+            collection = self._collection(collection_name)
+            collection.delete(self._selected_rows(collection, points_selector))
+            self._maybe_compact(collection_name, collection)
+        return models.UpdateResult(operation_id=0, status=models.UpdateStatus.COMPLETED)
+
+    def set_payload(self, collection_name: str, payload: dict, points, **kwargs):
+        with self._write_lock:
+            collection = self._collection(collection_name)
+            collection.set_payload(self._selected_rows(collection, points), payload)
+        return models.UpdateResult(operation_id=0, status=models.UpdateStatus.COMPLETED)
+
+    # --- search ---
+
+    def query_points(
+            self,
+            collection_name: str,
+            query=None,
+            using: Optional[str] = None,
+            prefetch=None,
+            query_filter=None,
+            search_params=None,
+            limit: int = 10,
+            score_threshold: Optional[float] = None,
+            with_payload=True,
+            with_vectors=False,
+            **kwargs,
+        ):
+        request = SimpleNamespace(
+            query=query,
+            using=using,
+            prefetch=prefetch,
+            filter=query_filter,
+            limit=limit,
+            score_threshold=score_threshold,
+            with_payload=with_payload,
+            with_vector=with_vectors,
+        )
+        return self.query_batch_points(collection_name, [request])[0]
+
+    def query_batch_points(self, collection_name: str, requests: list, **kwargs) -> list:
+        """Runs the dense nearest-neighbour stages of all requests in shared matrix products."""
+        collection = self._collection(collection_name)
+        search = _Search(collection, self.search_block_rows)
+        search.precompute_dense(requests)
+
+        responses = []
+        for request in requests:
+            rows, scores = search.evaluate(request)
+            with_payload = request.with_payload if request.with_payload is not None else True
+            with_vectors = getattr(request, "with_vector", False) or False
+            points = []
+            for row, score in zip(rows, scores):
+                point = collection.point(int(row), with_payload, with_vectors)
+                points.append(models.ScoredPoint(
+                    id=point["id"],
+                    version=0,
+                    score=float(score),
+                    payload=point["payload"],
+                    vector=_vector_output(point["vectors"], collection),
+                ))
+            responses.append(models.QueryResponse(points=points))
+        return responses
+
+    # --- helpers ---
+
+    def _aliases(self) -> dict:
+        path = self.path / "aliases.json"
+        if not path.exists():
+            return {}
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_aliases(self, aliases: dict):
+        tmp_path = self.path / "aliases.json.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(aliases, f)
+        tmp_path.replace(self.path / "aliases.json")
+
+    def _collection(self, name: str) -> EmbeddedCollection:
+        name = self._aliases().get(name, name)
+        collection = self._collections.get(name)
+        if collection is None:
+            with self._write_lock:
+                collection = self._collections.get(name)
+                if collection is None:
+                    if not self.collection_exists(name):
+                        raise ValueError(f"Collection {name} does not exist")
+                    collection = self._collections[name] = EmbeddedCollection(self.path / name)
+        return collection
+
+    def _maybe_compact(self, name: str, collection: EmbeddedCollection):
+        if len(collection.alive) >= 1024 and collection.garbage_ratio > config.EMBEDDED_COMPACT_RATIO:
+            name = self._aliases().get(name, name)
+            self._collections[name] = collection.compact()
+
+    def _selected_rows(self, collection: EmbeddedCollection, selector) -> List[int]:
+        if isinstance(selector, models.FilterSelector):
+            selector = selector.filter
+        if isinstance(selector, models.Filter):
+            mask = collection.alive & fit_mask(_filter_mask(collection, selector), len(collection.alive))
+            return np.flatnonzero(mask).tolist()
+        if isinstance(selector, models.PointIdsList):
+            selector = selector.points
+        rows = [collection.row_of.get(_point_id(point_id)) for point_id in selector]
+        return [row for row in rows if row is not None]
+
+class AsyncEmbeddedClient():
+    """AsyncQdrantClient counterpart of EmbeddedClient, every call runs in a worker thread."""
+
+    def __init__(self, client: EmbeddedClient):
+        self.client = client
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+
+        return call
+
+    async def close(self, **kwargs):
+        self.client.close()
+
+class _Search():
+    """Evaluation of the query trees of one query_batch_points call."""
+
+    def __init__(self, collection: EmbeddedCollection, block_rows: int):
+        self.collection = collection
+        self.block_rows = block_rows
+        self._masks = {}
+        self._dense = {}
+
+    def precompute_dense(self, requests: list):
+        # nearest dense stages without prefetch, grouped by vector name
+        leaves = {}
+        def collect(node, parent_mask):
+            mask = self._mask(node.filter, parent_mask)
+            prefetch = _as_list(getattr(node, "prefetch", None))
+            for child in prefetch:
+                collect(child, mask)
+            if not prefetch:
+                kind, value = self._parse(node)
+                if kind == "dense":
+                    leaves.setdefault(node.using or "", []).append((node, value, mask))
+
+        for request in requests:
+            collect(request, None)
+
+        for name, group in leaves.items():
+            limit = max(_limit(node) for node, _, _ in group)
+            results = self.collection.dense_search(
+                name,
+                np.stack([value for _, value, _ in group]),
+                limit,
+                [mask for _, _, mask in group],
+                self.block_rows,
+            )
+            for (node, _, _), (rows, scores) in zip(group, results):
+                self._dense[id(node)] = (rows[:_limit(node)], scores[:_limit(node)])
+
+    def evaluate(self, node, parent_mask=None):
+        mask = self._mask(node.filter, parent_mask)
+        kind, value = self._parse(node)
+        name = node.using or ""
+        prefetch = _as_list(getattr(node, "prefetch", None))
+
+        if prefetch:
+            candidates = [self.evaluate(child, mask) for child in prefetch]
+            if kind == "fusion":
+                rows, scores = _fuse(candidates, value)
+            elif kind is None:
+                if len(candidates) != 1:
+                    raise NotImplementedError("Several prefetches need a fusion or rescoring query")
+                rows, scores = candidates[0]
+            else:
+                # rescore the union of the prefetched candidates
+                rows = np.unique(np.concatenate([candidate_rows for candidate_rows, _ in candidates])).astype(np.int64)
+                scores = self._score(kind, name, value, rows)
+                order = np.argsort(-scores, kind="stable")
+                rows, scores = rows[order], scores[order]
+        elif id(node) in self._dense:
+            rows, scores = self._dense[id(node)]
+        elif kind == "sparse":
+            rows, scores = self.collection.sparse_search(name, value[0], value[1], _limit(node), mask)
+        elif kind == "multivector":
+            view = self.collection.view()
+            allowed = view.alive if mask is None else view.alive & fit_mask(mask, view.num_rows)
+            rows = np.flatnonzero(allowed)
+            scores = self._score(kind, name, value, rows)
+            order = np.argsort(-scores, kind="stable")
+            rows, scores = rows[order], scores[order]
+        elif kind == "dense":
+            (rows, scores), = self.collection.dense_search(name, value[None], _limit(node), [mask], self.block_rows)
+        else:
+            raise NotImplementedError("A query without prefetch needs a vector")
+
+        score_threshold = getattr(node, "score_threshold", None)
+        if score_threshold is not None:
+            keep = scores >= score_threshold
+            rows, scores = rows[keep], scores[keep]
+        return rows[:_limit(node)], scores[:_limit(node)]
+
+    def _score(self, kind: str, name: str, value, rows: np.ndarray) -> np.ndarray:
+        if kind == "dense":
+            return self.collection.vector_scores(name, value, rows)
+        if kind == "multivector":
+            return self.collection.maxsim(name, value, rows)
+        if kind == "sparse":
+            return self.collection.sparse_scores(name, value[0], value[1], rows)
+        raise NotImplementedError(f"Cannot rescore with a {kind} query")
+
+    def _parse(self, node):
+        query = node.query
+        if isinstance(query, models.NearestQuery):
+            query = query.nearest
+        if query is None:
+            return None, None
+        if isinstance(query, models.FusionQuery):
+            return "fusion", query.fusion
+        if isinstance(query, models.SparseVector):
+            return "sparse", (query.indices, query.values)
+        if not isinstance(query, (list, np.ndarray)):
+            raise NotImplementedError(f"Unsupported query {type(query).__name__}")
+
+        vector = np.asarray(query, dtype=np.float32)
+        return ("dense" if vector.ndim == 1 else "multivector"), vector
+
+    def _mask(self, query_filter, parent_mask):
+        if query_filter is None:
+            return parent_mask
+        key = query_filter.model_dump_json()
+        if key not in self._masks:
+            self._masks[key] = _filter_mask(self.collection, query_filter)
+        mask = self._masks[key]
+        # the filter of a query also applies to its prefetches
+        if parent_mask is None:
+            return mask
+        return parent_mask & mask
+
+def _fuse(candidates: list, fusion) -> tuple:
+    if models.Fusion(fusion) != models.Fusion.RRF:
+        raise NotImplementedError(f"The embedded engine only supports RRF fusion, not {fusion}")
+    scores = {}
+    for rows, _ in candidates:
+        for position, row in enumerate(rows.tolist()):
+            scores[row] = scores.get(row, 0.0) + 1 / (position + _RRF_K)
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return (
+        np.array([row for row, _ in ranked], dtype=np.int64),
+        np.array([score for _, score in ranked], dtype=np.float32),
+    )
+
+def _lock_store(path: Path):
+    """Take the exclusive lock of a store, the collection files have no coordination between processes."""
+    lock_file = open(path / ".lock", "a+")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.seek(0)
+        owner = lock_file.read().strip() or "unknown"
+        lock_file.close()
+        raise RuntimeError(
+            f"The embedded store at {path} is in use by another process (pid {owner}). "
+            "Ingest through the API of that process or stop it first."
+        ) from None
+
+    lock_file.seek(0)
+    lock_file.truncate()
+    lock_file.write(str(os.getpid()))
+    lock_file.flush()
+    return lock_file
+
+def _filter_mask(collection: EmbeddedCollection, query_filter) -> Optional[np.ndarray]:
+    """Boolean array of the rows matching a qdrant Filter, None for no filter."""
+    if query_filter is None:
+        return None
+
+    num_rows = len(collection.payloads)
+    mask = np.ones(num_rows, dtype=bool)
+    for condition in _as_list(query_filter.must):
+        mask &= _condition_mask(collection, condition)
+    should = _as_list(query_filter.should)
+    if should:
+        any_mask = np.zeros(num_rows, dtype=bool)
+        for condition in should:
+            any_mask |= _condition_mask(collection, condition)
+        mask &= any_mask
+    for condition in _as_list(query_filter.must_not):
+        mask &= ~_condition_mask(collection, condition)
+    if getattr(query_filter, "min_should", None) is not None:
+        raise NotImplementedError("min_should filters are not supported by the embedded engine")
+    return mask
+
+def _condition_mask(collection: EmbeddedCollection, condition) -> np.ndarray:
+    if isinstance(condition, models.Filter):
+        return _filter_mask(collection, condition)
+
+    if isinstance(condition, models.HasIdCondition):
+        mask = np.zeros(len(collection.payloads), dtype=bool)
+        rows = [collection.row_of.get(_point_id(point_id)) for point_id in condition.has_id]
+        mask[[row for row in rows if row is not None]] = True
+        return mask
+
+    if isinstance(condition, models.IsEmptyCondition):
+        values = collection.column(condition.is_empty.key)
+        return np.array([value is None or value == [] for value in values], dtype=bool)
+
+    if isinstance(condition, models.IsNullCondition):
+        values = collection.column(condition.is_null.key)
+        return np.array([value is None for value in values], dtype=bool)
+
+    if isinstance(condition, models.FieldCondition):
+        if condition.match is not None:
+            values = collection.column(condition.key)
+            match = condition.match
+            if isinstance(match, models.MatchValue):
+                return np.array([value == match.value for value in values], dtype=bool)
+            if isinstance(match, models.MatchAny):
+                options = set(match.any)
+                return np.array([value in options for value in values], dtype=bool)
+            if isinstance(match, models.MatchExcept):
+                options = set(match.except_)
+                return np.array([value is not None and value not in options for value in values], dtype=bool)
+        elif isinstance(condition.range, models.Range):
+            values = collection.numeric_column(condition.key)
+            mask = ~np.isnan(values)
+            if condition.range.gt is not None:
+                mask &= values > condition.range.gt
+            if condition.range.gte is not None:
+                mask &= values >= condition.range.gte
+            if condition.range.lt is not None:
+                mask &= values < condition.range.lt
+            if condition.range.lte is not None:
+                mask &= values <= condition.range.lte
+            return mask
+
+    raise NotImplementedError(f"Unsupported filter condition for the embedded engine: {condition}")
+
+def _point_id(point_id):
+    # qdrant accepts UUIDs in any notation and returns them hyphenated
+    if isinstance(point_id, str):
+        return str(uuid.UUID(point_id))
+    return point_id
+
+def _point_dict(point) -> dict:
+    vectors = point.vector if isinstance(point.vector, dict) else {"": point.vector}
+    return {
+        "id": _point_id(point.id),
+        "payload": point.payload or {},
+        "vectors": {
+            name: (vector.indices, vector.values) if isinstance(vector, models.SparseVector) else vector
+            for name, vector in vectors.items()
+        },
+    }
+
+def _vector_output(vectors: Optional[dict], collection: EmbeddedCollection):
+    if vectors is None:
+        return None
+    output = {}
+    for name, vector in vectors.items():
+        if name in collection.sparse_names:
+            output[name] = models.SparseVector(indices=vector[0], values=vector[1])
+        else:
+            output[name] = vector.tolist()
+    return output
+
+def _record(point: dict, collection: EmbeddedCollection):
+    return models.Record(id=point["id"], payload=point["payload"], vector=_vector_output(point["vectors"], collection))
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+def _limit(node) -> int:
+    return node.limit if node.limit is not None else 10
@@ -0,0 +1,480 @@
+import json
+import logging
+import os
+import shutil
+import threading
+
+import numpy as np
+
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# On-disk layout of a collection directory:
+#   collection.json          vector names and parameters
+#   log.jsonl                one line per added row (id, payload), deletion or payload update; replayed on open
+#   {name}.dense             dense vectors, float32 rows
+#   {name}.tokens/.counts    multivectors (ColBERT), float16 token rows and the number of tokens per row
+#   {name}.indices/.values/.counts   sparse vectors, token ids and weights per row
+# Every file is append-only. Upserting an existing id adds a new row and deletes the old one;
+# deleted rows are dropped when the collection is compacted.
+
+_DENSE_DTYPE = np.float32
+_TOKEN_DTYPE = np.float16
+
+class _View():
+    """Consistent snapshot of a collection for a search, later writes only add rows beyond num_rows."""
+
+    def __init__(self, num_rows, alive, dense, tokens, token_starts, token_counts):
+        self.num_rows = num_rows
+        self.alive = alive
+        self.dense = dense
+        self.tokens = tokens
+        self.token_starts = token_starts
+        self.token_counts = token_counts
+
+class EmbeddedCollection():
+    """
+    Storage and search primitives of one collection of the embedded engine.
+
+    Dense vectors and ColBERT tokens are memory-mapped, so a collection larger than RAM only keeps the
+    pages a search touches. Sparse vectors are kept per row and inverted (token -> rows, weights) into
+    flat arrays before the first sparse search after a write.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path / "collection.json", encoding="utf-8") as f:
+            self.schema = json.load(f)
+
+        self._lock = threading.RLock()
+        self._columns = {}
+        self._inverted = {}
+        self._load()
+
+    @classmethod
+    def create(cls, path: Path, vectors: dict, sparse_vectors: dict, metadata: Optional[dict] = None) -> "EmbeddedCollection":
+        """
+        :param vectors: name -> {"size", "distance", "multivector"} of the dense and multivector vectors
+        :param sparse_vectors: name -> {"modifier"} of the sparse vectors
+        :param metadata: Collection metadata, like Qdrant's
+        """
+        path = Path(path)
+        path.mkdir(parents=True)
+        with open(path / "collection.json", "w", encoding="utf-8") as f:
+            json.dump({"vectors": vectors, "sparse_vectors": sparse_vectors, "metadata": metadata or {}}, f)
+        return cls(path)
+
+    @property
+    def dense_names(self) -> List[str]:
+        return [name for name, params in self.schema["vectors"].items() if not params["multivector"]]
+
+    @property
+    def multivector_names(self) -> List[str]:
+        return [name for name, params in self.schema["vectors"].items() if params["multivector"]]
+
+    @property
+    def sparse_names(self) -> List[str]:
+        return list(self.schema["sparse_vectors"])
+
+    @property
+    def num_points(self) -> int:
+        return len(self.row_of)
+
+    # --- loading and writing ---
+
+    def _load(self):
+        self.ids: List[str] = []
+        self.payloads: List[dict] = []
+        self.row_of: Dict[str, int] = {}
+        deleted = []
+
+        log_path = self.path / "log.jsonl"
+        if log_path.exists():
+            with open(log_path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        # torn write of the last record, its vectors are cut off below
+                        break
+                    record = json.loads(line)
+                    if record["op"] == "add":
+                        if record["id"] in self.row_of:
+                            deleted.append(self.row_of[record["id"]])
+                        self.row_of[record["id"]] = len(self.ids)
+                        self.ids.append(record["id"])
+                        self.payloads.append(record["payload"])
+                    elif record["op"] == "delete":
+                        deleted.append(record["row"])
+                        if self.row_of.get(self.ids[record["row"]]) == record["row"]:
+                            del self.row_of[self.ids[record["row"]]]
+                    elif record["op"] == "payload":
+                        self.payloads[record["row"]] = record["payload"]
+
+        self.alive = np.ones(len(self.ids), dtype=bool)
+        self.alive[deleted] = False
+
+        self.dense = {}
+        self.tokens = {}
+        self.token_starts = {}
+        self.token_counts = {}
+        self.sparse = {}
+        self._reload_vectors()
+
+    def _truncate(self, filename: str, dtype, length: int) -> Path:
+        # drop bytes of a write that has no log record
+        file_path = self.path / filename
+        if not file_path.exists():
+            file_path.touch()
+        size = length * np.dtype(dtype).itemsize
+        if file_path.stat().st_size > size:
+            logger.warning(f"Truncating {file_path} to the last complete write")
+            os.truncate(file_path, size)
+        return file_path
+
+    def _map(self, filename: str, dtype, length: int, shape: tuple) -> np.ndarray:
+        file_path = self._truncate(filename, dtype, length)
+        if length == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(file_path, dtype=dtype, mode="r", shape=shape)
+
+    def _read(self, filename: str, dtype, length: int) -> np.ndarray:
+        file_path = self._truncate(filename, dtype, length)
+        return np.fromfile(file_path, dtype=dtype, count=length)
+
+    def _append(self, filename: str, array: np.ndarray):
+        with open(self.path / filename, "ab") as f:
+            f.write(np.ascontiguousarray(array).tobytes())
+
+    def _append_log(self, records: List[dict]):
+        with open(self.path / "log.jsonl", "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(record) + "\n" for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def upsert(self, points: List[dict]):
+        """
+        Add points, replacing points with the same id.
+
+        :param points: dicts with "id", "payload" and "vectors" (name -> dense list, list of token vectors
+            or (indices, values) for sparse vectors); missing vectors are stored as empty
+        """
+        if not points:
+            return
+
+        with self._lock:
+            num_rows = len(self.ids)
+            for name in self.dense_names:
+                size = self.schema["vectors"][name]["size"]
+                rows = np.zeros((len(points), size), dtype=_DENSE_DTYPE)
+                for i, point in enumerate(points):
+                    vector = point["vectors"].get(name)
+                    if vector is not None:
+                        rows[i] = self._prepare(name, np.asarray(vector, dtype=np.float32))
+                self._append(f"{name}.dense", rows)
+
+            for name in self.multivector_names:
+                size = self.schema["vectors"][name]["size"]
+                vectors = [
+                    self._prepare(name, np.asarray(point["vectors"][name], dtype=np.float32).reshape(-1, size))
+                    if point["vectors"].get(name) is not None else np.zeros((0, size), dtype=np.float32)
+                    for point in points
+                ]
+                self._append(f"{name}.tokens", np.concatenate(vectors).astype(_TOKEN_DTYPE))
+                self._append(f"{name}.counts", np.array([len(v) for v in vectors], dtype=np.int32))
+
+            for name in self.sparse_names:
+                indices, values, counts = [], [], []
+                for point in points:
+                    point_indices, point_values = point["vectors"].get(name) or ([], [])
+                    indices.extend(point_indices)
+                    values.extend(point_values)
+                    counts.append(len(point_indices))
+                self._append(f"{name}.indices", np.array(indices, dtype=np.int32))
+                self._append(f"{name}.values", np.array(values, dtype=np.float32))
+                self._append(f"{name}.counts", np.array(counts, dtype=np.int32))
+
+            # the log record makes the rows visible, also after a restart
+            self._append_log([{"op": "add", "id": point["id"], "payload": point["payload"]} for point in points])
+
+            replaced = [self.row_of[point["id"]] for point in points if point["id"] in self.row_of]
+            for i, point in enumerate(points):
+                self.row_of[point["id"]] = num_rows + i
+                self.ids.append(point["id"])
+                self.payloads.append(point["payload"])
+
+            self._reload_vectors()
+            alive = np.concatenate([self.alive, np.ones(len(points), dtype=bool)])
+            alive[replaced] = False
+            self.alive = alive
+            self._changed()
+
+    def delete(self, rows: List[int]):
+        with self._lock:
+            rows = [row for row in rows if self.alive[row]]
+            if not rows:
+                return
+            self._append_log([{"op": "delete", "row": row} for row in rows])
+            alive = self.alive.copy()
+            alive[rows] = False
+            self.alive = alive
+            for row in rows:
+                if self.row_of.get(self.ids[row]) == row:
+                    del self.row_of[self.ids[row]]
+            self._changed()
+
+    def set_payload(self, rows: List[int], payload: dict):
+        with self._lock:
+            records = []
+            for row in rows:
+                self.payloads[row] = {**self.payloads[row], **payload}
+                records.append({"op": "payload", "row": row, "payload": self.payloads[row]})
+            self._append_log(records)
+            self._columns = {}
+
+    def compact(self) -> "EmbeddedCollection":
+        """Rewrite the collection without deleted rows and return it reopened."""
+        with self._lock:
+            rows = np.flatnonzero(self.alive)
+            tmp_path = self.path.with_name(self.path.name + ".compact")
+            if tmp_path.exists():
+                shutil.rmtree(tmp_path)
+            compacted = EmbeddedCollection.create(
+                tmp_path, self.schema["vectors"], self.schema["sparse_vectors"], self.schema.get("metadata")
+            )
+            for start in range(0, len(rows), 1024):
+                compacted.upsert([self.point(int(row), with_vectors=True) for row in rows[start:start + 1024]])
+
+            old_path = self.path.with_name(self.path.name + ".old")
+            os.replace(self.path, old_path)
+            os.replace(tmp_path, self.path)
+            shutil.rmtree(old_path)
+            logger.info(f"Compacted {self.path.name}: {len(self.alive)} -> {len(rows)} rows")
+            return EmbeddedCollection(self.path)
+
+    @property
+    def garbage_ratio(self) -> float:
+        return 1 - self.num_points / len(self.alive) if len(self.alive) else 0.0
+
+    def _prepare(self, name: str, vectors: np.ndarray) -> np.ndarray:
+        # cosine similarity is the dot product of normalised vectors
+        if self.schema["vectors"][name]["distance"] == "Cosine":
+            norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+            vectors = vectors / np.maximum(norms, 1e-12)
+        return vectors
+
+    def _reload_vectors(self):
+        num_rows = len(self.ids)
+        for name in self.dense_names:
+            size = self.schema["vectors"][name]["size"]
+            self.dense[name] = self._map(f"{name}.dense", _DENSE_DTYPE, num_rows * size, (num_rows, size))
+
+        for name in self.multivector_names:
+            size = self.schema["vectors"][name]["size"]
+            counts = self._read(f"{name}.counts", np.int32, num_rows)
+            self.token_counts[name] = counts
+            self.token_starts[name] = np.concatenate([[0], np.cumsum(counts, dtype=np.int64)])[:-1]
+            num_tokens = int(counts.sum())
+            self.tokens[name] = self._map(f"{name}.tokens", _TOKEN_DTYPE, num_tokens * size, (num_tokens, size))
+
+        for name in self.sparse_names:
+            counts = self._read(f"{name}.counts", np.int32, num_rows)
+            nnz = int(counts.sum())
+            self.sparse[name] = {
+                "indptr": np.concatenate([[0], np.cumsum(counts, dtype=np.int64)]),
+                "indices": self._map(f"{name}.indices", np.int32, nnz, (nnz,)),
+                "values": self._map(f"{name}.values", np.float32, nnz, (nnz,)),
+            }
+
+    def _changed(self):
+        self._columns = {}
+        self._inverted = {}
+
+    def view(self) -> _View:
+        with self._lock:
+            return _View(
+                len(self.ids),
+                self.alive,
+                dict(self.dense),
+                dict(self.tokens),
+                dict(self.token_starts),
+                dict(self.token_counts),
+            )
+
+    # --- points ---
+
+    def point(self, row: int, with_payload=True, with_vectors=False) -> dict:
+        payload = self.payloads[row]
+        if isinstance(with_payload, (list, tuple)):
+            payload = {key: payload[key] for key in with_payload if key in payload}
+        elif not with_payload:
+            payload = None
+
+        vectors = None
+        if with_vectors:
+            vectors = {}
+            selected = set(with_vectors) if isinstance(with_vectors, (list, tuple)) else None
+            for name in self.dense_names:
+                if selected is None or name in selected:
+                    vectors[name] = np.asarray(self.dense[name][row], dtype=np.float32)
+            for name in self.multivector_names:
+                if selected is not None and name not in selected:
+                    continue
+                start = self.token_starts[name][row]
+                vectors[name] = np.asarray(self.tokens[name][start:start + self.token_counts[name][row]], dtype=np.float32)
+            for name in self.sparse_names:
+                if selected is not None and name not in selected:
+                    continue
+                sparse = self.sparse[name]
+                start, end = sparse["indptr"][row], sparse["indptr"][row + 1]
+                vectors[name] = (sparse["indices"][start:end].tolist(), sparse["values"][start:end].tolist())
+
+        return {"id": self.ids[row], "payload": payload, "vectors": vectors}
+
+    def column(self, key: str) -> np.ndarray:
+        """Payload values of a field for every row (None if missing), cached until the next write."""
+        columns = self._columns
+        if key not in columns:
+            values = np.empty(len(self.payloads), dtype=object)
+            values[:] = [payload.get(key) for payload in self.payloads]
+            columns[key] = values
+        return columns[key]
+
+    def numeric_column(self, key: str) -> np.ndarray:
+        columns = self._columns
+        name = f"{key}\0numeric"
+        if name not in columns:
+            columns[name] = np.array(
+                [v if isinstance(v, (int, float)) and not isinstance(v, bool) else np.nan for v in self.column(key)],
+                dtype=np.float64,
+            )
+        return columns[name]
+
+    # --- search ---
+
+    def dense_search(self, name: str, queries: np.ndarray, limit: int, masks: List[Optional[np.ndarray]], block_rows: int):
+        """
+        Exact top-k of several queries with one matrix product per block of rows.
+
+        :param masks: Per query a boolean array of searchable rows, or None for all rows alive
+        :return: per query (rows, scores), best first
+        """
+        view = self.view()
+        queries = self._prepare(name, np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        matrix = view.dense[name]
+        masks = [fit_mask(mask, view.num_rows) for mask in masks]
+
+        best_rows = [np.zeros(0, dtype=np.int64) for _ in queries]
+        best_scores = [np.zeros(0, dtype=np.float32) for _ in queries]
+        for start in range(0, view.num_rows, block_rows):
+            end = min(start + block_rows, view.num_rows)
+            scores = queries @ np.asarray(matrix[start:end]).T
+            for q in range(len(queries)):
+                allowed = view.alive[start:end] if masks[q] is None else view.alive[start:end] & masks[q][start:end]
+                block_scores = np.where(allowed, scores[q], -np.inf)
+                rows, row_scores = _top_k(block_scores, limit)
+                best_rows[q], best_scores[q] = _merge_top_k(best_rows[q], best_scores[q], rows + start, row_scores, limit)
+
+        return list(zip(best_rows, best_scores))
+
+    def sparse_search(self, name: str, indices, values, limit: int, mask: Optional[np.ndarray]):
+        """Top-k by dot product of the sparse vectors, scored through the inverted index."""
+        with self._lock:
+            view = self.view()
+            tokens, indptr, rows, weights = self.inverted(name)
+        scores = np.zeros(view.num_rows, dtype=np.float32)
+        touched = np.zeros(view.num_rows, dtype=bool)
+        values = self._apply_modifier(name, view, indices, values)
+
+        for token, value in zip(indices, values):
+            position = np.searchsorted(tokens, token)
+            if position == len(tokens) or tokens[position] != token:
+                continue
+            posting = slice(indptr[position], indptr[position + 1])
+            # rows of a token are unique, so a fancy-index add is safe
+            scores[rows[posting]] += np.float32(value) * weights[posting]
+            touched[rows[posting]] = True
+
+        allowed = view.alive & touched
+        if mask is not None:
+            allowed &= fit_mask(mask, view.num_rows)
+        return _top_k(np.where(allowed, scores, -np.inf), limit)
+
+    def _apply_modifier(self, name: str, view, indices, values) -> list:
+        """Query weights times ln(1 + (N - df + 0.5) / (df + 0.5)) for sparse vectors with the IDF modifier, like Qdrant."""
+        if self.schema["sparse_vectors"][name].get("modifier") != "idf":
+            return list(values)
+        tokens, indptr, rows, _ = self.inverted(name)
+        alive = view.alive
+        num_alive = int(alive.sum())
+        weighted = []
+        for token, value in zip(indices, values):
+            position = np.searchsorted(tokens, token)
+            df = 0
+            if position < len(tokens) and tokens[position] == token:
+                df = int(alive[rows[indptr[position]:indptr[position + 1]]].sum())
+            weighted.append(value * np.log(1 + (num_alive - df + 0.5) / (df + 0.5)))
+        return weighted
+
+    def inverted(self, name: str):
+        """token ids (sorted), posting offsets, rows and weights of the sparse vectors of all rows."""
+        with self._lock:
+            if name not in self._inverted:
+                sparse = self.sparse[name]
+                row_of_entry = np.repeat(np.arange(len(sparse["indptr"]) - 1), np.diff(sparse["indptr"]))
+                order = np.argsort(sparse["indices"], kind="stable")
+                sorted_tokens = sparse["indices"][order]
+                tokens, starts = np.unique(sorted_tokens, return_index=True)
+                indptr = np.append(starts, len(sorted_tokens)).astype(np.int64)
+                self._inverted[name] = (tokens, indptr, row_of_entry[order], sparse["values"][order])
+            return self._inverted[name]
+
+    def maxsim(self, name: str, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """ColBERT late-interaction score of the given rows: sum over query tokens of the best matching token."""
+        view = self.view()
+        query = self._prepare(name, np.asarray(query, dtype=np.float32))
+        scores = np.zeros(len(rows), dtype=np.float32)
+        for i, row in enumerate(rows):
+            start = view.token_starts[name][row]
+            tokens = np.asarray(view.tokens[name][start:start + view.token_counts[name][row]], dtype=np.float32)
+            if len(tokens):
+                scores[i] = (query @ tokens.T).max(axis=1).sum()
+        return scores
+
+    def vector_scores(self, name: str, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Dense scores of the given rows, to rescore prefetched candidates."""
+        view = self.view()
+        query = self._prepare(name, np.asarray(query, dtype=np.float32))
+        return np.asarray(view.dense[name][rows]) @ query
+
+    def sparse_scores(self, name: str, indices, values, rows: np.ndarray) -> np.ndarray:
+        query = dict(zip(indices, self._apply_modifier(name, self.view(), indices, values)))
+        sparse = self.sparse[name]
+        scores = np.zeros(len(rows), dtype=np.float32)
+        for i, row in enumerate(rows):
+            start, end = sparse["indptr"][row], sparse["indptr"][row + 1]
+            scores[i] = sum(query.get(int(t), 0.0) * float(w) for t, w in zip(sparse["indices"][start:end], sparse["values"][start:end]))
+        return scores
+
+def fit_mask(mask: Optional[np.ndarray], num_rows: int) -> Optional[np.ndarray]:
+    # a mask computed before rows were added does not match them
+    if mask is None or len(mask) == num_rows:
+        return mask
+    if len(mask) > num_rows:
+        return mask[:num_rows]
+    return np.concatenate([mask, np.zeros(num_rows - len(mask), dtype=bool)])
+
+def _top_k(scores: np.ndarray, limit: int):
+    # indices and scores of the limit best finite scores, best first
+    candidates = np.flatnonzero(np.isfinite(scores))
+    if len(candidates) > limit:
+        part = np.argpartition(-scores[candidates], limit - 1)[:limit]
+        candidates = candidates[part]
+    order = np.argsort(-scores[candidates], kind="stable")
+    return candidates[order], scores[candidates[order]]
+
+def _merge_top_k(rows_a, scores_a, rows_b, scores_b, limit: int):
+    rows = np.concatenate([rows_a, rows_b])
+    scores = np.concatenate([scores_a, scores_b])
+    order = np.argsort(-scores, kind="stable")[:limit]
+    return rows[order], scores[order]
@@ -0,0 +1,7 @@
+from .cache import CachedEmbeddingModel
+from .embedders import Embedder, FlagEmbedder, OnnxEmbedder, create_embedder, export_onnx, check_parity
+from .executor import run_inference, aencode
+
+from .batching import QueryBatcher
+from .query_cache import QueryEmbeddingCache
+from .reranking import RerankerService
@@ -0,0 +1,231 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+
+from concurrent.futures import Future
+from typing import List, Union
+
+from mampfsearch.utils import config, metrics
+
+logger = logging.getLogger(__name__)
+
+_OUTPUTS = {
+    "return_dense": "dense_vecs",
+    "return_sparse": "lexical_weights",
+    "return_colbert_vecs": "colbert_vecs",
+}
+
+class _Request():
+    def __init__(self, texts: List[str], outputs: dict, options: dict, unwrap: bool):
+        self.texts = texts
+        self.outputs = outputs
+        self.options = options
+        self.unwrap = unwrap
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+class MicroBatcher():
+    """
+    Base class of the request coalescing services.
+
+    A collector thread waits for the first queued request and a free inference slot, then gathers everything
+    else that arrives within window_ms (up to max_batch_size items). Subclasses split the collected requests
+    into batches in _dispatch and submit them to the inference executor, so at most config.INFERENCE_WORKERS
+    batches are in flight and the queue grows meanwhile. Every request carries a concurrent Future.
+    """
+
+    metrics_prefix = "batcher"
+
+    def __init__(self, window_ms: float, max_batch_size: int):
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+
+        self._queue = queue.Queue()
+        self._slots = threading.Semaphore(config.INFERENCE_WORKERS)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._collect, name=self.metrics_prefix, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._stopped.set()
+        self._queue.put(None)
+        self._thread.join()
+
+    def _enqueue(self, request) -> Future:
+        if self._stopped.is_set():
+            raise RuntimeError(f"{type(self).__name__} is closed")
+        self._queue.put(request)
+        metrics.set_gauge(f"{self.metrics_prefix}.queue_depth", self._queue.qsize())
+        return request.future
+
+    def _size(self, request) -> int:
+        return 1
+
+    def _dispatch(self, requests: list) -> List[Future]:
+        raise NotImplementedError
+
+    def _start(self, requests: list) -> list:
+        """Called by a batch once it runs. Drops requests whose caller went away and records the wait time."""
+        requests = [request for request in requests if request.future.set_running_or_notify_cancel()]
+        started = time.perf_counter()
+        for request in requests:
+            metrics.observe(f"{self.metrics_prefix}.wait_ms", 1000 * (started - request.enqueued))
+        return requests
+
+    def _collect(self):
+        while not self._stopped.is_set():
+            first = self._queue.get()
+            if first is None:
+                break
+
+            # wait for a free inference slot, requests keep queueing meanwhile
+            self._slots.acquire()
+
+            requests = [first]
+            size = self._size(first)
+            deadline = time.perf_counter() + self.window
+            while size < self.max_batch_size:
+                try:
+                    request = self._queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if request is None:
+                    self._stopped.set()
+                    break
+                requests.append(request)
+                size += self._size(request)
+
+            metrics.set_gauge(f"{self.metrics_prefix}.queue_depth", self._queue.qsize())
+
+            try:
+                futures = self._dispatch(requests)
+            except BaseException as e:
+                self._slots.release()
+                for request in requests:
+                    if request.future.set_running_or_notify_cancel():
+                        request.future.set_exception(e)
+                continue
+
+            # the slot is released once the last batch of this round is done
+            remaining = [len(futures)]
+            remaining_lock = threading.Lock()
+            def release(_future):
+                with remaining_lock:
+                    remaining[0] -= 1
+                    if remaining[0] == 0:
+                        self._slots.release()
+
+            for future in futures:
+                future.add_done_callback(release)
+
+        for request in self._drain():
+            if request.future.set_running_or_notify_cancel():
+                request.future.set_exception(RuntimeError(f"{type(self).__name__} is closed"))
+
+    def _drain(self) -> list:
+        requests = []
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                return requests
+            if request is not None:
+                requests.append(request)
+
+class QueryBatcher(MicroBatcher):
+    """
+    Coalesces query encodings of concurrent requests into batched forward passes.
+
+    Callers use encode (blocking) or aencode (async) like model.encode. Requests with the same extra options
+    are encoded together with the union of the requested output heads; every caller only gets its own rows
+    and the heads it asked for.
+    """
+
+    metrics_prefix = "query_batcher"
+
+    def __init__(self, model, window_ms: float, max_batch_size: int):
+        self.model = model
+        super().__init__(window_ms, max_batch_size)
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        return_dense: bool = True,
+        return_sparse: bool = False,
+        return_colbert_vecs: bool = False,
+        **kwargs,
+    ) -> dict:
+        return self.submit(sentences, return_dense, return_sparse, return_colbert_vecs, **kwargs).result()
+
+    async def aencode(
+        self,
+        sentences: Union[str, List[str]],
+        return_dense: bool = True,
+        return_sparse: bool = False,
+        return_colbert_vecs: bool = False,
+        **kwargs,
+    ) -> dict:
+        future = self.submit(sentences, return_dense, return_sparse, return_colbert_vecs, **kwargs)
+        return await asyncio.wrap_future(future)
+
+    def submit(self, sentences, return_dense=True, return_sparse=False, return_colbert_vecs=False, **kwargs) -> Future:
+        unwrap = isinstance(sentences, str)
+        request = _Request(
+            texts=[sentences] if unwrap else list(sentences),
+            outputs={
+                "return_dense": return_dense,
+                "return_sparse": return_sparse,
+                "return_colbert_vecs": return_colbert_vecs,
+            },
+            # batch_size only changes how a batch is split, the batcher decides it
+            options={k: v for k, v in kwargs.items() if k != "batch_size"},
+            unwrap=unwrap,
+        )
+        return self._enqueue(request)
+
+    def _size(self, request) -> int:
+        return len(request.texts)
+
+    def _dispatch(self, requests: list) -> List[Future]:
+        groups = {}
+        for request in requests:
+            groups.setdefault(tuple(sorted(request.options.items())), []).append(request)
+
+        return [
+            config.get_inference_executor().submit(self._encode_group, group)
+            for group in groups.values()
+        ]
+
+    def _encode_group(self, requests: List[_Request]):
+        requests = self._start(requests)
+        if not requests:
+            return
+
+        started = time.perf_counter()
+
+        texts = [text for request in requests for text in request.texts]
+        outputs = {name: any(request.outputs[name] for request in requests) for name in _OUTPUTS}
+        metrics.observe("query_batcher.batch_size", len(texts))
+
+        try:
+            embeddings = self.model.encode(texts, batch_size=len(texts), **outputs, **requests[0].options)
+        except BaseException as e:
+            for request in requests:
+                request.future.set_exception(e)
+            return
+
+        metrics.observe("query_batcher.encode_ms", 1000 * (time.perf_counter() - started))
+
+        start = 0
+        for request in requests:
+            end = start + len(request.texts)
+            result = {
+                key: embeddings[key][start:end] if request.outputs[name] else None
+                for name, key in _OUTPUTS.items()
+            }
+            if request.unwrap:
+                result = {k: (v[0] if v is not None else None) for k, v in result.items()}
+            request.future.set_result(result)
+            start = end
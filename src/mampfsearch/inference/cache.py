@@ -0,0 +1,190 @@
+import hashlib
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from pathlib import Path
+from typing import List, Union
+
+logger = logging.getLogger(__name__)
+
+class CachedEmbeddingModel():
+    """
+    Persistent, content-addressed cache in front of a BGE-M3 model.
+
+    Exposes the same encode() interface as BGEM3FlagModel. Every text is looked up by a hash of
+    (model name, requested outputs, text); only misses are sent to the wrapped model.
+    Entries are stored in a sqlite file and evicted least-recently-used once the cache exceeds max_bytes.
+    """
+
+    def __init__(self, model, model_name: str, path: Path, max_bytes: int):
+        self.model = model
+        self.model_name = model_name
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+        self._db.commit()
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        return_dense: bool = True,
+        return_sparse: bool = False,
+        return_colbert_vecs: bool = False,
+        **kwargs,
+    ) -> dict:
+        input_was_string = isinstance(sentences, str)
+        texts = [sentences] if input_was_string else list(sentences)
+
+        outputs = (return_dense, return_sparse, return_colbert_vecs)
+        # batch_size only changes how the work is split, every other argument can change the result
+        options = {k: v for k, v in kwargs.items() if k != "batch_size"}
+        keys = [self._key(text, outputs, options) for text in texts]
+
+        cached = self._get_many(keys)
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            # deduplicate, overlapping chunks and repeated entities often contain the same text
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            embeddings = self.model.encode(
+                unique,
+                return_dense=return_dense,
+                return_sparse=return_sparse,
+                return_colbert_vecs=return_colbert_vecs,
+                **kwargs,
+            )
+
+            new_entries = {}
+            for j, text in enumerate(unique):
+                new_entries[self._key(text, outputs, options)] = {
+                    "dense_vecs": embeddings["dense_vecs"][j] if return_dense else None,
+                    "lexical_weights": embeddings["lexical_weights"][j] if return_sparse else None,
+                    "colbert_vecs": embeddings["colbert_vecs"][j] if return_colbert_vecs else None,
+                }
+            self._put_many(new_entries)
+            cached.update(new_entries)
+
+        entries = [cached[key] for key in keys]
+        result = {
+            "dense_vecs": np.stack([e["dense_vecs"] for e in entries]) if return_dense else None,
+            "lexical_weights": [e["lexical_weights"] for e in entries] if return_sparse else None,
+            "colbert_vecs": [e["colbert_vecs"] for e in entries] if return_colbert_vecs else None,
+        }
+
+        # BGEM3FlagModel unwraps the batch dimension when a single string is passed
+        if input_was_string:
+            result = {k: (v[0] if v is not None else None) for k, v in result.items()}
+
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embeddings").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "path": str(self.path),
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM embeddings")
+            self._db.commit()
+        logger.info(f"Cleared embedding cache {self.path}")
+
+    def __getattr__(self, name):
+        # everything besides encode is delegated to the wrapped model
+        return getattr(self.model, name)
+
+    def _key(self, text: str, outputs: tuple, options: dict) -> str:
+        outputs_str = ",".join(
+            name for name, requested in zip(("dense", "sparse", "colbert"), outputs) if requested
+        )
+        options_str = ",".join(f"{k}={v}" for k, v in sorted(options.items()))
+        content = "\0".join([self.model_name, outputs_str, options_str, text])
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def _get_many(self, keys: List[str]) -> dict:
+        unique_keys = list(dict.fromkeys(keys))
+        found = {}
+        now = time.time()
+
+        with self._lock:
+            # sqlite limits the number of query parameters
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._db.execute(
+                    f"SELECT key, value FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, value in rows:
+                    found[key] = pickle.loads(value)
+
+            if found:
+                self._db.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._db.commit()
+
+        return found
+
+    def _put_many(self, entries: dict):
+        now = time.time()
+        rows = []
+        for key, entry in entries.items():
+            value = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+            rows.append((key, value, len(value), now))
+
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # walk the entries from least to most recently used until enough space is freed
+        to_free = total - self.max_bytes
+        evicted_keys = []
+        for key, size in self._db.execute("SELECT key, size FROM embeddings ORDER BY last_access"):
+            evicted_keys.append((key,))
+            to_free -= size
+            if to_free <= 0:
+                break
+
+        self._db.executemany("DELETE FROM embeddings WHERE key = ?", evicted_keys)
+        self.evictions += len(evicted_keys)
+        logger.debug(f"Evicted {len(evicted_keys)} entries from the embedding cache")
@@ -0,0 +1,319 @@
+import json
+import logging
+import time
+
+import numpy as np
+
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List, Optional, Union
+
+from mampfsearch.utils import config, helpers
+
+logger = logging.getLogger(__name__)
+
+class Embedder(ABC):
+    """
+    Interface of the BGE-M3 embedding backends.
+
+    encode has the signature and output of BGEM3FlagModel.encode: a dict with "dense_vecs" (normalised, one row
+    per text), "lexical_weights" (token id -> weight per text) and "colbert_vecs" (normalised token vectors per
+    text), each None unless requested. A single string returns the outputs of that text without batch dimension.
+    """
+
+    # identifies the backend in embedding cache keys, different backends produce slightly different vectors
+    name: str
+
+    @abstractmethod
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 12,
+        max_length: int = 8192,
+        return_dense: bool = True,
+        return_sparse: bool = False,
+        return_colbert_vecs: bool = False,
+    ) -> dict:
+        pass
+
+class FlagEmbedder(Embedder):
+    """PyTorch backend, the reference implementation of BGE-M3 from FlagEmbedding."""
+
+    def __init__(self, model_name: str, use_fp16: bool = True, num_threads: Optional[int] = None):
+        if num_threads:
+            import torch
+            torch.set_num_threads(num_threads)
+
+        from FlagEmbedding import BGEM3FlagModel
+        self.model = BGEM3FlagModel(model_name, use_fp16=use_fp16)
+        self.name = model_name
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 12,
+        max_length: int = 8192,
+        return_dense: bool = True,
+        return_sparse: bool = False,
+        return_colbert_vecs: bool = False,
+    ) -> dict:
+        return self.model.encode(
+            sentences,
+            batch_size=batch_size,
+            max_length=max_length,
+            return_dense=return_dense,
+            return_sparse=return_sparse,
+            return_colbert_vecs=return_colbert_vecs,
+        )
+
+class OnnxEmbedder(Embedder):
+    """
+    ONNX Runtime backend for CPU serving, created with export_onnx.
+
+    The exported graph only contains the XLM-RoBERTa encoder; the three BGE-M3 heads are small linear layers
+    that are applied in numpy on the last hidden state, exactly like BGEM3FlagModel does:
+    dense = normalised CLS state, sparse = relu(sparse_linear) per token (max per token id, special tokens
+    dropped), colbert = colbert_linear on all states but CLS, padding masked, normalised.
+    """
+
+    def __init__(self, model_dir: Path, num_threads: Optional[int] = None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_dir = Path(model_dir)
+        with open(model_dir / "mampfsearch.json", encoding="utf-8") as f:
+            metadata = json.load(f)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+
+        self.session = ort.InferenceSession(
+            str(model_dir / metadata["model_file"]),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+        self.name = f"{metadata['model_name']}:onnx" + ("-int8" if metadata["quantized"] else "")
+
+        heads = np.load(model_dir / "heads.npz")
+        self.colbert_weight = heads["colbert_weight"]
+        self.colbert_bias = heads["colbert_bias"]
+        self.sparse_weight = heads["sparse_weight"]
+        self.sparse_bias = heads["sparse_bias"]
+
+        self.special_ids = np.array([
+            token_id for token_id in {
+                self.tokenizer.cls_token_id,
+                self.tokenizer.eos_token_id,
+                self.tokenizer.pad_token_id,
+                self.tokenizer.unk_token_id,
+            } if token_id is not None
+        ], dtype=np.int64)
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 12,
+        max_length: int = 8192,
+        return_dense: bool = True,
+        return_sparse: bool = False,
+        return_colbert_vecs: bool = False,
+    ) -> dict:
+        texts = [sentences] if isinstance(sentences, str) else list(sentences)
+
+        dense_vecs = [None] * len(texts)
+        lexical_weights = [None] * len(texts)
+        colbert_vecs = [None] * len(texts)
+
+        # similar lengths per batch keep the padding small
+        for batch in helpers.length_sorted_batches(texts, batch_size):
+            tokens = self.tokenizer(
+                [texts[i] for i in batch],
+                padding=True,
+                truncation=True,
+                max_length=max_length,
+                return_tensors="np",
+            )
+            input_ids = tokens["input_ids"].astype(np.int64)
+            attention_mask = tokens["attention_mask"].astype(np.int64)
+            hidden = self.session.run(
+                ["last_hidden_state"],
+                {"input_ids": input_ids, "attention_mask": attention_mask},
+            )[0].astype(np.float32)
+
+            for j, i in enumerate(batch):
+                num_tokens = int(attention_mask[j].sum())
+                if return_dense:
+                    dense_vecs[i] = _normalize(hidden[j, 0])
+                if return_sparse:
+                    lexical_weights[i] = self._lexical_weights(hidden[j, :num_tokens], input_ids[j, :num_tokens])
+                if return_colbert_vecs:
+                    vecs = hidden[j, 1:num_tokens] @ self.colbert_weight.T + self.colbert_bias
+                    colbert_vecs[i] = _normalize(vecs)
+
+        result = {
+            "dense_vecs": np.stack(dense_vecs) if return_dense else None,
+            "lexical_weights": lexical_weights if return_sparse else None,
+            "colbert_vecs": colbert_vecs if return_colbert_vecs else None,
+        }
+
+        # like BGEM3FlagModel, unwrap the batch dimension when a single string is passed
+        if isinstance(sentences, str):
+            result = {k: (v[0] if v is not None else None) for k, v in result.items()}
+
+        return result
+
+    def _lexical_weights(self, hidden: np.ndarray, input_ids: np.ndarray) -> dict:
+        weights = np.maximum(hidden @ self.sparse_weight.T + self.sparse_bias, 0.0)[:, 0]
+
+        keep = (weights > 0) & ~np.isin(input_ids, self.special_ids)
+        token_ids, weights = input_ids[keep], weights[keep]
+
+        # a token that occurs more than once keeps its largest weight
+        order = np.lexsort((-weights, token_ids))
+        token_ids, first = np.unique(token_ids[order], return_index=True)
+        return dict(zip(map(str, token_ids.tolist()), weights[order][first].tolist()))
+
+def create_embedder(backend: str = config.EMBEDDING_BACKEND) -> Embedder:
+    if backend == "flag":
+        return FlagEmbedder(config.EMBEDDING_MODEL, use_fp16=config.EMBEDDING_USE_FP16, num_threads=config.EMBEDDING_NUM_THREADS)
+    if backend == "onnx":
+        return OnnxEmbedder(config.EMBEDDING_ONNX_PATH, num_threads=config.EMBEDDING_NUM_THREADS)
+    raise ValueError(f"Unknown embedding backend {backend}, expected 'flag' or 'onnx'")
+
+def export_onnx(
+        output_dir: Path,
+        model_name: str = config.EMBEDDING_MODEL,
+        quantize: bool = True,
+        opset: int = 17,
+    ) -> Path:
+    """
+    Export the BGE-M3 encoder to ONNX for OnnxEmbedder, with dynamically int8-quantized weights if quantize.
+
+    Writes the graph, the tokenizer, the head weights (heads.npz) and a small metadata file to output_dir.
+    Needs torch, transformers, huggingface_hub and onnxruntime.
+    """
+    import torch
+    from huggingface_hub import snapshot_download
+    from transformers import AutoModel, AutoTokenizer
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    model_path = Path(snapshot_download(model_name))
+    tokenizer = AutoTokenizer.from_pretrained(str(model_path))
+    model = AutoModel.from_pretrained(str(model_path)).eval()
+
+    # the BGE-M3 checkpoint keeps the heads next to the encoder weights
+    colbert = torch.load(model_path / "colbert_linear.pt", map_location="cpu")
+    sparse = torch.load(model_path / "sparse_linear.pt", map_location="cpu")
+    np.savez(
+        output_dir / "heads.npz",
+        colbert_weight=colbert["weight"].float().numpy(),
+        colbert_bias=colbert["bias"].float().numpy(),
+        sparse_weight=sparse["weight"].float().numpy(),
+        sparse_bias=sparse["bias"].float().numpy(),
+    )
+    tokenizer.save_pretrained(str(output_dir))
+
+    class Encoder(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+    sample = tokenizer(["MampfSearch export"], return_tensors="pt")
+    fp32_path = output_dir / "model.onnx"
+    logger.info(f"Exporting {model_name} to {fp32_path}")
+    with torch.no_grad():
+        torch.onnx.export(
+            Encoder(model),
+            (sample["input_ids"], sample["attention_mask"]),
+            str(fp32_path),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "last_hidden_state": {0: "batch", 1: "sequence"},
+            },
+            opset_version=opset,
+        )
+
+    model_file = fp32_path.name
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        int8_path = output_dir / "model.int8.onnx"
+        logger.info(f"Quantizing {fp32_path} to {int8_path}")
+        quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+        model_file = int8_path.name
+
+    with open(output_dir / "mampfsearch.json", "w", encoding="utf-8") as f:
+        json.dump({"model_name": model_name, "model_file": model_file, "quantized": quantize}, f)
+
+    return output_dir
+
+def check_parity(reference: Embedder, candidate: Embedder, texts: List[str], batch_size: int = 12) -> dict:
+    """
+    Compare the outputs of an embedder against the reference backend (usually FlagEmbedder).
+
+    Reports per-text cosine similarities of the dense vectors, of the lexical weights (as sparse vectors)
+    and of the ColBERT MaxSim self-scores, i.e. how well the candidate's token vectors match the reference's,
+    plus the encode time of both backends.
+    """
+    outputs = {}
+    durations = {}
+    for label, embedder in (("reference", reference), ("candidate", candidate)):
+        started = time.perf_counter()
+        outputs[label] = embedder.encode(
+            texts,
+            batch_size=batch_size,
+            return_dense=True,
+            return_sparse=True,
+            return_colbert_vecs=True,
+        )
+        durations[label] = time.perf_counter() - started
+
+    ref, cand = outputs["reference"], outputs["candidate"]
+    dense = [float(np.dot(_normalize(a), _normalize(b))) for a, b in zip(ref["dense_vecs"], cand["dense_vecs"])]
+    sparse = [_sparse_cosine(a, b) for a, b in zip(ref["lexical_weights"], cand["lexical_weights"])]
+    colbert = [_maxsim_agreement(np.asarray(a), np.asarray(b)) for a, b in zip(ref["colbert_vecs"], cand["colbert_vecs"])]
+
+    return {
+        "num_texts": len(texts),
+        "dense_cosine_mean": float(np.mean(dense)),
+        "dense_cosine_min": float(np.min(dense)),
+        "sparse_cosine_mean": float(np.mean(sparse)),
+        "sparse_cosine_min": float(np.min(sparse)),
+        "colbert_maxsim_mean": float(np.mean(colbert)),
+        "colbert_maxsim_min": float(np.min(colbert)),
+        "reference_seconds": durations["reference"],
+        "candidate_seconds": durations["candidate"],
+        "speedup": durations["reference"] / durations["candidate"] if durations["candidate"] else 0.0,
+    }
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def _sparse_cosine(a: dict, b: dict) -> float:
+    dot = sum(float(weight) * float(b[token]) for token, weight in a.items() if token in b)
+    norm_a = np.sqrt(sum(float(weight) ** 2 for weight in a.values()))
+    norm_b = np.sqrt(sum(float(weight) ** 2 for weight in b.values()))
+    if not norm_a or not norm_b:
+        return 1.0 if norm_a == norm_b else 0.0
+    return dot / (norm_a * norm_b)
+
+def _maxsim_agreement(reference: np.ndarray, candidate: np.ndarray) -> float:
+    # mean over reference tokens of the best matching candidate token, 1.0 for identical token vectors
+    if not len(reference) or not len(candidate):
+        return 1.0 if len(reference) == len(candidate) else 0.0
+    similarities = _normalize(reference) @ _normalize(candidate).T
+    return float(similarities.max(axis=1).mean())
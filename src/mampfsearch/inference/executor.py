@@ -0,0 +1,14 @@
+import asyncio
+import functools
+
+from mampfsearch.utils import config
+
+async def run_inference(fn, *args, **kwargs):
+    """Run a blocking model call in the bounded inference executor and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(config.get_inference_executor(), functools.partial(fn, *args, **kwargs))
+
+async def aencode(sentences, **kwargs) -> dict:
+    """Async version of config.get_embedder().encode, the model runs off the event loop."""
+    embedder = config.get_embedder()
+    return await run_inference(embedder.encode, sentences, **kwargs)
@@ -0,0 +1,165 @@
+import logging
+import threading
+import time
+import unicodedata
+
+from collections import OrderedDict
+from typing import List, Optional, Union
+
+import numpy as np
+
+from mampfsearch.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+_OUTPUTS = {
+    "return_dense": "dense_vecs",
+    "return_sparse": "lexical_weights",
+    "return_colbert_vecs": "colbert_vecs",
+}
+
+def normalize_query(text: str) -> str:
+    """Queries that only differ in whitespace or unicode composition share one cache entry."""
+    return unicodedata.normalize("NFC", " ".join(text.split()))
+
+class QueryEmbeddingCache():
+    """
+    In-memory LRU cache of query encodings in front of an encoder with the model.encode interface.
+
+    Entries are keyed by the normalised text and the extra encode options and hold every output head computed
+    for the text so far. A request for heads that are not cached yet only computes those and adds them to the
+    entry, e.g. colbert for a query that was cached with dense+sparse. Entries older than ttl_seconds are
+    recomputed; at most max_entries are kept.
+    """
+
+    def __init__(self, encoder, max_entries: int, ttl_seconds: Optional[float] = None):
+        self.encoder = encoder
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        return_dense: bool = True,
+        return_sparse: bool = False,
+        return_colbert_vecs: bool = False,
+        **kwargs,
+    ) -> dict:
+        texts, requested, options, found, missing = self._lookup(sentences, return_dense, return_sparse, return_colbert_vecs, kwargs)
+        for heads, group in self._missing_groups(missing):
+            self._store(group, heads, options, self.encoder.encode(group, **heads, **options), found)
+        return self._result(sentences, texts, requested, found)
+
+    async def aencode(
+        self,
+        sentences: Union[str, List[str]],
+        return_dense: bool = True,
+        return_sparse: bool = False,
+        return_colbert_vecs: bool = False,
+        **kwargs,
+    ) -> dict:
+        texts, requested, options, found, missing = self._lookup(sentences, return_dense, return_sparse, return_colbert_vecs, kwargs)
+        for heads, group in self._missing_groups(missing):
+            self._store(group, heads, options, await self.encoder.aencode(group, **heads, **options), found)
+        return self._result(sentences, texts, requested, found)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = len(self._entries)
+        hits = metrics.get_counter("query_cache.hits")
+        misses = metrics.get_counter("query_cache.misses")
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __getattr__(self, name):
+        # everything else (e.g. close) is delegated to the wrapped encoder
+        return getattr(self.encoder, name)
+
+    def _lookup(self, sentences, return_dense, return_sparse, return_colbert_vecs, kwargs):
+        texts = [sentences] if isinstance(sentences, str) else list(sentences)
+        texts = [normalize_query(text) for text in texts]
+        requested = {
+            "return_dense": return_dense,
+            "return_sparse": return_sparse,
+            "return_colbert_vecs": return_colbert_vecs,
+        }
+        options = {k: v for k, v in kwargs.items() if k != "batch_size"}
+        options_key = tuple(sorted(options.items()))
+
+        # text -> outputs known so far, text -> tuple of missing heads
+        found = {}
+        missing = {}
+        now = time.monotonic()
+        with self._lock:
+            for text in dict.fromkeys(texts):
+                key = (text, options_key)
+                entry = self._entries.get(key)
+                if entry is not None and self.ttl_seconds and now - entry["created"] > self.ttl_seconds:
+                    del self._entries[key]
+                    entry = None
+
+                heads = tuple(
+                    name for name, key_name in _OUTPUTS.items()
+                    if requested[name] and (entry is None or key_name not in entry["outputs"])
+                )
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                found[text] = dict(entry["outputs"]) if entry is not None else {}
+                if heads:
+                    missing[text] = heads
+
+        metrics.increment("query_cache.hits", len(found) - len(missing))
+        metrics.increment("query_cache.misses", len(missing))
+        return texts, requested, options, found, missing
+
+    def _missing_groups(self, missing: dict):
+        # texts that miss the same heads are encoded together
+        groups = {}
+        for text, heads in missing.items():
+            groups.setdefault(heads, []).append(text)
+        for heads, group in groups.items():
+            yield {name: name in heads for name in _OUTPUTS}, group
+
+    def _store(self, texts: List[str], heads: dict, options: dict, embeddings: dict, found: dict):
+        options_key = tuple(sorted(options.items()))
+        now = time.monotonic()
+        with self._lock:
+            for j, text in enumerate(texts):
+                key = (text, options_key)
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = self._entries[key] = {"created": now, "outputs": {}}
+                for name, key_name in _OUTPUTS.items():
+                    if heads[name]:
+                        entry["outputs"][key_name] = found[text][key_name] = embeddings[key_name][j]
+                self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _result(self, sentences, texts: List[str], requested: dict, found: dict) -> dict:
+        outputs = [found[text] for text in texts]
+
+        result = {
+            "dense_vecs": np.stack([o["dense_vecs"] for o in outputs]) if requested["return_dense"] else None,
+            "lexical_weights": [o["lexical_weights"] for o in outputs] if requested["return_sparse"] else None,
+            "colbert_vecs": [o["colbert_vecs"] for o in outputs] if requested["return_colbert_vecs"] else None,
+        }
+
+        # like BGEM3FlagModel, unwrap the batch dimension when a single string is passed
+        if isinstance(sentences, str):
+            result = {k: (v[0] if v is not None else None) for k, v in result.items()}
+
+        return result
@@ -0,0 +1,195 @@
+import base64
+import logging
+
+import numpy as np
+
+from typing import List, Optional, Union
+
+from mampfsearch.inference.embedders import Embedder
+
+logger = logging.getLogger(__name__)
+
+# Clients of the shared embedding worker (mampfsearch/worker.py), used by the API processes instead of
+# loading their own models when config.EMBEDDING_WORKER_URL is set.
+# Arrays are sent as base64 float32 buffers, JSON lists of ColBERT vectors would be several times larger.
+
+def pack_array(array) -> dict:
+    array = np.ascontiguousarray(array, dtype=np.float32)
+    return {"shape": list(array.shape), "data": base64.b64encode(array.tobytes()).decode("ascii")}
+
+def unpack_array(packed: dict) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(packed["data"]), dtype=np.float32).reshape(packed["shape"])
+
+def pack_embeddings(embeddings: dict) -> dict:
+    dense_vecs = embeddings.get("dense_vecs")
+    lexical_weights = embeddings.get("lexical_weights")
+    colbert_vecs = embeddings.get("colbert_vecs")
+    return {
+        "dense_vecs": pack_array(dense_vecs) if dense_vecs is not None else None,
+        "lexical_weights": [
+            {str(token): float(weight) for token, weight in weights.items()} for weights in lexical_weights
+        ] if lexical_weights is not None else None,
+        "colbert_vecs": [pack_array(vecs) for vecs in colbert_vecs] if colbert_vecs is not None else None,
+    }
+
+def unpack_embeddings(packed: dict) -> dict:
+    return {
+        "dense_vecs": unpack_array(packed["dense_vecs"]) if packed["dense_vecs"] is not None else None,
+        "lexical_weights": packed["lexical_weights"],
+        "colbert_vecs": [unpack_array(vecs) for vecs in packed["colbert_vecs"]] if packed["colbert_vecs"] is not None else None,
+    }
+
+def _client_options(url: str, timeout: float, asynchronous: bool) -> dict:
+    import httpx
+
+    # unix:///run/mampfsearch/embedding.sock or http://host:port
+    if url.startswith("unix://"):
+        transport_class = httpx.AsyncHTTPTransport if asynchronous else httpx.HTTPTransport
+        return {"base_url": "http://embedding-worker", "transport": transport_class(uds=url[len("unix://"):]), "timeout": timeout}
+    return {"base_url": url, "timeout": timeout}
+
+class _RemoteClient():
+    """Lazily created sync and async HTTP clients of the embedding worker."""
+
+    def __init__(self, url: str, timeout: float):
+        self.url = url
+        self.timeout = timeout
+        self._client = None
+        self._async_client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import httpx
+            self._client = httpx.Client(**_client_options(self.url, self.timeout, asynchronous=False))
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            import httpx
+            self._async_client = httpx.AsyncClient(**_client_options(self.url, self.timeout, asynchronous=True))
+        return self._async_client
+
+    def post(self, path: str, body: dict) -> dict:
+        response = self.client.post(path, json=body)
+        response.raise_for_status()
+        return response.json()
+
+    async def apost(self, path: str, body: dict) -> dict:
+        response = await self.async_client.post(path, json=body)
+        response.raise_for_status()
+        return response.json()
+
+    def get(self, path: str) -> dict:
+        response = self.client.get(path)
+        response.raise_for_status()
+        return response.json()
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+        # the async client belongs to the event loop that created it, it is closed with aclose
+
+    async def aclose(self):
+        self.close()
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+class RemoteEmbedder(Embedder):
+    """
+    Embedder that sends encode calls to the embedding worker.
+
+    kind "query" uses the worker's query batcher and query cache (shared by all API processes),
+    "document" its embedding cache. Besides encode it has aencode and close like the QueryBatcher,
+    so it can stand in for the query encoder.
+    """
+
+    def __init__(self, url: str, kind: str = "document", timeout: float = 120):
+        self.remote = _RemoteClient(url, timeout)
+        self.kind = kind
+        self.name = f"worker:{url}"
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: Optional[int] = None,
+        max_length: Optional[int] = None,
+        return_dense: bool = True,
+        return_sparse: bool = False,
+        return_colbert_vecs: bool = False,
+    ) -> dict:
+        body = self._body(sentences, batch_size, max_length, return_dense, return_sparse, return_colbert_vecs)
+        return self._result(sentences, self.remote.post("/encode", body))
+
+    async def aencode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: Optional[int] = None,
+        max_length: Optional[int] = None,
+        return_dense: bool = True,
+        return_sparse: bool = False,
+        return_colbert_vecs: bool = False,
+    ) -> dict:
+        body = self._body(sentences, batch_size, max_length, return_dense, return_sparse, return_colbert_vecs)
+        return self._result(sentences, await self.remote.apost("/encode", body))
+
+    def stats(self) -> dict:
+        """Embedding cache stats of the worker."""
+        return self.remote.get("/cache")
+
+    def close(self):
+        self.remote.close()
+
+    async def aclose(self):
+        await self.remote.aclose()
+
+    def _body(self, sentences, batch_size, max_length, return_dense, return_sparse, return_colbert_vecs) -> dict:
+        return {
+            "texts": [sentences] if isinstance(sentences, str) else list(sentences),
+            "kind": self.kind,
+            "return_dense": return_dense,
+            "return_sparse": return_sparse,
+            "return_colbert_vecs": return_colbert_vecs,
+            "batch_size": batch_size,
+            "max_length": max_length,
+        }
+
+    def _result(self, sentences, packed: dict) -> dict:
+        result = unpack_embeddings(packed)
+        if isinstance(sentences, str):
+            result = {k: (v[0] if v is not None else None) for k, v in result.items()}
+        return result
+
+class RemoteReranker():
+    """Stand-in for the RerankerService that scores (query, passage) pairs in the embedding worker."""
+
+    def __init__(self, url: str, timeout: float = 120):
+        self.remote = _RemoteClient(url, timeout)
+
+    def score(self, query: str, passages: List[str]) -> List[float]:
+        return self.remote.post("/rerank", {"query": query, "passages": passages})["scores"]
+
+    async def ascore(self, query: str, passages: List[str]) -> List[float]:
+        return (await self.remote.apost("/rerank", {"query": query, "passages": passages}))["scores"]
+
+    def close(self):
+        self.remote.close()
+
+    async def aclose(self):
+        await self.remote.aclose()
+
+def worker_available(url: str, timeout: float = 2) -> bool:
+    """True if the embedding worker at url answers its health check."""
+    import httpx
+
+    try:
+        with httpx.Client(**_client_options(url, timeout, asynchronous=False)) as client:
+            response = client.get("/health")
+            response.raise_for_status()
+    except (httpx.HTTPError, OSError) as e:
+        logger.warning(f"Embedding worker at {url} is not available: {e}")
+        return False
+    return True
@@ -0,0 +1,115 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import List, Tuple
+
+from mampfsearch.inference.batching import MicroBatcher
+from mampfsearch.utils import config, metrics
+
+logger = logging.getLogger(__name__)
+
+class _PairRequest():
+    def __init__(self, pairs: List[Tuple[str, str]]):
+        self.pairs = pairs
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+class RerankerService(MicroBatcher):
+    """
+    Process-wide cross-encoder that scores (query, passage) pairs.
+
+    Pairs of concurrent requests are scored in shared batches, and every score is cached by a hash of
+    query and passage, so the same candidates of a repeated or paginated query are not scored again.
+    The model is any object with FlagReranker's compute_score(pairs, batch_size=..., normalize=...).
+    Scores are normalized to [0, 1] with a sigmoid.
+    """
+
+    metrics_prefix = "reranker"
+
+    def __init__(self, model, window_ms: float, max_batch_size: int, cache_max_entries: int):
+        self.model = model
+        self.cache_max_entries = cache_max_entries
+        self._scores: "OrderedDict[str, float]" = OrderedDict()
+        self._scores_lock = threading.Lock()
+        super().__init__(window_ms, max_batch_size)
+
+    def score(self, query: str, passages: List[str]) -> List[float]:
+        keys, scores, missing = self._lookup(query, passages)
+        if missing:
+            self._store(missing, self._enqueue(_PairRequest([pair for _, pair in missing])).result(), scores)
+        return self._result(keys, scores)
+
+    async def ascore(self, query: str, passages: List[str]) -> List[float]:
+        keys, scores, missing = self._lookup(query, passages)
+        if missing:
+            future = self._enqueue(_PairRequest([pair for _, pair in missing]))
+            self._store(missing, await asyncio.wrap_future(future), scores)
+        return self._result(keys, scores)
+
+    def _lookup(self, query: str, passages: List[str]):
+        keys = [_pair_key(query, passage) for passage in passages]
+        scores = {}
+        missing = {}
+        with self._scores_lock:
+            for key, passage in zip(keys, passages):
+                if key in self._scores:
+                    self._scores.move_to_end(key)
+                    scores[key] = self._scores[key]
+                elif key not in missing:
+                    missing[key] = (query, passage)
+
+        metrics.increment("reranker.cache_hits", len(scores))
+        metrics.increment("reranker.cache_misses", len(missing))
+        return keys, scores, list(missing.items())
+
+    def _store(self, missing: list, new_scores: List[float], scores: dict):
+        with self._scores_lock:
+            for (key, _), score in zip(missing, new_scores):
+                self._scores[key] = scores[key] = score
+                self._scores.move_to_end(key)
+            while len(self._scores) > self.cache_max_entries:
+                self._scores.popitem(last=False)
+
+    def _result(self, keys: List[str], scores: dict) -> List[float]:
+        return [scores[key] for key in keys]
+
+    def _size(self, request) -> int:
+        return len(request.pairs)
+
+    def _dispatch(self, requests: list) -> List[Future]:
+        return [config.get_inference_executor().submit(self._score_batch, requests)]
+
+    def _score_batch(self, requests: List[_PairRequest]):
+        requests = self._start(requests)
+        if not requests:
+            return
+
+        started = time.perf_counter()
+        pairs = [list(pair) for request in requests for pair in request.pairs]
+        metrics.observe("reranker.batch_size", len(pairs))
+
+        try:
+            scores = self.model.compute_score(pairs, batch_size=config.RERANKER_BATCH_SIZE, normalize=True)
+        except BaseException as e:
+            for request in requests:
+                request.future.set_exception(e)
+            return
+
+        # compute_score unwraps a single pair
+        if not isinstance(scores, list):
+            scores = [scores]
+        metrics.observe("reranker.score_ms", 1000 * (time.perf_counter() - started))
+
+        start = 0
+        for request in requests:
+            end = start + len(request.pairs)
+            request.future.set_result([float(score) for score in scores[start:end]])
+            start = end
+
+def _pair_key(query: str, passage: str) -> str:
+    return hashlib.sha256(f"{query}\0{passage}".encode("utf-8")).hexdigest()
@@ -3,16 +3,30 @@ import logging
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from mampfsearch.utils import config
-from mampfsearch.routes import maintenance, ingest, lectures, graph
+from mampfsearch.routes import maintenance, ingest, lectures, graph, jobs
+from mampfsearch.core.jobs import get_job_manager
 
 logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    embedding_model = config.get_embedding_model()
+    embedder = config.get_embedder()
+    query_encoder = config.get_query_encoder()
+    reranker = config.get_reranker()
     qdrant_client = config.get_qdrant_client()
+    async_qdrant_client = config.get_async_qdrant_client()
     ollama_client = config.get_llm_client()
     yield
+    get_job_manager().shutdown()
+    if config.use_embedding_worker():
+        await embedder.aclose()
+        await query_encoder.aclose()
+        await reranker.aclose()
+    else:
+        query_encoder.close()
+        reranker.close()
+    config.get_inference_executor().shutdown(wait=False, cancel_futures=True)
+    await async_qdrant_client.close()
 
 app = FastAPI(
     title="MampfSearch API",
@@ -25,6 +39,7 @@ app.include_router(maintenance.router)
 app.include_router(ingest.router)
 app.include_router(lectures.router)
 app.include_router(graph.router)
+app.include_router(jobs.router)
 
 @app.get("/")
 async def root():
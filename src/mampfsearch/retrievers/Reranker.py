@@ -1,44 +1,112 @@
+import time
+
 from .base import BaseRetriever
-from typing import List
-from mampfsearch.utils import config
+from typing import List, Optional
+from mampfsearch.utils import config, metrics
 from mampfsearch.utils.models import LectureRetrievalItem
 
 class RerankerRetriever(BaseRetriever):
-    
-    def __init__(self, base_retriever: BaseRetriever, reranker: 'Reranker'):
+
+    def __init__(
+            self,
+            base_retriever: BaseRetriever,
+            reranker: 'RerankerService',
+            chunk_size: int = config.RERANK_CHUNK_SIZE,
+            time_budget_ms: Optional[float] = config.RERANK_TIME_BUDGET_MS,
+            early_exit_margin: Optional[float] = config.RERANK_EARLY_EXIT_MARGIN,
+        ):
         """
         Initialize the RerankerRetriever with a base retriever and a reranker.
 
+        Candidates are cross-encoded in chunks of chunk_size in first-stage order (cascade). Reranking stops
+        once the k-th best reranked score beats, by early_exit_margin, every reranked candidate the first stage
+        ranked below all of the current top k (candidates further down the first-stage ranking are assumed to
+        score even lower), or once time_budget_ms is used up. The number of cross-encoded candidates of the last
+        call is kept in num_reranked, whether the time budget cut it short in budget_exhausted.
+
         :param base_retriever: Base retriever to get initial results for reranking
-        :param reranker: Reranker to rerank results from the base retriever
+        :param reranker: Shared reranker service (config.get_reranker()) that scores the results of the base retriever
+        :param chunk_size: Number of candidates cross-encoded per cascade step, None reranks all at once
+        :param time_budget_ms: No further chunk is started after this time, None for no budget
+        :param early_exit_margin: Score margin for stopping early, None to disable early exit
         """
         self.base_retriever = base_retriever
         self.reranker = reranker
-    
-    def retrieve(self, query: str, collection_name: str, limit: int) -> List[LectureRetrievalItem]:
-        initial_points = self.base_retriever.retrieve(query, collection_name, config.PREFETCH_LIMIT)
-
-        documents = [result.text for result in initial_points]
-        reranked_documents = self.reranker.rank(query, documents)
-
-        reranked_points = []
-        for document in reranked_documents.results[:limit]:
-            index = document.doc_id
-            point = initial_points[index]
-
-            # Create a new LectureRetrievalItem with the reranked score and the original point's attributes
-            new_point = LectureRetrievalItem(
-                score=document.score,
-                text=point.text,
-                lecture=point.lecture,
-                lecture_position=point.lecture_position,
-                start_time=point.start_time,
-                end_time=point.end_time,
-                position=point.position
-            )
-            reranked_points.append(new_point)
-
-        
-        return reranked_points
-
-        
+        self.chunk_size = chunk_size
+        self.time_budget_ms = time_budget_ms
+        self.early_exit_margin = early_exit_margin
+        self.num_reranked = 0
+        self.budget_exhausted = False
+
+    @property
+    def encode_options(self):
+        return self.base_retriever.encode_options
+
+    def query_features(self, queries: List[str]) -> dict:
+        return self.base_retriever.query_features(queries)
+
+    def build_query(self, query_embedding: dict, collection_name: str, limit: int, query_filter=None) -> dict:
+        # candidates for reranking
+        return self.base_retriever.build_query(query_embedding, collection_name, config.PREFETCH_LIMIT, query_filter)
+
+    def retrieve(self, query: str, collection_name: str, limit: int, query_filter=None) -> List[LectureRetrievalItem]:
+        initial_points = self.base_retriever.retrieve(query, collection_name, config.PREFETCH_LIMIT, query_filter)
+        return self.rerank(query, initial_points, limit)
+
+    async def aretrieve(self, query: str, collection_name: str, limit: int, query_filter=None) -> List[LectureRetrievalItem]:
+        initial_points = await self.base_retriever.aretrieve(query, collection_name, config.PREFETCH_LIMIT, query_filter)
+        return await self.arerank(query, initial_points, limit)
+
+    def rerank(self, query: str, initial_points: List[LectureRetrievalItem], limit: int) -> List[LectureRetrievalItem]:
+        """Rerank first-stage results (in first-stage order) with the cascade."""
+        start = time.perf_counter()
+        self.budget_exhausted = False
+        scores = []
+        for chunk in self._chunks(initial_points):
+            scores.extend(self.reranker.score(query, [point.text for point in chunk]))
+            if self._done(scores, limit, start):
+                break
+
+        return self._reranked_points(initial_points, scores, limit)
+
+    async def arerank(self, query: str, initial_points: List[LectureRetrievalItem], limit: int) -> List[LectureRetrievalItem]:
+        start = time.perf_counter()
+        self.budget_exhausted = False
+        scores = []
+        for chunk in self._chunks(initial_points):
+            scores.extend(await self.reranker.ascore(query, [point.text for point in chunk]))
+            if self._done(scores, limit, start):
+                break
+
+        return self._reranked_points(initial_points, scores, limit)
+
+    def _chunks(self, points: List[LectureRetrievalItem]):
+        chunk_size = self.chunk_size or len(points) or 1
+        for i in range(0, len(points), chunk_size):
+            yield points[i:i + chunk_size]
+
+    def _done(self, scores: List[float], limit: int, start: float) -> bool:
+        if self.time_budget_ms is not None and 1000 * (time.perf_counter() - start) >= self.time_budget_ms:
+            self.budget_exhausted = True
+            return True
+
+        if self.early_exit_margin is None or len(scores) < limit or not self.chunk_size:
+            return False
+
+        # scores are in first-stage order: the bound is taken from all candidates the first stage ranked below
+        # the deepest one in the current top k, not just from the latest chunk
+        top_k = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:limit]
+        below = scores[max(top_k) + 1:]
+        return bool(below) and max(below) + self.early_exit_margin < scores[top_k[-1]]
+
+    def _reranked_points(self, initial_points: List[LectureRetrievalItem], scores: List[float], limit: int) -> List[LectureRetrievalItem]:
+        self.num_reranked = len(scores)
+        metrics.observe("reranker.candidates_per_search", len(scores))
+        ranked = sorted(zip(scores, initial_points), key=lambda pair: pair[0], reverse=True)
+
+        # copies keep every field of the original point (text, video_location), only the score is replaced
+        points = [point.model_copy(update={"score": score}) for score, point in ranked[:limit]]
+
+        # if the time budget ran out before limit candidates were reranked, the rest keeps the first-stage order and score
+        points.extend(initial_points[len(scores):len(scores) + limit - len(points)])
+        return points
@@ -2,5 +2,6 @@ from .base import BaseRetriever
 from .dense import DenseRetriever
 from .hybrid import HybridRetriever
 from .hybrid_colbert import HybridColbertRerankingRetriever
+from .lexical import LexicalRetriever
 from .Reranker import RerankerRetriever
 from .entity import EntityRetriever
\ No newline at end of file
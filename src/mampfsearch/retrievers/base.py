@@ -1,19 +1,86 @@
 from abc import ABC, abstractmethod
 from typing import List
 from mampfsearch.utils.models import LectureRetrievalItem
+from mampfsearch.utils import config
+from mampfsearch.core import collections
 
 class BaseRetriever(ABC):
     """
     Abstract base class for retrievers.
+
+    Subclasses declare the outputs they need from the embedding model in encode_options and build
+    the qdrant query from them in build_query. retrieve and aretrieve run the same query,
+    the latter with the AsyncQdrantClient and the model in the inference executor.
+    Features computed without the model (see LexicalRetriever) are added by query_features;
+    if no model output is requested, the model is not called at all.
     """
 
-    @abstractmethod
-    def retrieve(self, query: str, collection_name: str, limit: int = 10) -> List[LectureRetrievalItem]:
+    encode_options = {"return_dense": True}
+
+    def query_features(self, queries: List[str]) -> dict:
+        """Model-free query representations, merged into the model outputs passed to build_query."""
+        return {}
+
+    def embed(self, queries: List[str]) -> dict:
+        embedding = {}
+        if any(self.encode_options.values()):
+            embedding = config.get_query_encoder().encode(queries, **self.encode_options)
+        return {**embedding, **self.query_features(queries)}
+
+    async def aembed(self, queries: List[str]) -> dict:
+        embedding = {}
+        if any(self.encode_options.values()):
+            embedding = await config.get_query_encoder().aencode(queries, **self.encode_options)
+        return {**embedding, **self.query_features(queries)}
+
+    def retrieve(self, query: str, collection_name: str, limit: int = 10, query_filter=None) -> List[LectureRetrievalItem]:
         """
         Retrieve a list of LectureRetrievalItems based on the query.
 
         :param query: The search query.
         :param limit: The maximum number of results to return.
+        :param query_filter: Optional qdrant Filter applied to every search stage, see helpers.build_search_filter.
         :return: A list of LectureRetrievalItems.
         """
+        client = config.get_qdrant_client()
+
+        query_embedding = self.embed([query])
+
+        points = client.query_points(**self.build_query(query_embedding, collection_name, limit, query_filter))
+
+        return [LectureRetrievalItem.from_qdrant_point(point) for point in points.points]
+
+    async def aretrieve(self, query: str, collection_name: str, limit: int = 10, query_filter=None) -> List[LectureRetrievalItem]:
+        """Like retrieve, but does not block the event loop."""
+        client = config.get_async_qdrant_client()
+
+        query_embedding = await self.aembed([query])
+        # read with the async client, build_query then finds the profile cached
+        await collections.adense_profile(collection_name)
+
+        points = await client.query_points(**self.build_query(query_embedding, collection_name, limit, query_filter))
+
+        return [LectureRetrievalItem.from_qdrant_point(point) for point in points.points]
+
+    def build_request(self, query_embedding: dict, collection_name: str, limit: int, query_filter=None):
+        """The query of build_query as a QueryRequest for query_batch_points."""
+        from qdrant_client import models
+        query = self.build_query(query_embedding, collection_name, limit, query_filter)
+        return models.QueryRequest(
+            query=query.get("query"),
+            using=query.get("using"),
+            prefetch=query.get("prefetch"),
+            filter=query.get("query_filter"),
+            params=query.get("search_params"),
+            limit=query["limit"],
+            with_payload=True,
+        )
+
+    @abstractmethod
+    def build_query(self, query_embedding: dict, collection_name: str, limit: int, query_filter=None) -> dict:
+        """
+        Build the keyword arguments of query_points.
+
+        :param query_embedding: Output of the embedding model for [query] with encode_options and query_features.
+        """
         pass
@@ -1,24 +1,18 @@
 from .base import BaseRetriever
-from mampfsearch.utils.models import LectureRetrievalItem
-from typing import List
 from mampfsearch.utils import config
+from mampfsearch.core import collections
+from mampfsearch.core.init import dense_search_params
 
 class DenseRetriever(BaseRetriever):
-    def retrieve(self, query: str, collection_name: str, limit: int) -> List[LectureRetrievalItem]:
-        client = config.get_qdrant_client()
-        model = config.get_embedding_model()
-        
-        query_embedding = model.encode(
-            [query],
-            return_dense=True
-        )
-        
-        points = client.query_points(
+    encode_options = {"return_dense": True}
+
+    def build_query(self, query_embedding: dict, collection_name: str, limit: int, query_filter=None) -> dict:
+        return dict(
             collection_name=collection_name,
             query=query_embedding["dense_vecs"][0],
             using="dense",
             limit=limit,
+            query_filter=query_filter,
+            search_params=dense_search_params(collections.dense_profile(collection_name)),
             with_payload=True
         )
-        
-        return [LectureRetrievalItem.from_qdrant_point(point) for point in points.points]
\ No newline at end of file
@@ -1,23 +1,39 @@
 from mampfsearch.utils.models import EntityRetrievalItem
 from typing import List
 from mampfsearch.utils import config
+from mampfsearch.core import collections
+from mampfsearch.core.init import dense_search_params
 
 class EntityRetriever():
+    encode_options = {"return_dense": True}
+
     def retrieve(self, query: str, limit: int) -> List[EntityRetrievalItem]:
         client = config.get_qdrant_client()
-        model = config.get_embedding_model()
+        encoder = config.get_query_encoder()
+
+        query_embedding = encoder.encode([query], **self.encode_options)
         
-        query_embedding = model.encode(
-            [query],
-            return_dense=True
-        )
+        points = client.query_points(**self.build_query(query_embedding, limit))
         
-        points = client.query_points(
+        return [EntityRetrievalItem.from_qdrant_point(point) for point in points.points]
+
+    async def aretrieve(self, query: str, limit: int) -> List[EntityRetrievalItem]:
+        client = config.get_async_qdrant_client()
+
+        query_embedding = await config.get_query_encoder().aencode([query], **self.encode_options)
+        # read with the async client, build_query then finds the profile cached
+        await collections.adense_profile(config.ENTITIES_COLLECTION_NAME)
+
+        points = await client.query_points(**self.build_query(query_embedding, limit))
+
+        return [EntityRetrievalItem.from_qdrant_point(point) for point in points.points]
+
+    def build_query(self, query_embedding: dict, limit: int) -> dict:
+        return dict(
             collection_name=config.ENTITIES_COLLECTION_NAME,
             query=query_embedding["dense_vecs"][0],
             using="dense",
             limit=limit,
+            search_params=dense_search_params(collections.dense_profile(config.ENTITIES_COLLECTION_NAME)),
             with_payload=True
         )
-        
-        return [EntityRetrievalItem.from_qdrant_point(point) for point in points.points]
\ No newline at end of file
@@ -1,42 +1,38 @@
 from .base import BaseRetriever
-from typing import List
 from mampfsearch.utils import config, helpers
-from mampfsearch.utils.models import LectureRetrievalItem
+from mampfsearch.core import collections
+from mampfsearch.core.init import dense_search_params
 
 class HybridColbertRerankingRetriever(BaseRetriever):
-        
-    def retrieve(self, query: str, collection_name: str, limit: int) -> List[LectureRetrievalItem]:
-        from qdrant_client import models
-
-        client = config.get_qdrant_client()
-        model = config.get_embedding_model()
+    encode_options = {"return_dense": True, "return_sparse": True, "return_colbert_vecs": True}
 
-        query_embedding = model.encode(
-            [query],
-            return_dense=True,
-            return_sparse=True,
-            return_colbert_vecs=True
-        )
+    def build_query(self, query_embedding: dict, collection_name: str, limit: int, query_filter=None) -> dict:
+        from qdrant_client import models
 
         prefetch = [
             models.Prefetch(
-                query=helpers.convert_sparse_vector(query_embedding["lexical_weights"][0]),
+                query=helpers.convert_sparse_vector(
+                    query_embedding["lexical_weights"][0],
+                    top_k=config.SPARSE_QUERY_TOP_K,
+                    min_weight=config.SPARSE_MIN_WEIGHT,
+                ),
                 using="sparse",
                 limit=config.PREFETCH_LIMIT,
+                filter=query_filter,
             ),
             models.Prefetch(
                 query=query_embedding["dense_vecs"][0],
                 using="dense",
                 limit=config.PREFETCH_LIMIT,
+                filter=query_filter,
+                params=dense_search_params(collections.dense_profile(collection_name)),
             )
         ]
 
-        points = client.query_points(
+        return dict(
             collection_name=collection_name,
             prefetch=prefetch,
             query=query_embedding["colbert_vecs"][0],
             using="colbert",
             limit=limit,
         )
-
-        return [LectureRetrievalItem.from_qdrant_point(point) for point in points.points]
\ No newline at end of file
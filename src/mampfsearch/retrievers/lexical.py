@@ -0,0 +1,27 @@
+import time
+
+from typing import List
+from .base import BaseRetriever
+from mampfsearch.core import lexical
+from mampfsearch.utils import metrics
+
+class LexicalRetriever(BaseRetriever):
+    """BM25 search on the "bm25" sparse vectors. The query only goes through the tokenizer, not the embedding model."""
+
+    encode_options = {}
+
+    def query_features(self, queries: List[str]) -> dict:
+        start = time.perf_counter()
+        vectors = [lexical.bm25_query_vector(query) for query in queries]
+        metrics.observe("lexical.query_prep_ms", 1000 * (time.perf_counter() - start) / max(1, len(queries)))
+        return {"bm25": vectors}
+
+    def build_query(self, query_embedding: dict, collection_name: str, limit: int, query_filter=None) -> dict:
+        return dict(
+            collection_name=collection_name,
+            query=query_embedding["bm25"][0],
+            using="bm25",
+            limit=limit,
+            query_filter=query_filter,
+            with_payload=True
+        )
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Query
+from fastapi import APIRouter, HTTPException, Query
 from collections import Counter
 from pathlib import Path
 from typing import Optional, Union
@@ -6,6 +6,8 @@ from typing import Optional, Union
 from mampfsearch.utils import config, models
 from mampfsearch.core.entity_extraction import extract_entities
 from mampfsearch.retrievers import EntityRetriever
+from mampfsearch.core.jobs import get_job_manager
+from mampfsearch.core import collections
 
 from qdrant_client.models import Filter, FieldCondition, MatchValue
 
@@ -14,34 +16,35 @@ router = APIRouter(
     tags=["Graph"],
 )
 
-@router.post("/extract")
+@router.post("/extract", status_code=202)
 async def extract_entities_endpoint(
     file: Path,
     course_id: str,
     lecture_id: Optional[str] = None,
-    background_task: BackgroundTasks = None,
     print_chunks: bool = False,
-):
+) -> models.JobInfo:
+    """Start entity extraction in the background. Poll GET /jobs/{id} for progress."""
 
     if not file.exists() or not file.is_file():
         raise HTTPException(status_code=400, detail="File does not exist or is not a file.")
 
-    client = config.get_qdrant_client()
-    if not client.collection_exists(config.ENTITIES_COLLECTION_NAME):
+    if not collections.exists(config.ENTITIES_COLLECTION_NAME):
         raise HTTPException(
             status_code=503,
             detail=f"Entity collection '{config.ENTITIES_COLLECTION_NAME}' does not exist. Initialize it via POST /maintenance/init"
         )
 
-    background_task.add_task(
-        extract_entities,
-        file_path=Path(file),
-        course_id=course_id,
-        lecture_id=lecture_id,
-        print_chunks=print_chunks,
-    ) 
-
-    return {"message": "Entity extraction started in background"}
+    return get_job_manager().submit(
+        "extract_entities",
+        lambda job: extract_entities(
+            file_path=Path(file),
+            course_id=course_id,
+            lecture_id=lecture_id,
+            print_chunks=print_chunks,
+            progress_callback=job.add_progress,
+            cancel_event=job.cancel_event,
+        ),
+    )
 
 @router.get("/search")
 async def search_entities(
@@ -51,7 +54,7 @@ async def search_entities(
     """Search entities with semantic search"""
     
     retriever = EntityRetriever()
-    responses = retriever.retrieve(query, limit)
+    responses = await retriever.aretrieve(query, limit)
     
     return responses
 
@@ -63,9 +66,9 @@ async def get_all_entities(
     include_aliases: bool = Query(False, description="Include list of all text variations (aliases) for each entity"),
 ) -> dict:
 
-    client = config.get_qdrant_client()
+    client = config.get_async_qdrant_client()
     
-    if not client.collection_exists(config.ENTITIES_COLLECTION_NAME):
+    if not collections.exists(config.ENTITIES_COLLECTION_NAME):
         raise HTTPException(
             status_code=503,
             detail=f"Entity collection '{config.ENTITIES_COLLECTION_NAME}' does not exist."
@@ -82,7 +85,7 @@ async def get_all_entities(
             ]
         )
     
-    points, _ = client.scroll(
+    points, _ = await client.scroll(
         collection_name=config.ENTITIES_COLLECTION_NAME,
         scroll_filter=scroll_filter,
         limit=limit,
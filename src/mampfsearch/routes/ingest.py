@@ -1,9 +1,10 @@
 import logging
-from fastapi import APIRouter, BackgroundTasks, HTTPException
-from mampfsearch.core.chunking import chunk_srt_file
-from mampfsearch.core.lectures.insert_chunks import insert_chunks
+from fastapi import APIRouter, HTTPException
+from mampfsearch.core.lectures.pipeline import ingest_file
+from mampfsearch.core.lectures.bulk_ingest import bulk_ingest, collect_files
 from mampfsearch.core.transcribe import transcribe_lecture
-from mampfsearch.utils.models import IngestRequest, TranscriptionRequest
+from mampfsearch.core.jobs import get_job_manager
+from mampfsearch.utils.models import IngestRequest, BulkIngestRequest, TranscriptionRequest, JobInfo
 from mampfsearch.utils import config
 
 router = APIRouter(
@@ -12,36 +13,67 @@ router = APIRouter(
 
 logger = logging.getLogger(__name__)
 
-@router.post("/ingest")
+@router.post("/ingest", status_code=202)
 async def ingest_transcript(
     request: IngestRequest,
-):
-    
-    try:
-        chunks = chunk_srt_file(
-            srt_file=request.srt_file,
+) -> JobInfo:
+    """Start ingesting a transcript in the background. Poll GET /jobs/{id} for progress."""
+
+    if request.srt_file.suffix != ".srt" or not request.srt_file.is_file():
+        raise HTTPException(status_code=400, detail=f"Not a valid SRT file: {request.srt_file}")
+    if request.max_chunk_size < request.min_chunk_size:
+        raise HTTPException(status_code=400, detail="max_chunk_size must be >= min_chunk_size")
+
+    def run(job):
+        ingest_info = ingest_file(
+            file_path=request.srt_file,
             course_id=request.course_id,
             lecture_id=request.lecture_id,
             min_chunk_size=request.min_chunk_size,
             max_chunk_size=request.max_chunk_size,
             overlap=request.overlap,
+            incremental=not request.force,
+            progress_callback=job.add_progress,
+            cancel_event=job.cancel_event,
         )
+        logger.info(f"Ingested {ingest_info.num_chunks} chunks for lecture {request.lecture_id}")
+        return ingest_info
 
-        logger.info(f"Generated {len(chunks)} chunks for lecture {request.lecture_id}")
+    return get_job_manager().submit("ingest", run)
 
-        insert_chunks(
-            chunks=chunks,
-        ) 
+@router.post("/ingest/bulk", status_code=202)
+async def bulk_ingest_endpoint(
+    request: BulkIngestRequest,
+) -> JobInfo:
+    """Start a bulk ingest in the background. The job result holds the per-file report."""
 
-        return {"message": f"Successfully ingested {len(chunks)} chunks", "chunks": len(chunks)}
+    try:
+        collect_files(request.path, request.course_id)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/transcribe")
+    def run(job):
+        return bulk_ingest(
+            path=request.path,
+            course_id=request.course_id,
+            min_chunk_size=request.min_chunk_size,
+            max_chunk_size=request.max_chunk_size,
+            overlap=request.overlap,
+            incremental=not request.force,
+            workers=request.workers,
+            progress_callback=job.add_progress,
+            cancel_event=job.cancel_event,
+        )
+
+    return get_job_manager().submit("bulk_ingest", run)
+
+@router.post("/transcribe", status_code=202)
 async def transcribe_lecture_endpoint(
     request: TranscriptionRequest,
-    background_task: BackgroundTasks
-):
+) -> JobInfo:
+    """Start a transcription in the background. Running transcriptions cannot be cancelled."""
 
-    background_task.add_task(transcribe_lecture, audio_file=request.audio_file)
-    return {"message": "Transcription started in background"}
+    return get_job_manager().submit(
+        "transcribe",
+        lambda job: transcribe_lecture(audio_file=request.audio_file),
+    )
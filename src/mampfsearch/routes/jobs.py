@@ -0,0 +1,30 @@
+from fastapi import APIRouter, HTTPException
+
+from mampfsearch.core.jobs import get_job_manager
+from mampfsearch.utils import models
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["Jobs"],
+)
+
+@router.get("")
+async def list_jobs() -> list[models.JobInfo]:
+    """List running and recently finished jobs."""
+    return get_job_manager().list()
+
+@router.get("/{job_id}")
+async def get_job(job_id: str) -> models.JobInfo:
+    """Return state, progress, throughput and errors of a job."""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' does not exist")
+    return job
+
+@router.post("/{job_id}/cancel")
+async def cancel_job(job_id: str) -> models.JobInfo:
+    """Cancel a pending job or request a running job to stop."""
+    job = get_job_manager().cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' does not exist")
+    return job
\ No newline at end of file
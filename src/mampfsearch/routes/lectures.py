@@ -1,6 +1,7 @@
-from fastapi import APIRouter, HTTPException
-from mampfsearch.core.lectures.search import search_lectures
-from mampfsearch.core.lectures.ask import ask
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from mampfsearch.core.lectures.search import asearch_lectures, asearch_lectures_batch
+from mampfsearch.core.lectures.ask import ask, ask_stream
 from mampfsearch.utils import config, models
 
 router = APIRouter(
@@ -8,29 +9,95 @@ router = APIRouter(
     tags=["Lectures"],
 )
 
+def validate_filter(search_filter: models.SearchFilter):
+    if search_filter is None:
+        return
+    if search_filter.start_time is not None and search_filter.end_time is not None and search_filter.start_time > search_filter.end_time:
+        raise HTTPException(status_code=400, detail="filter.end_time must be >= filter.start_time")
+
 @router.post("/search")
 async def search_lectures_endpoint(
-    request: models.SearchRequest
+    request: models.SearchRequest,
+    response: Response,
 ) -> list[models.LectureRetrievalItem]:
+    """
+    Search the lectures. X-Reranked-Candidates reports how many candidates were cross-encoded,
+    X-Rerank-Budget-Exhausted whether the rerank time budget cut reranking short and
+    X-Result-Cache whether the result was served from the result cache.
+    """
+
+    validate_filter(request.filter)
 
-    retrieval_items = search_lectures(
+    info = models.SearchInfo()
+    retrieval_items = await asearch_lectures(
         query=request.query,
         limit=request.limit,
         retriever_type=request.retriever_type,
         reranking=request.reranking,
+        search_filter=request.filter,
+        info=info,
+        context_window=request.context_window,
     )
 
+    response.headers["X-Reranked-Candidates"] = str(info.num_reranked)
+    response.headers["X-Rerank-Budget-Exhausted"] = "true" if info.rerank_budget_exhausted else "false"
+    response.headers["X-Result-Cache"] = "hit" if info.cached else "miss"
+
     return retrieval_items
 
+@router.post("/search/batch")
+async def search_lectures_batch_endpoint(
+    requests: list[models.SearchRequest],
+) -> list[list[models.LectureRetrievalItem]]:
+    """Run several searches in one call, with one model pass and one qdrant request per retriever type."""
+
+    if len(requests) > config.SEARCH_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {config.SEARCH_BATCH_MAX_SIZE} searches per batch")
+    for request in requests:
+        validate_filter(request.filter)
+
+    return await asearch_lectures_batch(requests)
+
 @router.post("/ask")
 async def ask_lectures_endpoint(
     request: models.AskRequest
 ) -> models.Response:
 
+    validate_filter(request.filter)
+
     response = await ask(
         question=request.question,
         retriever=request.retriever_type,
         limit=request.limit,
+        search_filter=request.filter,
+        context_window=request.context_window,
+    )
+
+    return response
+
+
+@router.post("/ask/stream")
+async def ask_lectures_stream_endpoint(
+    request: models.AskRequest
+) -> StreamingResponse:
+    """
+    Like /ask, but streams server-sent events: "sources" with the retrieved hits, "token" events with
+    the answer text as it is generated and "done" with the complete answer, confidence and source snippets.
+    """
+
+    validate_filter(request.filter)
+
+    events = ask_stream(
+        question=request.question,
+        retriever=request.retriever_type,
+        limit=request.limit,
+        search_filter=request.filter,
+        context_window=request.context_window,
     )
 
-    return response
\ No newline at end of file
+    # no-transform and X-Accel-Buffering keep proxies from buffering the stream
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache, no-transform", "X-Accel-Buffering": "no"},
+    )
@@ -3,7 +3,12 @@ import logging
 from enum import Enum
 from fastapi import APIRouter, HTTPException
 from mampfsearch.core.init import init, create_lectures_collection
-from mampfsearch.utils import config
+from mampfsearch.core import collections
+from mampfsearch.core.jobs import get_job_manager
+from mampfsearch.core.migrate import migrate_collection, get_migration_targets
+from mampfsearch.core.result_cache import get_result_cache
+from mampfsearch.utils.models import JobInfo
+from mampfsearch.utils import config, metrics
 
 router = APIRouter(
     prefix="/maintenance",
@@ -28,11 +33,13 @@ async def get_collection_info():
     client = config.get_qdrant_client()
 
     def collect_info(name: str):
-        exists = client.collection_exists(name)
+        exists = collections.exists(name)
         info = {"collection_name": name, "exists": exists}
         if exists:
-            col = client.get_collection(name)
+            collection_name = collections.resolve(name)
+            col = client.get_collection(collection_name)
             info.update({
+                "collection": collection_name,
                 "status": col.status,
                 "indexed_vectors_count": col.indexed_vectors_count,
             })
@@ -45,6 +52,36 @@ async def get_collection_info():
         ]
     }
 
+@router.get("/cache")
+async def get_embedding_cache_stats():
+    """Return size and hit/miss counters of the embedding cache."""
+    if not config.EMBEDDING_CACHE_ENABLED:
+        return {"enabled": False}
+
+    embedder = config.get_embedder()
+    return {"enabled": True, **embedder.stats()}
+
+@router.get("/query-cache")
+async def get_query_cache_stats():
+    """Return size and hit/miss counters of the in-memory query embedding cache."""
+    if not config.QUERY_CACHE_ENABLED:
+        return {"enabled": False}
+
+    return {"enabled": True, **config.get_query_encoder().stats()}
+
+@router.get("/result-cache")
+async def get_result_cache_stats():
+    """Return size of the search result cache and hit rates per retriever type."""
+    if not config.RESULT_CACHE_ENABLED:
+        return {"enabled": False}
+
+    return {"enabled": True, **get_result_cache().stats()}
+
+@router.get("/metrics")
+async def get_metrics():
+    """Return process-wide counters, gauges and latency/size summaries (e.g. of the query batcher)."""
+    return metrics.snapshot()
+
 class Collections(str, Enum):
     lectures = "lectures"
     entities = "entities"
@@ -52,17 +89,45 @@ class Collections(str, Enum):
 @router.delete("/delete/{collection}", status_code=204)
 async def delete_collection(collection: Collections):
     """Delete either the lectures or entities collection."""
-    client = config.get_qdrant_client()
     collection_name = (
         config.LECTURE_COLLECTION_NAME if collection == Collections.lectures
         else config.ENTITIES_COLLECTION_NAME
     )
 
-    if not client.collection_exists(collection_name):
+    if not collections.exists(collection_name):
         raise HTTPException(
             status_code=404,
             detail=f"Collection '{collection_name}' does not exist"
         )
 
-    client.delete_collection(collection_name)
-    logger.info(f"Deleted collection '{collection_name}'")
\ No newline at end of file
+    collections.delete(collection_name)
+    logger.info(f"Deleted collection '{collection_name}'")
+
+@router.post("/migrate/{collection}", status_code=202)
+async def migrate_collection_endpoint(
+    collection: Collections,
+    keep_old: bool = False,
+) -> JobInfo:
+    """
+    Copy a collection into a new versioned collection with the current schema and switch its alias.
+    Searches keep using the old collection until the copy is complete. Poll GET /jobs/{id} for progress.
+    """
+    alias, schema, payload_indexes = get_migration_targets()[collection.value]
+
+    if not collections.exists(alias):
+        raise HTTPException(
+            status_code=404,
+            detail=f"Collection '{alias}' does not exist"
+        )
+
+    return get_job_manager().submit(
+        "migrate",
+        lambda job: migrate_collection(
+            alias,
+            schema(),
+            payload_indexes,
+            keep_old=keep_old,
+            progress_callback=job.add_progress,
+            cancel_event=job.cancel_event,
+        ),
+    )
\ No newline at end of file
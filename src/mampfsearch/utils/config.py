@@ -1,36 +1,274 @@
 from pathlib import Path 
 import logging
+import os
 
 QDRANT_HOST = "localhost"
 QDRANT_PORT = 6333
 
+# Vector store: "qdrant" (server at QDRANT_HOST:QDRANT_PORT) or "embedded", the in-process engine of mampfsearch/engine
+# for small deployments, CI and offline use. It keeps its collections below EMBEDDED_STORE_PATH (one process at a time)
+# and searches exactly: dense blocks of EMBEDDED_SEARCH_BLOCK_ROWS rows per matrix product, sparse through an inverted index.
+# A collection is rewritten without its deleted and replaced points once they exceed EMBEDDED_COMPACT_RATIO of its rows.
+VECTOR_STORE = "qdrant"
+EMBEDDED_STORE_PATH = Path.home() / ".cache" / "mampfsearch" / "store"
+EMBEDDED_SEARCH_BLOCK_ROWS = 65536
+EMBEDDED_COMPACT_RATIO = 0.5
+
 VLLM_HOST = "localhost"
 VLLM_PORT = 8001
+# model served by vLLM that answers /lectures/ask
+LLM_MODEL = "openai/gpt-oss-20b"
 
 EMBEDDING_MODEL = "BAAI/bge-m3"
 EMBEDDING_DIMENSION = 1024
 
+# Embedding backend (see inference/embedders.py): "flag" runs FlagEmbedding/PyTorch (fp16 on GPU),
+# "onnx" runs the int8-quantized export of `mampfsearch export-onnx` in ONNX Runtime, the faster choice on CPU-only nodes.
+# EMBEDDING_NUM_THREADS sets the intra-op threads of torch/onnxruntime, None keeps the library default.
+EMBEDDING_BACKEND = "flag"
+EMBEDDING_USE_FP16 = True
+EMBEDDING_ONNX_PATH = Path.home() / ".cache" / "mampfsearch" / "bge-m3-onnx"
+EMBEDDING_NUM_THREADS = None
+
+# Shared embedding worker (`mampfsearch embedding-worker`, see worker.py) that owns BGE-M3 and the reranker,
+# so multiple API worker processes do not each load their own copy.
+# "unix:///run/mampfsearch/embedding.sock" or "http://127.0.0.1:8002"; None loads the models in-process.
+# If the worker does not answer at startup, the models are loaded in-process unless EMBEDDING_WORKER_FALLBACK is False.
+EMBEDDING_WORKER_URL = None
+EMBEDDING_WORKER_FALLBACK = True
+EMBEDDING_WORKER_TIMEOUT_SECONDS = 120
+
+# ColBERT multivector footprint.
+# Token vectors of each chunk are pooled by hierarchical clustering to len(tokens) / COLBERT_POOL_FACTOR vectors (1 disables pooling).
+# COLBERT_QUANTIZATION is None, "scalar" (int8) or "binary"; with COLBERT_ON_DISK the original vectors are kept on disk
+# and only the quantized ones stay in RAM. Only applies to newly created collections.
+COLBERT_POOL_FACTOR = 2
+COLBERT_QUANTIZATION = "scalar"
+COLBERT_ON_DISK = True
+
+# Pruning of the BGE-M3 sparse ("sparse" vector) weights. Chunks keep their SPARSE_DOC_TOP_K largest weights,
+# queries their SPARSE_QUERY_TOP_K largest, and both drop weights below SPARSE_MIN_WEIGHT (None keeps all terms).
+# Smaller sparse vectors shrink the inverted index and speed up the sparse prefetch; measure the recall cost with
+# `mampfsearch evaluate-sparse`. Document pruning applies to newly ingested chunks, embeddings are cached unpruned.
+SPARSE_DOC_TOP_K = None
+SPARSE_QUERY_TOP_K = None
+SPARSE_MIN_WEIGHT = 0.01
+
+# Persistent on-disk cache of chunk and entity embeddings, keyed by text, model and requested outputs.
+EMBEDDING_CACHE_ENABLED = True
+EMBEDDING_CACHE_PATH = Path.home() / ".cache" / "mampfsearch" / "embeddings.sqlite"
+EMBEDDING_CACHE_MAX_BYTES = 2 * 1024**3
+
+# aliases of the current versioned collections, see core/collections.py
 LECTURE_COLLECTION_NAME = "Lectures"
 ENTITIES_COLLECTION_NAME = "Entities"
 
 PREFETCH_LIMIT = 50
 
+# Lexical retriever (core/lexical.py): BM25 over the embedding tokenizer's tokens, stored as the "bm25" sparse vector.
+# The length normalisation uses the average chunk length in tokens measured at ingest (see collections.bm25_stats),
+# the collection computes the IDF. Until a collection has chunks, the average is estimated from the default chunk
+# sizes with BM25_CHARS_PER_TOKEN characters per token.
+# The "auto" retriever type sends queries of at most AUTO_LEXICAL_MAX_WORDS words that are not questions to the
+# lexical retriever and everything else to hybrid.
+BM25_K1 = 1.2
+BM25_B = 0.75
+BM25_CHARS_PER_TOKEN = 4
+AUTO_LEXICAL_MAX_WORDS = 4
+
+# Neighbouring chunks per side stitched onto search hits and ask() passages as their context (core/lectures/context.py).
+# Only applies to chunks ingested without overlap (`mampfsearch ingest --no-overlap`), 0 disables it.
+CONTEXT_WINDOW = 1
+
+# Maximum number of searches per POST /lectures/search/batch
+SEARCH_BATCH_MAX_SIZE = 64
+
+# Collection profile (see core/init.py COLLECTION_PROFILES) of the dense vectors: "default", "scalar" or "binary".
+# Determines quantization and HNSW parameters of new collections. The profile is stored in the collection metadata
+# and the retrievers use the search params of the profile a collection was created with (re-read every
+# PROFILE_CHECK_INTERVAL_SECONDS), so changing it only affects new or migrated collections.
+LECTURE_COLLECTION_PROFILE = "default"
+ENTITIES_COLLECTION_PROFILE = "default"
+PROFILE_CHECK_INTERVAL_SECONDS = 60.0
+
+# Default size of .srt and .txt chunks in characters, used by the CLI, the ingest API and the chunkers.
+MIN_CHUNK_SIZE = 350
+MAX_CHUNK_SIZE = 850
+
+# Number of chunks per BGE-M3 forward pass during ingest. Chunks are sorted by length before batching to reduce padding.
+EMBEDDING_BATCH_SIZE = 16
+
+# Number of points per qdrant upsert request and number of parallel upload workers during ingest.
+UPLOAD_BATCH_SIZE = 64
+UPLOAD_PARALLEL = 1
+
+# Maximum number of upload batches buffered between the stages of the streaming ingest pipeline.
+INGEST_QUEUE_SIZE = 4
+
+# Number of processes that parse and chunk files during bulk ingest.
+BULK_INGEST_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+
+# PDF conversion with docling: threads per model, number of page ranges converted in parallel
+# and the minimum number of pages per range. Every page worker loads its own copy of the docling models.
+PDF_NUM_THREADS = 4
+PDF_PAGE_WORKERS = 1
+PDF_MIN_PAGES_PER_WORKER = 10
+
+# Background jobs (ingest, transcription, entity extraction) run in a dedicated executor off the event loop.
+JOB_WORKERS = 1
+# Number of finished jobs kept for GET /jobs
+JOB_HISTORY_SIZE = 100
+
+# Threads that run query-time model inference (embedding, reranking) for the async search path, so the event loop
+# keeps serving other requests meanwhile. Bounded, because more concurrent forward passes than cores only add latency.
+INFERENCE_WORKERS = 2
+
+# Query encodings of concurrent searches are coalesced into one batched forward pass. The batcher waits up to
+# QUERY_BATCH_WINDOW_MS for more queries after the first one, and sends at most QUERY_BATCH_MAX_SIZE queries per batch.
+QUERY_BATCH_WINDOW_MS = 2
+QUERY_BATCH_MAX_SIZE = 32
+
+# In-memory LRU cache of query encodings (retrievers and entity lookups). Entries expire after
+# QUERY_CACHE_TTL_SECONDS, None keeps them until they are evicted.
+QUERY_CACHE_ENABLED = True
+QUERY_CACHE_MAX_ENTRIES = 4096
+QUERY_CACHE_TTL_SECONDS = None
+
+# In-memory cache of complete lecture search results, invalidated by every ingest, delete or alias switch
+# of the collection. The epochs of the collections are stored in the EPOCHS_COLLECTION_NAME collection,
+# so writes of other processes (CLI ingest, other API workers) invalidate the cache as well; each process
+# rereads them at most every EPOCH_CHECK_INTERVAL_SECONDS.
+RESULT_CACHE_ENABLED = True
+RESULT_CACHE_MAX_ENTRIES = 1024
+RESULT_CACHE_TTL_SECONDS = 600
+EPOCHS_COLLECTION_NAME = "Epochs"
+EPOCH_CHECK_INTERVAL_SECONDS = 1.0
+
+# Cross-encoder used when a search asks for reranking. Loaded once per process; (query, passage) pairs of
+# concurrent searches are scored together (up to RERANK_MAX_BATCH_PAIRS per round) and their scores are cached.
+RERANKER_MODEL = "BAAI/bge-reranker-v2-m3"
+RERANKER_BATCH_SIZE = 32
+RERANK_BATCH_WINDOW_MS = 2
+RERANK_MAX_BATCH_PAIRS = 128
+RERANK_CACHE_MAX_ENTRIES = 65536
+
+# Cascade reranking: candidates are cross-encoded in chunks in first-stage order. Stops once the k-th best score
+# beats all candidates ranked below the current top k in the first stage by RERANK_EARLY_EXIT_MARGIN (scores are
+# in [0, 1]) or after RERANK_TIME_BUDGET_MS. The budget is off by default, candidates it cuts off keep their
+# first-stage order.
+RERANK_CHUNK_SIZE = 10
+RERANK_TIME_BUDGET_MS = None
+RERANK_EARLY_EXIT_MARGIN = 0.1
+
 # If there is an entity embedding with cosine similarity above this threshold, we consider it the same entity.
 ENTITY_EMBED_SIM_THRESHOLD = 0.83
 
 
+_embedding_worker_available = None
+def use_embedding_worker() -> bool:
+    global _embedding_worker_available
+    if not EMBEDDING_WORKER_URL:
+        return False
+    if _embedding_worker_available is None:
+        from mampfsearch.inference.remote import worker_available
+        _embedding_worker_available = worker_available(EMBEDDING_WORKER_URL)
+        if not _embedding_worker_available:
+            if not EMBEDDING_WORKER_FALLBACK:
+                raise RuntimeError(f"Embedding worker at {EMBEDDING_WORKER_URL} is not available")
+            logging.getLogger(__name__).warning("Falling back to in-process embedding and reranking models")
+
+    return _embedding_worker_available
+
+
 _embedding_model = None
 def get_embedding_model():
+    """The local embedding model without the persistent cache, shared by get_embedder and get_query_encoder."""
     global _embedding_model
     if _embedding_model is None:
-        from FlagEmbedding import BGEM3FlagModel
-        _embedding_model = BGEM3FlagModel(EMBEDDING_MODEL, use_fp16=True)
+        from mampfsearch.inference import create_embedder
+        _embedding_model = create_embedder(EMBEDDING_BACKEND)
     return _embedding_model
 
 
+_embedder = None
+def get_embedder():
+    global _embedder
+    if _embedder is None and use_embedding_worker():
+        from mampfsearch.inference.remote import RemoteEmbedder
+        # the worker has its own embedding cache
+        _embedder = RemoteEmbedder(EMBEDDING_WORKER_URL, kind="document", timeout=EMBEDDING_WORKER_TIMEOUT_SECONDS)
+    if _embedder is None:
+        _embedder = get_embedding_model()
+        if EMBEDDING_CACHE_ENABLED:
+            from mampfsearch.inference import CachedEmbeddingModel
+            _embedder = CachedEmbeddingModel(
+                _embedder,
+                model_name=_embedder.name,
+                path=EMBEDDING_CACHE_PATH,
+                max_bytes=EMBEDDING_CACHE_MAX_BYTES,
+            )
+    return _embedder
+
+
+_tokenizer = None
+def get_tokenizer():
+    global _tokenizer
+    if _tokenizer is None:
+        from transformers import AutoTokenizer
+        _tokenizer = AutoTokenizer.from_pretrained(EMBEDDING_MODEL)
+    return _tokenizer
+
+
+_query_encoder = None
+def get_query_encoder():
+    global _query_encoder
+    if _query_encoder is None:
+        if use_embedding_worker():
+            # queries of all API processes are batched in the worker
+            from mampfsearch.inference.remote import RemoteEmbedder
+            _query_encoder = RemoteEmbedder(EMBEDDING_WORKER_URL, kind="query", timeout=EMBEDDING_WORKER_TIMEOUT_SECONDS)
+        else:
+            from mampfsearch.inference import QueryBatcher
+            # queries are cached in memory below, the sqlite embedding cache would only add a lookup per miss
+            _query_encoder = QueryBatcher(
+                get_embedding_model(),
+                window_ms=QUERY_BATCH_WINDOW_MS,
+                max_batch_size=QUERY_BATCH_MAX_SIZE,
+            )
+        if QUERY_CACHE_ENABLED:
+            from mampfsearch.inference import QueryEmbeddingCache
+            _query_encoder = QueryEmbeddingCache(
+                _query_encoder,
+                max_entries=QUERY_CACHE_MAX_ENTRIES,
+                ttl_seconds=QUERY_CACHE_TTL_SECONDS,
+            )
+    return _query_encoder
+
+
+_reranker = None
+def get_reranker():
+    global _reranker
+    if _reranker is None and use_embedding_worker():
+        from mampfsearch.inference.remote import RemoteReranker
+        _reranker = RemoteReranker(EMBEDDING_WORKER_URL, timeout=EMBEDDING_WORKER_TIMEOUT_SECONDS)
+    if _reranker is None:
+        from FlagEmbedding import FlagReranker
+        from mampfsearch.inference import RerankerService
+        _reranker = RerankerService(
+            FlagReranker(RERANKER_MODEL, use_fp16=True),
+            window_ms=RERANK_BATCH_WINDOW_MS,
+            max_batch_size=RERANK_MAX_BATCH_PAIRS,
+            cache_max_entries=RERANK_CACHE_MAX_ENTRIES,
+        )
+    return _reranker
+
+
 _qdrant_client = None
 def get_qdrant_client():
     global _qdrant_client
+    if _qdrant_client is None and VECTOR_STORE == "embedded":
+        from mampfsearch.engine import EmbeddedClient
+        _qdrant_client = EmbeddedClient(EMBEDDED_STORE_PATH)
     if _qdrant_client is None:
         from qdrant_client import QdrantClient
         _qdrant_client = QdrantClient(
@@ -41,6 +279,33 @@ def get_qdrant_client():
     return _qdrant_client
 
 
+_async_qdrant_client = None
+def get_async_qdrant_client():
+    global _async_qdrant_client
+    if _async_qdrant_client is None and VECTOR_STORE == "embedded":
+        # shares the collections of the sync client
+        from mampfsearch.engine import AsyncEmbeddedClient
+        _async_qdrant_client = AsyncEmbeddedClient(get_qdrant_client())
+    if _async_qdrant_client is None:
+        from qdrant_client import AsyncQdrantClient
+        _async_qdrant_client = AsyncQdrantClient(
+            host=QDRANT_HOST,
+            port=QDRANT_PORT
+        )
+
+    return _async_qdrant_client
+
+
+_inference_executor = None
+def get_inference_executor():
+    global _inference_executor
+    if _inference_executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+
+    return _inference_executor
+
+
 _llm_client = None
 def get_llm_client():
     global _llm_client
@@ -1,17 +1,99 @@
+import uuid
+
 from hashlib import md5
+from typing import List, Iterator, Optional
+
+# Namespace of the deterministic point ids. Changing it changes the id of every stored chunk.
+POINT_ID_NAMESPACE = uuid.UUID("6f1c1a52-4d0e-4b8a-9a63-0e6a2f6c8d71")
 
 # Converts the bge embeddings into the correct format for qdrant
 # https://qdrant.tech/documentation/concepts/vectors/
-def convert_sparse_vector(sparse_vectors):
+# Keeps the positive weights of at least min_weight and of those only the top_k largest (None keeps all).
+def convert_sparse_vector(sparse_vectors, top_k: Optional[int] = None, min_weight: float = 0.0):
+    import numpy as np
     from qdrant_client.models import SparseVector
-    sparse_indices = []
-    sparse_values = []
-    for token, value in sparse_vectors.items():
-        if float(value) > 0:
-            sparse_indices.append(token)
-            sparse_values.append(float(value))
-    
+
+    if isinstance(sparse_vectors, dict):
+        # bge returns token id strings as keys
+        indices = np.fromiter(map(int, sparse_vectors.keys()), dtype=np.int64, count=len(sparse_vectors))
+        values = np.fromiter(sparse_vectors.values(), dtype=np.float32, count=len(sparse_vectors))
+    else:
+        indices, values = (np.asarray(array) for array in sparse_vectors)
+
+    keep = values > 0 if min_weight <= 0 else values >= min_weight
+    indices, values = indices[keep], values[keep]
+    if top_k is not None and len(values) > top_k:
+        largest = np.argpartition(values, -top_k)[-top_k:]
+        indices, values = indices[largest], values[largest]
+
+    order = np.argsort(indices)
     return SparseVector(
-        indices=sparse_indices,
-        values=sparse_values
-    )
\ No newline at end of file
+        indices=indices[order].tolist(),
+        values=values[order].astype(np.float64).tolist()
+    )
+
+# Builds the qdrant filter of a SearchFilter, None if nothing is filtered.
+# The time window matches chunks that overlap it, i.e. end after its start and start before its end.
+def build_search_filter(search_filter):
+    from qdrant_client import models
+
+    if search_filter is None:
+        return None
+
+    conditions = []
+    if search_filter.course_id is not None:
+        conditions.append(models.FieldCondition(key="course_id", match=models.MatchValue(value=search_filter.course_id)))
+    if search_filter.lecture_id is not None:
+        conditions.append(models.FieldCondition(key="lecture_id", match=models.MatchValue(value=search_filter.lecture_id)))
+    if search_filter.start_time is not None:
+        conditions.append(models.FieldCondition(key="end_time", range=models.Range(gte=search_filter.start_time)))
+    if search_filter.end_time is not None:
+        conditions.append(models.FieldCondition(key="start_time", range=models.Range(lte=search_filter.end_time)))
+
+    return models.Filter(must=conditions) if conditions else None
+
+# Groups texts of similar length into batches so the model wastes less compute on padding.
+# Yields lists of indices into the original list.
+def length_sorted_batches(texts: List[str], batch_size: int) -> Iterator[List[int]]:
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+    for start in range(0, len(order), batch_size):
+        yield order[start:start + batch_size]
+
+
+# Point ids are derived from the chunk position, so re-ingesting a document overwrites its points instead of duplicating them.
+# The document field ("lecture_id" or "file_id") is part of the name, so a lecture and a file with the same id do not collide.
+def chunk_point_id(course_id: str, document_field: str, document_id: str, ordinal: int) -> str:
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{course_id}/{document_field}/{document_id}/{ordinal}"))
+
+# Hash of everything that ends up in a chunk point, used to detect unchanged chunks on re-ingest
+def chunk_content_hash(text: str, start_time: Optional[object] = None, end_time: Optional[object] = None) -> str:
+    return md5(f"{text}\0{start_time}\0{end_time}".encode("utf-8")).hexdigest()
+
+
+# Hierarchical token pooling: clusters the ColBERT token vectors of a document with ward linkage
+# and replaces every cluster by its normalized mean, shrinking the multivector by roughly pool_factor.
+# https://www.answer.ai/posts/colbert-pooling.html
+def pool_colbert_vectors(vectors, pool_factor: int):
+    import numpy as np
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    num_clusters = max(1, len(vectors) // pool_factor)
+    if pool_factor <= 1 or len(vectors) <= 2 or num_clusters >= len(vectors):
+        return vectors
+
+    from scipy.cluster.hierarchy import linkage, fcluster
+    labels = fcluster(linkage(vectors, method="ward"), t=num_clusters, criterion="maxclust")
+
+    pooled = np.stack([vectors[labels == label].mean(axis=0) for label in np.unique(labels)])
+    pooled /= np.linalg.norm(pooled, axis=1, keepdims=True)
+    return pooled
+
+# Estimated RAM of a ColBERT multivector with the configured quantization and on-disk storage.
+# Quantized vectors are kept in RAM next to the float32 originals, unless those are on disk.
+def colbert_ram_bytes(num_tokens: int, dimension: int, quantization: Optional[str], on_disk: bool) -> int:
+    original_bytes = 0 if on_disk else num_tokens * dimension * 4
+    if quantization == "scalar":
+        return num_tokens * dimension + original_bytes
+    if quantization == "binary":
+        return num_tokens * dimension // 8 + original_bytes
+    return original_bytes
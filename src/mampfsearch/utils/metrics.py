@@ -0,0 +1,65 @@
+import threading
+
+from collections import defaultdict, deque
+
+# Process-wide metrics shown by GET /maintenance/metrics.
+# Counters only grow, gauges hold the last value and summaries keep count, sum, max
+# and the most recent observations for percentiles.
+
+_SUMMARY_WINDOW = 1024
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_gauges = {}
+_summaries = {}
+
+def increment(name: str, value: int = 1):
+    with _lock:
+        _counters[name] += value
+
+def set_gauge(name: str, value: float):
+    with _lock:
+        _gauges[name] = value
+
+def observe(name: str, value: float):
+    with _lock:
+        summary = _summaries.get(name)
+        if summary is None:
+            summary = _summaries[name] = {"count": 0, "sum": 0.0, "max": value, "recent": deque(maxlen=_SUMMARY_WINDOW)}
+        summary["count"] += 1
+        summary["sum"] += value
+        summary["max"] = max(summary["max"], value)
+        summary["recent"].append(value)
+
+def get_counter(name: str) -> int:
+    with _lock:
+        return _counters.get(name, 0)
+
+def snapshot() -> dict:
+    with _lock:
+        summaries = {}
+        for name, summary in _summaries.items():
+            recent = sorted(summary["recent"])
+            summaries[name] = {
+                "count": summary["count"],
+                "mean": summary["sum"] / summary["count"],
+                "max": summary["max"],
+                "p50": _percentile(recent, 0.5),
+                "p95": _percentile(recent, 0.95),
+            }
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "summaries": summaries,
+        }
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _summaries.clear()
+
+def _percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
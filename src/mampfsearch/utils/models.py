@@ -1,11 +1,13 @@
 import logging
 
-from pydantic import BaseModel, field_serializer
+from pydantic import BaseModel, PrivateAttr, field_serializer
 from enum import Enum
 from typing import List, Dict, Optional, Union
-from datetime import timedelta
+from datetime import timedelta, datetime
 from pathlib import Path
 
+from mampfsearch.utils import config
+
 class VideoLocation(BaseModel):
     courseId: str
     lectureId: str
@@ -32,6 +34,8 @@ class FileLocation(BaseModel):
 class Chunk(BaseModel):
     text: str
     location: Union[VideoLocation, FileLocation, None] = None
+    # the text already contains the adjacent subtitles (overlap ingest), so it is not widened at query time
+    overlap: bool = False
 
 class TranscriptionRequest(BaseModel):
     audio_file: Path
@@ -40,38 +44,90 @@ class IngestRequest(BaseModel):
     srt_file : Path
     course_id: str
     lecture_id: str
-    min_chunk_size: int = 350
-    max_chunk_size: int = 850
+    min_chunk_size: int = config.MIN_CHUNK_SIZE
+    max_chunk_size: int = config.MAX_CHUNK_SIZE
+    overlap: bool = True
+    force: bool = False  # re-embed all chunks, even if they did not change since the last ingest
+
+class BulkIngestRequest(BaseModel):
+    path: Path  # directory with .srt/.pdf/.txt files or a JSON manifest
+    course_id: Optional[str] = None  # required for directories, default for manifest entries
+    min_chunk_size: int = config.MIN_CHUNK_SIZE
+    max_chunk_size: int = config.MAX_CHUNK_SIZE
     overlap: bool = True
+    force: bool = False
+    workers: Optional[int] = None
+
+class FileIngestReport(BaseModel):
+    file: Path
+    course_id: str
+    lecture_id: Optional[str] = None
+    status: str = "pending"  # pending | chunked | ingested | failed
+    num_chunks: int = 0
+    error: Optional[str] = None
 
 class RetrieverTypeEnum(str, Enum):
     dense = "dense"
     hybrid = "hybrid"
     hybrid_colbert = "hybrid+colbert"
+    # BM25 only, no embedding model at query time
+    lexical = "lexical"
+    # lexical for short keyword queries, hybrid otherwise
+    auto = "auto"
+
+class SearchFilter(BaseModel):
+    course_id: Optional[str] = None
+    lecture_id: Optional[str] = None
+    # time window in seconds, matches chunks that overlap it
+    start_time: Optional[float] = None
+    end_time: Optional[float] = None
 
 class SearchRequest(BaseModel):
     query: str
     retriever_type: RetrieverTypeEnum = RetrieverTypeEnum.hybrid  # dense | hybrid | hybrid+colbert
     limit: int = 5
     reranking: bool = False
+    filter: Optional[SearchFilter] = None
+    # neighbouring chunks per side stitched onto hits as context, None uses config.CONTEXT_WINDOW
+    context_window: Optional[int] = None
+
+class SearchInfo(BaseModel):
+    """Filled in by search_lectures when passed, reported as response headers."""
+    cached: bool = False
+    num_reranked: int = 0
+    rerank_budget_exhausted: bool = False
 
 class LectureRetrievalItem(BaseModel):
     score: float
     text: str
     video_location: Optional[VideoLocation] = None
+    # the hit with its neighbouring chunks, for chunks ingested without overlap (see core/lectures/context.py)
+    context: Optional[str] = None
+
+    # (course_id, "lecture_id" or "file_id", document id, ordinal) of hits whose neighbours can be stitched on
+    _chunk_key: Optional[tuple] = PrivateAttr(default=None)
 
     @classmethod
     def from_qdrant_point(cls, point):
-        return cls(
+        item = cls(
             score=float(point.score),
             text=str(point.payload["text"]),
             video_location=VideoLocation(
                 courseId=point.payload["course_id"],
                 lectureId=point.payload["lecture_id"],
-                start_time=str(point.payload["start_time"]),
-                end_time=str(point.payload["end_time"]),
+                # seconds, or str(timedelta) for chunks ingested before the times were stored as numbers
+                start_time=point.payload.get("start_time"),
+                end_time=point.payload.get("end_time"),
             ) if "course_id" in point.payload and "lecture_id" in point.payload else None
         )
+        document_field = "lecture_id" if "lecture_id" in point.payload else "file_id"
+        if point.payload.get("overlap") is False and "ordinal" in point.payload and document_field in point.payload:
+            item._chunk_key = (point.payload["course_id"], document_field, point.payload[document_field], point.payload["ordinal"])
+        return item
+
+    @property
+    def chunk_key(self) -> Optional[tuple]:
+        return self._chunk_key
 
 
 class EntityCandidate(BaseModel):
@@ -121,6 +177,8 @@ class AskRequest(BaseModel):
     question: str
     retriever_type: RetrieverTypeEnum = RetrieverTypeEnum.hybrid
     limit: int = 5
+    filter: Optional[SearchFilter] = None
+    context_window: Optional[int] = None
 
 class SearchResult(BaseModel):
     items: List[LectureRetrievalItem]
@@ -130,7 +188,61 @@ class Answer(BaseModel):
     confidence_score: float
     source_snippets: Dict[str, float]
 
+class IngestInfo(BaseModel):
+    num_chunks: int
+    num_upserted: int = 0
+    num_unchanged: int = 0
+    num_deleted: int = 0
+    duration_seconds: float
+    chunks_per_second: float
+    # average ColBERT RAM per embedded chunk: unpooled float32 vs. after pooling, quantization and on-disk storage
+    colbert_bytes_per_chunk_before: float = 0.0
+    colbert_bytes_per_chunk_after: float = 0.0
+
+class BulkIngestReport(BaseModel):
+    files: List[FileIngestReport]
+    num_failed: int
+    ingest: Optional[IngestInfo] = None
+
+class JobState(str, Enum):
+    pending = "pending"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+    cancelled = "cancelled"
+
+class JobInfo(BaseModel):
+    id: str
+    kind: str
+    state: JobState = JobState.pending
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    cancel_requested: bool = False
+    chunks_processed: int = 0
+    chunks_per_second: float = 0.0
+    errors: List[str] = []
+    result: Optional[dict] = None
+
 class ExtractionInfo(BaseModel):
     num_extracted_entities: int
     num_new_inserted_entities: int
-    num_merged_entities: int
\ No newline at end of file
+    num_merged_entities: int
+
+class EmbeddingKind(str, Enum):
+    query = "query"
+    document = "document"
+
+class WorkerEncodeRequest(BaseModel):
+    texts: List[str]
+    # query encodings go through the shared query batcher, document encodings through the embedding cache
+    kind: EmbeddingKind = EmbeddingKind.document
+    return_dense: bool = True
+    return_sparse: bool = False
+    return_colbert_vecs: bool = False
+    batch_size: Optional[int] = None
+    max_length: Optional[int] = None
+
+class WorkerRerankRequest(BaseModel):
+    query: str
+    passages: List[str]
@@ -0,0 +1,75 @@
+import logging
+
+from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from mampfsearch.utils import config, metrics
+from mampfsearch.utils.models import EmbeddingKind, WorkerEncodeRequest, WorkerRerankRequest
+from mampfsearch.inference import run_inference
+from mampfsearch.inference.remote import pack_embeddings
+
+logger = logging.getLogger(__name__)
+
+# Shared embedding worker, started with `mampfsearch embedding-worker`.
+# It owns the embedding model and the reranker, so API processes with config.EMBEDDING_WORKER_URL set
+# do not load their own copies. Query encodings and rerank pairs of all API processes are batched together here.
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # the worker always loads the models itself
+    config.EMBEDDING_WORKER_URL = None
+    embedder = config.get_embedder()
+    query_encoder = config.get_query_encoder()
+    reranker = config.get_reranker()
+    logger.info(f"Embedding worker ready with {type(embedder).__name__}")
+    yield
+    query_encoder.close()
+    reranker.close()
+    config.get_inference_executor().shutdown(wait=False, cancel_futures=True)
+
+app = FastAPI(
+    title="MampfSearch embedding worker",
+    description="Encodes texts and reranks passages for the MampfSearch API processes",
+    version="0.1.0",
+    lifespan=lifespan
+)
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+@app.post("/encode")
+async def encode(request: WorkerEncodeRequest):
+    outputs = {
+        "return_dense": request.return_dense,
+        "return_sparse": request.return_sparse,
+        "return_colbert_vecs": request.return_colbert_vecs,
+    }
+    options = {}
+    if request.max_length is not None:
+        options["max_length"] = request.max_length
+
+    if request.kind == EmbeddingKind.query:
+        embeddings = await config.get_query_encoder().aencode(request.texts, **outputs, **options)
+    else:
+        if request.batch_size is not None:
+            options["batch_size"] = request.batch_size
+        embeddings = await run_inference(config.get_embedder().encode, request.texts, **outputs, **options)
+
+    metrics.increment(f"embedding_worker.{request.kind.value}_texts", len(request.texts))
+    return pack_embeddings(embeddings)
+
+@app.post("/rerank")
+async def rerank(request: WorkerRerankRequest):
+    scores = await config.get_reranker().ascore(request.query, request.passages)
+    metrics.increment("embedding_worker.rerank_pairs", len(request.passages))
+    return {"scores": scores}
+
+@app.get("/cache")
+async def get_embedding_cache_stats():
+    if not config.EMBEDDING_CACHE_ENABLED:
+        return {"enabled": False}
+    return {"enabled": True, **config.get_embedder().stats()}
+
+@app.get("/metrics")
+async def get_metrics():
+    return metrics.snapshot()
@@ -9,7 +9,6 @@ setup(
         "qdrant-client",
         "pysrt",
         "FlagEmbedding",
-        "rerankers",
         "fastapi[standard]",
         "openai",
         "transformers",
@@ -18,7 +17,12 @@ setup(
         "spacy-llm @ git+https://github.com/f-buerckel/spacy-llm.git@main",
         "langdetect",
         "docling",
+        "scipy",
     ],
+    extras_require={
+        # onnx embedding backend, see mampfsearch export-onnx
+        "onnx": ["onnxruntime", "onnx"],
+    },
     entry_points={
         "console_scripts": [
             "mampfsearch=mampfsearch.cli:main",